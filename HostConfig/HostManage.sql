@@ -1,5 +1,6 @@
 -- OpenIDCS Host Management Database Schema
 -- SQLite数据库表结构定义
+-- 本文件为版本1基线结构，已冻结不再修改；后续结构变更只能在HostModule/DataMigrate.py中追加迁移步骤
 
 -- 全局配置表 (hs_global)
 CREATE TABLE IF NOT EXISTS hs_global (
@@ -92,16 +93,57 @@ CREATE TABLE IF NOT EXISTS hs_logger (
     FOREIGN KEY (hs_name) REFERENCES hs_config(hs_name) ON DELETE SET NULL
 );
 
+-- 主机状态汇总表 (hs_rollup)
+-- 按1m/5m/1h/1d粒度汇总hs_status的各项指标(最小/累计/最大值，平均值=累计/样本数)
+CREATE TABLE IF NOT EXISTS hs_rollup (
+    hs_name TEXT NOT NULL,
+    period INTEGER NOT NULL, -- 汇总粒度(秒)
+    bucket INTEGER NOT NULL, -- 时间桶起点(Unix秒)
+    samples INTEGER DEFAULT 0, -- 样本数
+    cpu_usage_min INTEGER DEFAULT 0,
+    cpu_usage_sum INTEGER DEFAULT 0,
+    cpu_usage_max INTEGER DEFAULT 0,
+    mem_usage_min INTEGER DEFAULT 0,
+    mem_usage_sum INTEGER DEFAULT 0,
+    mem_usage_max INTEGER DEFAULT 0,
+    hdd_usage_min INTEGER DEFAULT 0,
+    hdd_usage_sum INTEGER DEFAULT 0,
+    hdd_usage_max INTEGER DEFAULT 0,
+    network_u_min INTEGER DEFAULT 0,
+    network_u_sum INTEGER DEFAULT 0,
+    network_u_max INTEGER DEFAULT 0,
+    network_d_min INTEGER DEFAULT 0,
+    network_d_sum INTEGER DEFAULT 0,
+    network_d_max INTEGER DEFAULT 0,
+    cpu_heats_min INTEGER DEFAULT 0,
+    cpu_heats_sum INTEGER DEFAULT 0,
+    cpu_heats_max INTEGER DEFAULT 0,
+    cpu_power_min INTEGER DEFAULT 0,
+    cpu_power_sum INTEGER DEFAULT 0,
+    cpu_power_max INTEGER DEFAULT 0,
+    PRIMARY KEY (hs_name, period, bucket)
+) WITHOUT ROWID;
+
+-- 数据保留策略表 (hs_retain)
+CREATE TABLE IF NOT EXISTS hs_retain (
+    table_name TEXT PRIMARY KEY, -- 被清理的表名
+    policy TEXT NOT NULL DEFAULT '{}', -- JSON格式存储保留策略，未设置的项使用默认值
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- 创建索引以提高查询性能
 CREATE INDEX IF NOT EXISTS idx_hs_config_name ON hs_config(hs_name);
 CREATE INDEX IF NOT EXISTS idx_hs_status_name ON hs_status(hs_name);
+CREATE INDEX IF NOT EXISTS idx_hs_status_recorded ON hs_status(recorded_at);
 CREATE INDEX IF NOT EXISTS idx_vm_saving_name ON vm_saving(hs_name);
 CREATE INDEX IF NOT EXISTS idx_vm_saving_uuid ON vm_saving(vm_uuid);
 CREATE INDEX IF NOT EXISTS idx_vm_status_name ON vm_status(hs_name);
 CREATE INDEX IF NOT EXISTS idx_vm_status_uuid ON vm_status(vm_uuid);
 CREATE INDEX IF NOT EXISTS idx_vm_tasker_name ON vm_tasker(hs_name);
+CREATE INDEX IF NOT EXISTS idx_vm_tasker_created ON vm_tasker(created_at);
 CREATE INDEX IF NOT EXISTS idx_hs_logger_name ON hs_logger(hs_name);
 CREATE INDEX IF NOT EXISTS idx_hs_logger_created ON hs_logger(created_at);
+CREATE INDEX IF NOT EXISTS idx_hs_logger_level ON hs_logger(log_level, created_at);
 
 -- 插入默认的全局配置
 INSERT OR IGNORE INTO hs_global (id, bearer, saving) VALUES (1, '', './DataSaving');
@@ -118,53 +160,9 @@ CREATE TABLE IF NOT EXISTS hs_migration_log (
     executed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
--- 升级函数：添加字段（如果不存在）
--- 由于SQLite不支持ALTER TABLE IF NOT EXISTS，我们需要手动检查
-
--- Version 1.0: 添加爱快OS相关字段
--- ALTER TABLE hs_config ADD COLUMN i_kuai_addr TEXT DEFAULT '';
--- ALTER TABLE hs_config ADD COLUMN i_kuai_user TEXT DEFAULT '';
--- ALTER TABLE hs_config ADD COLUMN i_kuai_pass TEXT DEFAULT '';
-
--- Version 1.1: 添加端口配置字段
--- ALTER TABLE hs_config ADD COLUMN ports_start INTEGER DEFAULT 0;
--- ALTER TABLE hs_config ADD COLUMN ports_close INTEGER DEFAULT 0;
--- ALTER TABLE hs_config ADD COLUMN remote_port INTEGER DEFAULT 0;
-
--- Version 1.2: 添加系统和网络配置字段
--- ALTER TABLE hs_config ADD COLUMN system_maps TEXT DEFAULT '{}';
--- ALTER TABLE hs_config ADD COLUMN public_addr TEXT DEFAULT '[]';
-
--- Version 1.3: 添加扩展数据字段
--- ALTER TABLE hs_config ADD COLUMN extend_data TEXT DEFAULT '{}';
-
--- =================================================================
--- 临时升级脚本执行（一次性使用）
--- =================================================================
-
--- 执行以下语句来添加缺失的字段（请根据实际情况取消注释需要的语句）
-
--- 1. 爱快OS相关字段
--- ALTER TABLE hs_config ADD COLUMN i_kuai_addr TEXT DEFAULT '';
--- ALTER TABLE hs_config ADD COLUMN i_kuai_user TEXT DEFAULT '';
--- ALTER TABLE hs_config ADD COLUMN i_kuai_pass TEXT DEFAULT '';
-
--- 2. 端口配置字段
--- ALTER TABLE hs_config ADD COLUMN ports_start INTEGER DEFAULT 0;
--- ALTER TABLE hs_config ADD COLUMN ports_close INTEGER DEFAULT 0;
--- ALTER TABLE hs_config ADD COLUMN remote_port INTEGER DEFAULT 0;
-
--- 3. 系统和网络配置字段
--- ALTER TABLE hs_config ADD COLUMN system_maps TEXT DEFAULT '{}';
--- ALTER TABLE hs_config ADD COLUMN public_addr TEXT DEFAULT '[]';
-
--- 4. 扩展数据字段
--- ALTER TABLE hs_config ADD COLUMN extend_data TEXT DEFAULT '{}';
+-- 本文件为版本1的基线结构，之后的结构变更以新版本号追加到
+-- HostModule/DataMigrate.py 的 MIGRATIONS 中，由程序启动时按版本依次执行并记录到上表
 
 -- 清理：删除不再使用的hs_saving表 (如果存在)
 DROP TABLE IF EXISTS hs_saving;
 
--- 注意事项：
--- 1. 以上ALTER TABLE语句如果字段已存在会报错，这是正常的
--- 2. 执行前请备份数据库
--- 3. 执行完成后可以注释掉这些ALTER TABLE语句
\ No newline at end of file
@@ -0,0 +1,88 @@
+import sys
+import time
+import importlib.abc
+from typing import Dict, List
+
+
+class BootProfile(importlib.abc.MetaPathFinder):
+    """启动耗时分析：记录每个模块的导入耗时（自身/含子模块）和各初始化阶段的耗时"""
+
+    def __init__(self):
+        self.imports: Dict[str, List[float]] = {}  # 模块名 -> [自身耗时, 含子模块耗时]
+        self.phases: Dict[str, float] = {}  # 阶段名 -> 耗时
+        self.stack: List[List[float]] = []  # 正在导入的模块: [开始时间, 子模块耗时]
+        self.started = time.perf_counter()
+
+    # 安装导入钩子 =============================================
+    def install(self) -> "BootProfile":
+        sys.meta_path.insert(0, self)
+        return self
+
+    # 卸载导入钩子 =============================================
+    def remove(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    # 查找模块（交给其他查找器，只包装加载器） =================
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = _TimedLoader(self, spec.loader)
+            return spec
+        return None
+
+    # 记录一个模块的导入 =======================================
+    def enter(self):
+        self.stack.append([time.perf_counter(), 0.0])
+
+    def leave(self, name: str):
+        start, children = self.stack.pop()
+        total = time.perf_counter() - start
+        self.imports[name] = [total - children, total]
+        if self.stack:
+            self.stack[-1][1] += total
+
+    # 记录一个初始化阶段 =======================================
+    def phase(self, name: str, seconds: float):
+        self.phases[name] = seconds
+
+    # 输出报告 =================================================
+    def report(self, top: int = 25) -> str:
+        lines = [f"[Profile] 启动总耗时 {(time.perf_counter() - self.started) * 1000:.1f} ms",
+                 f"[Profile] 导入耗时最多的{top}个模块 (自身 / 含子模块, ms):"]
+        ranked = sorted(self.imports.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (own, total) in ranked[:top]:
+            lines.append(f"[Profile]   {name:<48}{own * 1000:>10.2f}{total * 1000:>10.2f}")
+        lines.append("[Profile] 初始化阶段耗时 (ms):")
+        for name, seconds in self.phases.items():
+            lines.append(f"[Profile]   {name:<48}{seconds * 1000:>10.2f}")
+        return "\n".join(lines)
+
+
+class _TimedLoader(importlib.abc.Loader):
+    """包装模块加载器，执行模块代码时计时"""
+
+    def __init__(self, profile: BootProfile, loader):
+        self.profile = profile
+        self.loader = loader
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        # 模块的__spec__.loader已被替换，恢复原加载器以免影响包内资源读取
+        module.__spec__.loader = self.loader
+        module.__loader__ = self.loader
+        self.profile.enter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.profile.leave(module.__name__)
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
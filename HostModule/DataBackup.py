@@ -0,0 +1,143 @@
+import os
+import time
+import zlib
+import sqlite3
+import threading
+from typing import Dict, Any, Callable, List
+
+
+class DataBackup:
+    """在线备份任务：用SQLite备份接口分步复制数据库，步骤之间让出写锁，可压缩并轮换保留最近的备份"""
+
+    # 备份文件名前缀
+    PREFIX = "hostmanage-"
+    # 压缩时每次读取的字节数
+    CHUNK = 1024 * 1024
+
+    def __init__(self, db, folder: Callable[[], str], pages: int = 256,
+                 step_wait: float = 0.02, keep: int = 7, compress: bool = True):
+        """
+        :param db: HostDatabase实例
+        :param folder: 返回备份目录的回调（随全局配置的saving目录变化）
+        :param pages: 每步复制的页数
+        :param step_wait: 步骤之间的等待时间（秒）
+        :param keep: 保留最近的备份数量（0表示不删除旧备份）
+        :param compress: 是否使用zlib(gzip格式)压缩备份文件
+        """
+        self.db = db
+        self.folder = folder
+        self.pages = pages
+        self.step_wait = step_wait
+        self.keep = keep
+        self.compress = compress
+        self.running = threading.Lock()
+        self.last_report: Dict[str, Any] = {}
+
+    # 执行一次备份 =============================================
+    def run(self, compress: bool = None, keep: int = None) -> Dict[str, Any]:
+        """
+        :param compress: 是否压缩，为空时使用默认设置
+        :param keep: 保留最近的备份数量，为空时使用默认设置
+        :return: {"file": 备份文件, "bytes": 文件大小, "pages": 复制页数, "steps": 步数, ...}
+        """
+        compress = self.compress if compress is None else compress
+        keep = self.keep if keep is None else keep
+        with self.running:
+            start = time.perf_counter()
+            folder = self.folder()
+            os.makedirs(folder, exist_ok=True)
+            # 文件名精确到毫秒，同一秒内的多次备份不会互相覆盖
+            stamp = time.time()
+            name = (self.PREFIX + time.strftime("%Y%m%d-%H%M%S", time.localtime(stamp))
+                    + f"-{int(stamp * 1000) % 1000:03d}.db")
+            target = os.path.join(folder, name)
+            copying = target + ".tmp"
+            packing = target + ".gz.tmp"
+            if os.path.exists(target) or os.path.exists(target + ".gz"):
+                raise FileExistsError(f"备份文件已存在: {name}")
+            try:
+                pages, steps = self.copy(copying)
+                if compress:
+                    target += ".gz"
+                    self.deflate(copying, target)
+                    os.remove(copying)
+                else:
+                    os.replace(copying, target)
+            finally:
+                for path in (copying, copying + "-journal", packing):
+                    if os.path.exists(path):
+                        os.remove(path)
+            removed = self.rotate(folder, keep)
+            self.last_report = {
+                "file": os.path.basename(target),
+                "bytes": os.path.getsize(target),
+                "pages": pages,
+                "steps": steps,
+                "compressed": compress,
+                "removed": removed,
+                "seconds": round(time.perf_counter() - start, 3),
+                "finished_at": int(time.time()),
+            }
+            return self.last_report
+
+    # 分步复制数据库 ===========================================
+    def copy(self, target: str) -> tuple:
+        """
+        复制期间源连接保持同一个读事务，WAL模式下写入不受影响，
+        备份也不会因为其他连接的写入而从头重新开始
+        :return: (复制页数, 步数)
+        """
+        source = self.db.connect.create()
+        output = sqlite3.connect(target)
+        progress = {"pages": 0, "steps": 0}
+
+        def step(status, remaining, total):
+            progress["pages"], progress["steps"] = total, progress["steps"] + 1
+            if remaining:
+                time.sleep(self.step_wait)
+
+        try:
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            source.backup(output, pages=self.pages, progress=step)
+            source.rollback()
+            return progress["pages"], progress["steps"]
+        finally:
+            output.close()
+            source.close()
+
+    # 流式压缩 =================================================
+    def deflate(self, source: str, target: str):
+        # wbits=31输出gzip格式，可直接用gunzip解压
+        packer = zlib.compressobj(6, zlib.DEFLATED, 31)
+        with open(source, "rb") as reader, open(target + ".tmp", "wb") as writer:
+            while chunk := reader.read(self.CHUNK):
+                writer.write(packer.compress(chunk))
+            writer.write(packer.flush())
+        os.replace(target + ".tmp", target)
+
+    # 列出备份 =================================================
+    def backups(self) -> List[Dict[str, Any]]:
+        folder = self.folder()
+        if not os.path.isdir(folder):
+            return []
+        return [{"file": name,
+                 "bytes": os.path.getsize(os.path.join(folder, name)),
+                 "modified": int(os.path.getmtime(os.path.join(folder, name)))}
+                for name in self.files(folder)]
+
+    # 备份文件（按时间从新到旧） ===============================
+    def files(self, folder: str) -> List[str]:
+        return sorted((name for name in os.listdir(folder)
+                       if name.startswith(self.PREFIX)
+                       and (name.endswith(".db") or name.endswith(".db.gz"))), reverse=True)
+
+    # 轮换备份 =================================================
+    def rotate(self, folder: str, keep: int) -> List[str]:
+        """只保留最近的keep个备份，返回删除的文件名"""
+        if keep <= 0:
+            return []
+        removed = self.files(folder)[keep:]
+        for name in removed:
+            os.remove(os.path.join(folder, name))
+        return removed
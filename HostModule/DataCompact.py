@@ -0,0 +1,152 @@
+import json
+import time
+import threading
+import contextlib
+from typing import Dict, Any, Callable, ContextManager, Optional
+
+
+class DataCompact:
+    """数据保留与压缩任务：按表的保留策略分批删除过期数据，然后回收数据库空闲页"""
+
+    # 默认保留策略 =============================================
+    # max_days: 超过天数的行删除
+    # max_rows: 每台主机最多保留的行数
+    # levels:   按日志级别单独设置的保留天数
+    # periods:  按汇总粒度(秒)单独设置的保留天数
+    DEFAULTS = {
+        "hs_logger": {"max_days": 90, "max_rows": 100000, "levels": {"DEBUG": 7, "INFO": 30}},
+        "vm_tasker": {"max_days": 90, "max_rows": 10000},
+        "hs_status": {"max_days": 7, "max_rows": 20160},
+        "hs_rollup": {"periods": {"60": 2, "300": 14, "3600": 180, "86400": 1825}},
+    }
+    # 各表的时间列
+    TIME_COLUMNS = {
+        "hs_logger": "created_at",
+        "vm_tasker": "created_at",
+        "hs_status": "recorded_at",
+    }
+
+    def __init__(self, db, batch_size: int = 500, batch_wait: float = 0.05,
+                 on_trim: Optional[Callable[[str, str, int], None]] = None,
+                 guard: Optional[Callable[[Optional[str]], ContextManager]] = None):
+        """
+        :param db: HostDatabase实例
+        :param batch_size: 每批删除的行数（每批单独提交，避免长时间持有写锁）
+        :param batch_wait: 批次之间的等待时间（秒）
+        :param on_trim: 删除某主机最旧的若干行后的回调 (表名, 主机名, 行数)，用于同步裁剪内存数据
+        :param guard: 返回主机写锁上下文的回调 (主机名)；内存中有副本的表（LISTED_TABLES）逐台主机删除，
+                      每批的删除和on_trim在该锁内完成，保存线程不会用未裁剪的内存数据比对已裁剪的缓存
+        """
+        self.db = db
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.on_trim = on_trim
+        self.guard = guard
+        self.running = threading.Lock()
+        self.last_report: Dict[str, Any] = {}
+
+    # 读取保留策略 =============================================
+    def get_policy(self) -> Dict[str, Dict[str, Any]]:
+        policy = json.loads(json.dumps(self.DEFAULTS))
+        for table, saved in self.db.get_retain_policy().items():
+            if table in policy:
+                policy[table].update(saved)
+        return policy
+
+    # 更新保留策略 =============================================
+    def set_policy(self, table: str, policy: Dict[str, Any]) -> bool:
+        if table not in self.DEFAULTS:
+            return False
+        allowed = self.DEFAULTS[table].keys()
+        return self.db.set_retain_policy(
+            table, {key: value for key, value in policy.items() if key in allowed})
+
+    # 执行一次压缩 =============================================
+    def run(self) -> Dict[str, Any]:
+        """
+        :return: {"rows": 删除总行数, "pages": 回收页数, "tables": {表名: 删除行数}, ...}
+        """
+        with self.running:
+            start = time.perf_counter()
+            policy = self.get_policy()
+            before = self.db.get_page_stats()
+            tables = {}
+            for table in ("hs_logger", "vm_tasker", "hs_status"):
+                tables[table] = self.compact_table(table, policy[table])
+            tables["hs_rollup"] = self.compact_rollup(policy["hs_rollup"])
+            self.db.vacuum_pages(self.batch_size)
+            after = self.db.get_page_stats()
+            self.last_report = {
+                "rows": sum(tables.values()),
+                "pages": before["page_count"] - after["page_count"],
+                "tables": tables,
+                "before": before,
+                "after": after,
+                "seconds": round(time.perf_counter() - start, 3),
+                "finished_at": int(time.time()),
+            }
+            return self.last_report
+
+    # 按保留策略压缩普通表 =====================================
+    def compact_table(self, table: str, policy: Dict[str, Any]) -> int:
+        column = self.TIME_COLUMNS[table]
+        rules = []  # (条件, 参数)
+        # 按级别设置的保留天数 =================================
+        for level, days in (policy.get("levels") or {}).items():
+            rules.append((f"log_level = ? AND {column} < datetime('now', ?)", (level, f"-{int(days)} days")))
+        # 按时间保留 ===========================================
+        if policy.get("max_days"):
+            rules.append((f"{column} < datetime('now', ?)", (f"-{int(policy['max_days'])} days",)))
+        deleted = 0
+        mirrored = table in self.db.LISTED_TABLES
+        if mirrored:
+            # 内存中有副本的表逐台主机删除，删除和裁剪内存数据在同一主机写锁内
+            for hs_name in self.db.get_table_hosts(table):
+                for where, params in rules:
+                    deleted += self.delete_batches(
+                        f"SELECT id, hs_name FROM {table} WHERE hs_name IS ? AND {where} LIMIT ?",
+                        (hs_name, *params), table, hs_name)
+        else:
+            for where, params in rules:
+                deleted += self.delete_batches(
+                    f"SELECT id, hs_name FROM {table} WHERE {where} LIMIT ?", params, table)
+        # 按每台主机的行数保留 =================================
+        if policy.get("max_rows"):
+            for hs_name in self.db.get_table_hosts(table):
+                cutoff = self.db.get_nth_id(table, hs_name, int(policy["max_rows"]))
+                if cutoff is None:
+                    continue
+                deleted += self.delete_batches(
+                    f"SELECT id, hs_name FROM {table} WHERE hs_name IS ? AND id <= ? LIMIT ?",
+                    (hs_name, cutoff), table, hs_name if mirrored else None)
+        return deleted
+
+    # 按汇总粒度压缩汇总表 =====================================
+    def compact_rollup(self, policy: Dict[str, Any]) -> int:
+        deleted = 0
+        for period, days in (policy.get("periods") or {}).items():
+            while True:
+                count = self.db.delete_rollup_batch(int(period), int(days), self.batch_size)
+                deleted += count
+                if count < self.batch_size:
+                    break
+                time.sleep(self.batch_wait)
+        return deleted
+
+    # 分批删除 =================================================
+    def delete_batches(self, select_sql: str, params: tuple, table: str,
+                       hs_name: Optional[str] = None) -> int:
+        """:param hs_name: 只删除这台主机的行时在该主机写锁内删除和裁剪"""
+        deleted = 0
+        while True:
+            guard = self.guard(hs_name) if self.guard and hs_name else contextlib.nullcontext()
+            with guard:
+                trimmed = self.db.delete_rows_batch(table, select_sql, (*params, self.batch_size))
+                if self.on_trim:
+                    for trimmed_host, rows in trimmed.items():
+                        self.on_trim(table, trimmed_host, rows)
+            count = sum(trimmed.values())
+            deleted += count
+            if count < self.batch_size:
+                return deleted
+            time.sleep(self.batch_wait)
@@ -1,22 +1,239 @@
 import sqlite3
 import json
 import os
+import time
+import queue
+import atexit
+import hashlib
+import threading
+import weakref
 from typing import Dict, List, Any, Optional
 from MainObject.Config.HSConfig import HSConfig
 from MainObject.Config.VMConfig import VMConfig
+from MainObject.Config.VMPowers import VMPowers
 from MainObject.Public.ZMessage import ZMessage
+from MainObject.Public.HWStatus import HWStatus
+from HostModule.DataSeries import DataSeries
+from HostModule.DataMigrate import DataMigrate
+
+
+class DataConnect:
+    """SQLite长连接管理器：每个线程持有一条持久连接，线程结束后连接回收复用"""
+
+    # 连接级调优参数 ===========================================
+    PRAGMAS = (
+        "PRAGMA auto_vacuum = INCREMENTAL",  # 新建数据库时启用增量回收空闲页
+        "PRAGMA journal_mode = WAL",  # 读写互不阻塞
+        "PRAGMA synchronous = NORMAL",  # WAL模式下NORMAL即可保证一致性
+        "PRAGMA cache_size = -16384",  # 页缓存约16MB
+        "PRAGMA mmap_size = 268435456",  # 内存映射256MB
+        "PRAGMA temp_store = MEMORY",
+        "PRAGMA busy_timeout = 5000",
+    )
+
+    def __init__(self, db_path: str, persist: bool = True,
+                 cached: int = 256, idle_max: int = 8):
+        """
+        :param db_path: 数据库文件路径
+        :param persist: 是否复用长连接（False为每次调用新建连接，仅用于对比测试）
+        :param cached: 每条连接缓存的预编译语句数量
+        :param idle_max: 空闲连接池的最大连接数
+        """
+        self.db_path = db_path
+        self.persist = persist
+        self.cached = cached
+        self.idle_max = idle_max
+        self.opened = 0  # 累计打开的连接数
+        self.idle: list[sqlite3.Connection] = []  # 已回收的空闲连接
+        self.local = threading.local()
+        self.locker = threading.Lock()
+
+    # 打开新连接 ===============================================
+    def create(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            cached_statements=self.cached,
+            check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # 启用字典式访问
+        if self.persist:
+            for pragma in self.PRAGMAS:
+                conn.execute(pragma)
+        with self.locker:
+            self.opened += 1
+        return conn
+
+    # 获取当前线程的连接 =======================================
+    def acquire(self) -> sqlite3.Connection:
+        if not self.persist:
+            return self.create()
+        holder = getattr(self.local, "holder", None)
+        if holder is not None:
+            try:
+                holder.conn.total_changes  # 连接被外部关闭时抛出异常
+                return holder.conn
+            except sqlite3.ProgrammingError:
+                self.local.holder = None
+        with self.locker:
+            conn = self.idle.pop() if self.idle else None
+        if conn is None:
+            conn = self.create()
+        # 线程退出时holder被回收，连接自动放回空闲池
+        holder = _ConnHolder(conn)
+        weakref.finalize(holder, self.recycle, conn)
+        self.local.holder = holder
+        return conn
+
+    # 释放连接 =================================================
+    def release(self, conn: sqlite3.Connection):
+        if not self.persist:
+            conn.close()
+
+    # 回收连接 =================================================
+    def recycle(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        with self.locker:
+            if len(self.idle) < self.idle_max:
+                self.idle.append(conn)
+                return
+        conn.close()
+
+    # 关闭所有连接 ===========================================
+    def close_all(self):
+        # 先解除当前线程的持有，连接随即回收进空闲池
+        self.local.holder = None
+        with self.locker:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.close()
+
+
+class _ConnHolder:
+    """线程局部连接的持有者，用于感知线程退出"""
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+
+class DataLogger:
+    """追加式日志写入器：日志先进入有界队列，由后台线程按数量或时间批量插入"""
+
+    def __init__(self, db: "HostDatabase", batch_size: int = 200,
+                 interval: float = 1.0, queue_max: int = 10000):
+        """
+        :param db: 数据库操作实例
+        :param batch_size: 队列中积累多少条日志时立即写入
+        :param interval: 最长写入间隔（秒）
+        :param queue_max: 队列容量，队列满时由调用方同步写入
+        """
+        self.db = db
+        self.batch_size = batch_size
+        self.interval = interval
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_max)
+        self.wakeup = threading.Event()
+        self.flush_lock = threading.Lock()
+        self.thread: threading.Thread | None = None
+        self.stopped = False
+        atexit.register(self.close)
+
+    # 追加一条日志 =============================================
+    def append(self, hs_name: Optional[str], log: ZMessage):
+        row = HostDatabase._log_row(hs_name, log)
+        if self.thread is None and not self.stopped:
+            self.start()
+        try:
+            self.queue.put_nowait(row)
+        except queue.Full:
+            self.flush()  # 队列已满，由调用方写入以形成背压
+            self.queue.put(row)
+        if self.stopped:
+            self.flush()
+        elif self.queue.qsize() >= self.batch_size:
+            self.wakeup.set()
+
+    # 启动后台写入线程 =========================================
+    def start(self):
+        with self.flush_lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self.run, name="DataLogger", daemon=True)
+            self.thread.start()
+
+    # 后台写入循环 =============================================
+    def run(self):
+        while not self.stopped:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+            self.flush()
+
+    # 写入队列中的全部日志 =====================================
+    def flush(self) -> int:
+        with self.flush_lock:
+            rows = []
+            while True:
+                try:
+                    rows.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if rows and not self.db.insert_logger(rows):
+                print(f"[DataLogger] {len(rows)}条日志写入失败")
+                return 0
+            return len(rows)
+
+    # 停止写入线程并写入剩余日志 ===============================
+    def close(self):
+        self.stopped = True
+        self.wakeup.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5)
+        self.flush()
 
 
 class HostDatabase:
     """HostManage SQLite数据库操作类"""
+
+    # 内存中保留的最近日志条数
+    LOGS_WINDOW = 1000
+    # 内存中保留的最近主机状态条数
+    STATUS_WINDOW = 60
+    # 按键增量写入的表: 表名 -> (键列, 数据列, 时间列)
+    KEYED_TABLES = {
+        "vm_saving": ("vm_uuid", "vm_config", "updated_at"),
+        "vm_status": ("vm_uuid", "status_data", "recorded_at"),
+    }
+    # 按顺序增量写入的表: 表名 -> 数据列
+    LISTED_TABLES = {
+        "vm_tasker": ("task_data", "task_success"),
+    }
+    # 可登记修改的表（mark_dirty）
+    DIRTY_TABLES = ("hs_config", "vm_saving", "vm_status", "vm_tasker")
     
-    def __init__(self, db_path: str = "./DataSaving/hostmanage.db"):
+    def __init__(self, db_path: str = "./DataSaving/hostmanage.db", persist: bool = True):
         """
         初始化数据库连接
         :param db_path: 数据库文件路径
+        :param persist: 是否使用长连接（WAL模式）
         """
         self.db_path = db_path
         self.ensure_directory_exists()
+        self.connect = DataConnect(db_path, persist=persist)
+        # 已持久化行的缓存: (表名, 主机名) -> 行摘要（_digest），用于增量写入
+        self.saved: dict[tuple, Any] = {}
+        self.saving_lock = threading.RLock()
+        # 内存中已修改、尚未写入的行: (表名, 主机名) -> 键集合（vm_uuid），None表示整张表按行摘要比对
+        self.dirty: dict[tuple, Optional[set]] = {}
+        self.dirty_lock = threading.Lock()
+        # 追加式日志写入器
+        self.logger = DataLogger(self)
+        # 主机状态时序存储
+        self.series = DataSeries(self)
+        # 数据库结构版本
+        self.schema = 0
+        # 状态数据是否使用紧凑二进制格式（读取时自动识别两种格式）
+        self.packed = False
+        # 日志全文索引的分词器（首次搜索时读取，空字符串表示没有全文索引）
+        self.fts_tokenize: Optional[str] = None
         self.init_database()
     
     def ensure_directory_exists(self):
@@ -26,40 +243,24 @@ class HostDatabase:
             os.makedirs(db_dir, exist_ok=True)
     
     def get_connection(self) -> sqlite3.Connection:
-        """获取数据库连接"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # 启用字典式访问
-        return conn
+        """获取当前线程的数据库连接（用完后调用release_connection，不要直接close）"""
+        return self.connect.acquire()
+
+    def release_connection(self, conn: sqlite3.Connection):
+        """归还数据库连接"""
+        self.connect.release(conn)
+
+    def close(self):
+        """写入剩余日志并关闭所有数据库连接"""
+        self.logger.close()
+        self.connect.close_all()
     
     def init_database(self):
-        """初始化数据库表结构"""
-        sql_file_path = os.path.join(os.path.dirname(self.db_path), "HostManage.sql")
-        if os.path.exists(sql_file_path):
-            with open(sql_file_path, 'r', encoding='utf-8') as f:
-                sql_script = f.read()
-            
-            conn = self.get_connection()
-            try:
-                # 分割SQL脚本，逐条执行以更好地处理ALTER TABLE错误
-                sql_statements = [stmt.strip() for stmt in sql_script.split(';') if stmt.strip()]
-                
-                for sql in sql_statements:
-                    try:
-                        conn.execute(sql)
-                    except sqlite3.OperationalError as e:
-                        # 忽略ALTER TABLE的重复字段错误
-                        if "duplicate column name" in str(e).lower():
-                            print(f"字段已存在，跳过: {e}")
-                            continue
-                        else:
-                            raise e
-                
-                conn.commit()
-            except Exception as e:
-                print(f"数据库初始化错误: {e}")
-                conn.rollback()
-            finally:
-                conn.close()
+        """初始化数据库表结构（执行未执行过的版本迁移）"""
+        try:
+            self.schema = DataMigrate(self).upgrade()
+        except Exception as e:
+            print(f"数据库初始化错误: {e}")
     
     # ==================== 全局配置操作 ====================
     
@@ -67,18 +268,19 @@ class HostDatabase:
         """获取全局配置"""
         conn = self.get_connection()
         try:
-            cursor = conn.execute("SELECT bearer, saving FROM hs_global WHERE id = 1")
+            cursor = conn.execute("SELECT bearer, saving, packed FROM hs_global WHERE id = 1")
             row = cursor.fetchone()
             if row:
                 return {
                     "bearer": row["bearer"],
-                    "saving": row["saving"]
+                    "saving": row["saving"],
+                    "packed": bool(row["packed"])
                 }
-            return {"bearer": "", "saving": "./DataSaving"}
+            return {"bearer": "", "saving": "./DataSaving", "packed": False}
         finally:
-            conn.close()
+            self.release_connection(conn)
     
-    def update_global_config(self, bearer: str = None, saving: str = None):
+    def update_global_config(self, bearer: str = None, saving: str = None, packed: bool = None):
         """更新全局配置"""
         updates = []
         params = []
@@ -89,6 +291,9 @@ class HostDatabase:
         if saving is not None:
             updates.append("saving = ?")
             params.append(saving)
+        if packed is not None:
+            updates.append("packed = ?")
+            params.append(1 if packed else 0)
         
         if updates:
             updates.append("updated_at = CURRENT_TIMESTAMP")
@@ -103,56 +308,312 @@ class HostDatabase:
                 print(f"更新全局配置错误: {e}")
                 conn.rollback()
             finally:
-                conn.close()
+                self.release_connection(conn)
     
+    # ==================== 增量写入辅助 ====================
+
+    @staticmethod
+    def _to_json(obj) -> str:
+        """将对象序列化为JSON文本"""
+        return json.dumps(obj.__dict__() if hasattr(obj, '__dict__') and callable(obj.__dict__) else obj)
+
+    @staticmethod
+    def _log_row(hs_name: Optional[str], log) -> tuple:
+        """生成日志表的一行 (hs_name, log_data, log_level, log_action, log_success)"""
+        if isinstance(log, dict):
+            action, success = log.get('actions', ''), log.get('success', True)
+        else:
+            action, success = getattr(log, 'actions', ''), getattr(log, 'success', True)
+        return (hs_name, HostDatabase._to_json(log), HostDatabase._log_level(log),
+                str(action or ''), 1 if success else 0)
+
+    @staticmethod
+    def _log_level(log) -> str:
+        """获取日志级别，未指定时按执行结果区分INFO/ERROR"""
+        level = log.get('level') if isinstance(log, dict) else getattr(log, 'level', None)
+        if level:
+            return level
+        success = log.get('success', True) if isinstance(log, dict) else getattr(log, 'success', True)
+        return 'INFO' if success else 'ERROR'
+
+    def _encode_status(self, status) -> str | bytes:
+        """编码单条状态数据，启用紧凑格式时为二进制，否则为JSON文本"""
+        if self.packed:
+            return bytes(status if isinstance(status, HWStatus) else HWStatus(**status))
+        return self._to_json(status)
+
+    def _encode_status_list(self, status_list: List[Any]) -> str | bytes:
+        """编码状态数据列表（vm_status）"""
+        if self.packed:
+            return HWStatus.pack_list(status_list)
+        return json.dumps([
+            status.__dict__() if hasattr(status, '__dict__') and callable(status.__dict__) else status
+            for status in status_list])
+
+    @staticmethod
+    def _decode_status(data: str | bytes) -> Any:
+        """还原状态数据为字典（或字典列表），自动识别JSON文本与紧凑二进制"""
+        if isinstance(data, bytes):
+            if data[:1] == bytes([HWStatus.LIST_VERSION]):
+                return [status.__dict__() for status in HWStatus.unpack_list(data)]
+            return HWStatus.from_bytes(data).__dict__()
+        return json.loads(data)
+
+    @staticmethod
+    def _digest(value) -> bytes:
+        """
+        行内容的摘要（blake2b 128位），用于判断行是否变化
+        不使用内置hash()：64位哈希碰撞时变化的行会被当作未变化而跳过写入
+        :param value: JSON文本、紧凑二进制或多列值的元组
+        """
+        if isinstance(value, bytes):
+            data = b"b" + value
+        elif isinstance(value, str):
+            data = b"s" + value.encode()
+        else:
+            data = b"r" + repr(value).encode()
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def forget(self, hs_name: str = None):
+        """丢弃已持久化行的缓存（删除主机或外部直接修改数据库后调用），下次保存时重新从数据库比对"""
+        with self.saving_lock:
+            if hs_name is None:
+                self.saved.clear()
+                return
+            for key in [key for key in self.saved if key[1] == hs_name]:
+                del self.saved[key]
+
+    # 登记未写入的修改 =========================================
+    # 保存时只读取和写入登记的行；没有指定键（整张表）时按行摘要比对，
+    # 冷缓存（刚加载或删除缓存后）时先从数据库读取行摘要
+
+    def mark_dirty(self, table: str, hs_name: str, *keys: str):
+        """
+        登记内存中已修改、尚未写入数据库的数据
+        :param table: hs_config/vm_saving/vm_status/vm_tasker
+        :param keys: 修改的虚拟机UUID（vm_saving/vm_status），为空时整张表按行摘要比对
+        """
+        with self.dirty_lock:
+            if not keys:
+                self.dirty[(table, hs_name)] = None
+            elif (table, hs_name) not in self.dirty:
+                self.dirty[(table, hs_name)] = set(keys)
+            elif self.dirty[(table, hs_name)] is not None:
+                self.dirty[(table, hs_name)].update(keys)
+
+    def take_dirty(self, hs_name: str) -> Dict[str, Optional[set]]:
+        """取出主机登记的修改 {表名: 键集合或None}，写入失败时用keep_dirty放回"""
+        with self.dirty_lock:
+            return {table: self.dirty.pop((table, hs_name))
+                    for table in self.DIRTY_TABLES if (table, hs_name) in self.dirty}
+
+    def keep_dirty(self, hs_name: str, dirty: Dict[str, Optional[set]]):
+        """放回未能写入的修改，下次保存时重试"""
+        for table, keys in dirty.items():
+            self.mark_dirty(table, hs_name, *(keys or ()))
+
+    def _diff_keyed(self, conn: sqlite3.Connection, staged: dict, table: str,
+                    hs_name: str, rows: Dict[str, str], keys: Optional[set] = None) -> int:
+        """
+        按键比对并写入变化的行（vm_saving/vm_status），返回写入的行数
+        :param staged: 提交成功后需要写回缓存的内容
+        :param rows: {vm_uuid: JSON文本}
+        :param keys: 只写入这些键（登记修改的行），rows中没有的键删除；为空时整张表比对
+        """
+        if keys is not None:
+            return self._write_keyed(conn, staged, table, hs_name, rows, keys)
+        key_col, data_col, time_col = self.KEYED_TABLES[table]
+        old = self.saved.get((table, hs_name))
+        if old is None:
+            cursor = conn.execute(
+                f"SELECT {key_col}, {data_col} FROM {table} WHERE hs_name = ?", (hs_name,))
+            old = {row[0]: self._digest(row[1]) for row in cursor.fetchall()}
+        new = {}
+        changed = 0
+        for key, payload in rows.items():
+            new[key] = self._digest(payload)
+            if old.get(key) == new[key]:
+                continue
+            self._upsert_keyed(conn, table, hs_name, key, payload)
+            changed += 1
+        removed = [(hs_name, key) for key in old if key not in new]
+        if removed:
+            conn.executemany(f"DELETE FROM {table} WHERE hs_name = ? AND {key_col} = ?", removed)
+            changed += len(removed)
+        staged[(table, hs_name)] = new
+        return changed
+
+    def _write_keyed(self, conn: sqlite3.Connection, staged: dict, table: str,
+                     hs_name: str, rows: Dict[str, str], keys: set) -> int:
+        """只写入登记修改的行，不读取和比对其他行"""
+        key_col = self.KEYED_TABLES[table][0]
+        old = staged.get((table, hs_name), self.saved.get((table, hs_name))) or {}
+        digests = {}
+        for key in keys:
+            payload = rows.get(key)
+            if payload is None:
+                conn.execute(f"DELETE FROM {table} WHERE hs_name = ? AND {key_col} = ?", (hs_name, key))
+                digests[key] = None
+                continue
+            digests[key] = self._digest(payload)
+            if old.get(key) != digests[key]:
+                self._upsert_keyed(conn, table, hs_name, key, payload)
+        self._stage_keyed(staged, table, hs_name, digests)
+        return len(digests)
+
+    def _upsert_keyed(self, conn: sqlite3.Connection, table: str,
+                      hs_name: str, key: str, payload: str | bytes):
+        """按(hs_name, 键列)唯一约束插入或更新一行"""
+        key_col, data_col, time_col = self.KEYED_TABLES[table]
+        conn.execute(
+            f"INSERT INTO {table} (hs_name, {key_col}, {data_col}) VALUES (?, ?, ?) "
+            f"ON CONFLICT(hs_name, {key_col}) DO UPDATE SET "
+            f"{data_col} = excluded.{data_col}, {time_col} = CURRENT_TIMESTAMP",
+            (hs_name, key, payload))
+
+    def _stage_keyed(self, staged: dict, table: str, hs_name: str,
+                     digests: Dict[str, Optional[bytes]]):
+        """
+        按行写入后同步已持久化行的缓存，避免下次整体保存时重复写入
+        :param digests: {键: 写入数据的摘要}，摘要为空表示该行已删除
+        """
+        old = staged.get((table, hs_name), self.saved.get((table, hs_name)))
+        if old is None:  # 尚未缓存，下次整体保存时会重新从数据库比对
+            return
+        new = dict(old)
+        for key, digest in digests.items():
+            if digest is None:
+                new.pop(key, None)
+            else:
+                new[key] = digest
+        staged[(table, hs_name)] = new
+
+    def _diff_listed(self, conn: sqlite3.Connection, staged: dict, table: str,
+                     hs_name: Optional[str], rows: List[tuple]) -> int:
+        """
+        按顺序比对并写入变化的行（vm_tasker），返回写入的行数
+        列表头部被裁剪、尾部追加时只产生对应的DELETE/INSERT，原位修改产生UPDATE
+        :param rows: [(数据列值, ...)]，列名见LISTED_TABLES
+        """
+        columns = self.LISTED_TABLES[table]
+        old = self.saved.get((table, hs_name))
+        if old is None:
+            cursor = conn.execute(
+                f"SELECT id, {', '.join(columns)} FROM {table} WHERE hs_name IS ? ORDER BY id",
+                (hs_name,))
+            old = [(row[0], self._digest(tuple(row[1:]))) for row in cursor.fetchall()]
+        digests = [self._digest(row) for row in rows]
+        # 寻找新列表首行在旧列表中的位置（头部被裁剪的行数）
+        offset = 0
+        if digests and old:
+            for index, (_, old_digest) in enumerate(old):
+                if old_digest != digests[0]:
+                    continue
+                tail = len(old) - index - 1
+                if tail < len(digests) and old[-1][1] == digests[tail]:
+                    offset = index
+                    break
+        removed = [(row_id,) for row_id, _ in old[:offset]]
+        kept = old[offset:]
+        new = []
+        changed = 0
+        set_sql = ", ".join(f"{col} = ?" for col in columns)
+        for index, row in enumerate(rows):
+            if index < len(kept):
+                row_id, old_digest = kept[index]
+                if old_digest != digests[index]:
+                    conn.execute(f"UPDATE {table} SET {set_sql} WHERE id = ?", (*row, row_id))
+                    changed += 1
+            else:
+                cursor = conn.execute(
+                    f"INSERT INTO {table} (hs_name, {', '.join(columns)}) "
+                    f"VALUES (?{', ?' * len(columns)})", (hs_name, *row))
+                row_id = cursor.lastrowid
+                changed += 1
+            new.append((row_id, digests[index]))
+        removed.extend((row_id,) for row_id, _ in kept[len(rows):])
+        if removed:
+            conn.executemany(f"DELETE FROM {table} WHERE id = ?", removed)
+            changed += len(removed)
+        staged[(table, hs_name)] = new
+        return changed
+
+    def _commit(self, conn: sqlite3.Connection, staged: dict):
+        """提交事务并更新已持久化行的缓存"""
+        conn.commit()
+        self.saved.update(staged)
+
     # ==================== 主机配置操作 ====================
     
     def save_host_config(self, hs_name: str, hs_config: HSConfig) -> bool:
         """保存主机配置"""
-        conn = self.get_connection()
-        try:
-            sql = """
-            INSERT OR REPLACE INTO hs_config 
-            (hs_name, server_type, server_addr, server_user, server_pass, 
-             filter_name, images_path, system_path, backup_path, extern_path,
-             launch_path, network_nat, network_pub, i_kuai_addr, i_kuai_user, 
-             i_kuai_pass, ports_start, ports_close, remote_port, system_maps, 
-             public_addr, extend_data, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            """
-            params = (
-                hs_name,
-                hs_config.server_type,
-                hs_config.server_addr,
-                hs_config.server_user,
-                hs_config.server_pass,
-                hs_config.filter_name,
-                hs_config.images_path,
-                hs_config.system_path,
-                hs_config.backup_path,
-                hs_config.extern_path,
-                hs_config.launch_path,
-                hs_config.network_nat,
-                hs_config.network_pub,
-                hs_config.i_kuai_addr,
-                hs_config.i_kuai_user,
-                hs_config.i_kuai_pass,
-                hs_config.ports_start,
-                hs_config.ports_close,
-                hs_config.remote_port,
-                json.dumps(hs_config.system_maps) if hs_config.system_maps else "{}",
-                json.dumps(hs_config.public_addr) if hs_config.public_addr else "[]",
-                json.dumps(hs_config.extend_data) if hs_config.extend_data else "{}"
-            )
-            conn.execute(sql, params)
-            conn.commit()
-            return True
-        except Exception as e:
-            print(f"保存主机配置错误: {e}")
-            conn.rollback()
-            return False
-        finally:
-            conn.close()
+        with self.saving_lock:
+            conn = self.get_connection()
+            try:
+                staged = {}
+                self._save_host_config(conn, staged, hs_name, hs_config)
+                self._commit(conn, staged)
+                return True
+            except Exception as e:
+                print(f"保存主机配置错误: {e}")
+                conn.rollback()
+                return False
+            finally:
+                self.release_connection(conn)
+
+    def _save_host_config(self, conn: sqlite3.Connection, staged: dict,
+                          hs_name: str, hs_config: HSConfig) -> int:
+        params = (
+            hs_name,
+            hs_config.server_type,
+            hs_config.server_addr,
+            hs_config.server_user,
+            hs_config.server_pass,
+            hs_config.filter_name,
+            hs_config.images_path,
+            hs_config.system_path,
+            hs_config.backup_path,
+            hs_config.extern_path,
+            hs_config.launch_path,
+            hs_config.network_nat,
+            hs_config.network_pub,
+            hs_config.i_kuai_addr,
+            hs_config.i_kuai_user,
+            hs_config.i_kuai_pass,
+            hs_config.ports_start,
+            hs_config.ports_close,
+            hs_config.remote_port,
+            json.dumps(hs_config.system_maps) if hs_config.system_maps else "{}",
+            json.dumps(hs_config.public_addr) if hs_config.public_addr else "[]",
+            json.dumps(hs_config.extend_data) if hs_config.extend_data else "{}"
+        )
+        # 配置未变化时跳过写入 =========================================
+        if self.saved.get(("hs_config", hs_name)) == self._digest(params):
+            return 0
+        sql = """
+        INSERT INTO hs_config 
+        (hs_name, server_type, server_addr, server_user, server_pass, 
+         filter_name, images_path, system_path, backup_path, extern_path,
+         launch_path, network_nat, network_pub, i_kuai_addr, i_kuai_user, 
+         i_kuai_pass, ports_start, ports_close, remote_port, system_maps, 
+         public_addr, extend_data, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(hs_name) DO UPDATE SET
+            server_type = excluded.server_type, server_addr = excluded.server_addr,
+            server_user = excluded.server_user, server_pass = excluded.server_pass,
+            filter_name = excluded.filter_name, images_path = excluded.images_path,
+            system_path = excluded.system_path, backup_path = excluded.backup_path,
+            extern_path = excluded.extern_path, launch_path = excluded.launch_path,
+            network_nat = excluded.network_nat, network_pub = excluded.network_pub,
+            i_kuai_addr = excluded.i_kuai_addr, i_kuai_user = excluded.i_kuai_user,
+            i_kuai_pass = excluded.i_kuai_pass, ports_start = excluded.ports_start,
+            ports_close = excluded.ports_close, remote_port = excluded.remote_port,
+            system_maps = excluded.system_maps, public_addr = excluded.public_addr,
+            extend_data = excluded.extend_data, updated_at = CURRENT_TIMESTAMP
+        """
+        conn.execute(sql, params)
+        staged[("hs_config", hs_name)] = self._digest(params)
+        return 1
     
     def get_host_config(self, hs_name: str) -> Optional[Dict[str, Any]]:
         """获取主机配置"""
@@ -164,7 +625,7 @@ class HostDatabase:
                 return dict(row)
             return None
         finally:
-            conn.close()
+            self.release_connection(conn)
     
     def get_all_host_configs(self) -> List[Dict[str, Any]]:
         """获取所有主机配置"""
@@ -173,87 +634,97 @@ class HostDatabase:
             cursor = conn.execute("SELECT * FROM hs_config")
             return [dict(row) for row in cursor.fetchall()]
         finally:
-            conn.close()
+            self.release_connection(conn)
     
     def delete_host_config(self, hs_name: str) -> bool:
         """删除主机配置"""
-        conn = self.get_connection()
-        try:
-            conn.execute("DELETE FROM hs_config WHERE hs_name = ?", (hs_name,))
-            conn.commit()
-            return True
-        except Exception as e:
-            print(f"删除主机配置错误: {e}")
-            conn.rollback()
-            return False
-        finally:
-            conn.close()
+        with self.saving_lock:
+            conn = self.get_connection()
+            try:
+                conn.execute("DELETE FROM hs_config WHERE hs_name = ?", (hs_name,))
+                conn.commit()
+                # 主机已删除，不再保留该主机各表的行摘要和未写入的修改
+                self.forget(hs_name)
+                self.take_dirty(hs_name)
+                return True
+            except Exception as e:
+                print(f"删除主机配置错误: {e}")
+                conn.rollback()
+                return False
+            finally:
+                self.release_connection(conn)
     
     # ==================== 主机状态操作 ====================
     
-    def save_hs_status(self, hs_name: str, hs_status_list: List[Any]) -> bool:
-        """保存主机状态"""
+    def insert_hs_status(self, hs_name: str, status: Any, at: int, rollups: List[tuple]) -> bool:
+        """
+        追加一条主机状态样本并更新汇总表
+        :param at: 样本时间戳（Unix秒）
+        :param rollups: [(hs_name, period, bucket, 各指标值...)]，指标顺序见DataSeries.METRICS
+        """
+        metrics = DataSeries.METRICS
+        columns = ", ".join(f"{m}_min, {m}_sum, {m}_max" for m in metrics)
+        updates = ", ".join(
+            f"{m}_min = MIN({m}_min, excluded.{m}_min), "
+            f"{m}_sum = {m}_sum + excluded.{m}_sum, "
+            f"{m}_max = MAX({m}_max, excluded.{m}_max)" for m in metrics)
+        sql = (f"INSERT INTO hs_rollup (hs_name, period, bucket, samples, {columns}) "
+               f"VALUES (?, ?, ?, 1{', ?, ?, ?' * len(metrics)}) "
+               f"ON CONFLICT(hs_name, period, bucket) DO UPDATE SET samples = samples + 1, {updates}")
+        params = [(*row[:3], *[v for value in row[3:] for v in (value, value, value)]) for row in rollups]
+        with self.saving_lock:
+            conn = self.get_connection()
+            try:
+                conn.execute(
+                    "INSERT INTO hs_status (hs_name, status_data, recorded_at) "
+                    "VALUES (?, ?, datetime(?, 'unixepoch'))", (hs_name, self._encode_status(status), at))
+                conn.executemany(sql, params)
+                conn.commit()
+                return True
+            except Exception as e:
+                print(f"保存主机状态错误: {e}")
+                conn.rollback()
+                return False
+            finally:
+                self.release_connection(conn)
+    
+    def get_hs_status(self, hs_name: str, limit: int = None) -> List[Any]:
+        """获取主机状态（limit不为空时只获取最近的limit条）"""
+        return [data for _, data in self.get_hs_status_series(hs_name, limit)]
+
+    def get_hs_status_series(self, hs_name: str, limit: int = None) -> List[tuple]:
+        """获取主机状态样本及其时间戳 [(Unix秒, 状态字典)]，按时间正序"""
         conn = self.get_connection()
         try:
-            # 清除旧状态
-            conn.execute("DELETE FROM hs_status WHERE hs_name = ?", (hs_name,))
-            
-            # 插入新状态
-            sql = "INSERT INTO hs_status (hs_name, status_data) VALUES (?, ?)"
-            for status in hs_status_list:
-                status_data = json.dumps(status.__dict__() if hasattr(status, '__dict__') else status)
-                conn.execute(sql, (hs_name, status_data))
-            
-            conn.commit()
-            return True
-        except Exception as e:
-            print(f"保存主机状态错误: {e}")
-            conn.rollback()
-            return False
+            cursor = conn.execute(
+                "SELECT * FROM (SELECT id, CAST(strftime('%s', recorded_at) AS INTEGER) AS at, status_data "
+                "FROM hs_status WHERE hs_name = ? ORDER BY id DESC LIMIT ?) ORDER BY id",
+                (hs_name, limit or -1))
+            return [(row["at"], self._decode_status(row["status_data"])) for row in cursor.fetchall()]
         finally:
-            conn.close()
-    
-    def get_hs_status(self, hs_name: str) -> List[Any]:
-        """获取主机状态"""
+            self.release_connection(conn)
+
+    def get_hs_rollup(self, hs_name: str, period: int, start: int, end: int) -> List[sqlite3.Row]:
+        """获取主机状态汇总数据"""
         conn = self.get_connection()
         try:
-            cursor = conn.execute("SELECT status_data FROM hs_status WHERE hs_name = ?", (hs_name,))
-            results = []
-            for row in cursor.fetchall():
-                results.append(json.loads(row["status_data"]))
-            return results
+            cursor = conn.execute(
+                "SELECT * FROM hs_rollup WHERE hs_name = ? AND period = ? AND bucket BETWEEN ? AND ? "
+                "ORDER BY bucket", (hs_name, period, start, end))
+            return cursor.fetchall()
         finally:
-            conn.close()
-    
-    # ==================== 主机存储配置操作 ====================
-    
-
-    
-
+            self.release_connection(conn)
     
     # ==================== 虚拟机存储配置操作 ====================
     
     def save_vm_saving(self, hs_name: str, vm_saving: Dict[str, VMConfig]) -> bool:
-        """保存虚拟机存储配置"""
-        conn = self.get_connection()
-        try:
-            # 清除旧配置
-            conn.execute("DELETE FROM vm_saving WHERE hs_name = ?", (hs_name,))
-            
-            # 插入新配置
-            sql = "INSERT INTO vm_saving (hs_name, vm_uuid, vm_config) VALUES (?, ?, ?)"
-            for vm_uuid, vm_config in vm_saving.items():
-                config_data = json.dumps(vm_config.__dict__() if hasattr(vm_config, '__dict__') else vm_config)
-                conn.execute(sql, (hs_name, vm_uuid, config_data))
-            
-            conn.commit()
-            return True
-        except Exception as e:
-            print(f"保存虚拟机存储配置错误: {e}")
-            conn.rollback()
-            return False
-        finally:
-            conn.close()
+        """保存虚拟机存储配置（仅写入变化的行）"""
+        return self._save_single("保存虚拟机存储配置错误", self._save_vm_saving, hs_name, vm_saving)
+
+    def _save_vm_saving(self, conn: sqlite3.Connection, staged: dict,
+                        hs_name: str, vm_saving: Dict[str, VMConfig], keys: Optional[set] = None) -> int:
+        rows = {vm_uuid: self._to_json(vm_config) for vm_uuid, vm_config in vm_saving.items()}
+        return self._diff_keyed(conn, staged, "vm_saving", hs_name, rows, keys)
     
     def get_vm_saving(self, hs_name: str) -> Dict[str, Any]:
         """获取虚拟机存储配置"""
@@ -265,31 +736,52 @@ class HostDatabase:
                 result[row["vm_uuid"]] = json.loads(row["vm_config"])
             return result
         finally:
-            conn.close()
+            self.release_connection(conn)
     
+    def upsert_vm(self, hs_name: str, vm_uuid: str, vm_config: VMConfig) -> bool:
+        """写入单台虚拟机的存储配置（只写这一行，配置未变化时跳过）"""
+        payload = self._to_json(vm_config)
+        with self.saving_lock:
+            old = self.saved.get(("vm_saving", hs_name))
+            if old is not None and old.get(vm_uuid) == self._digest(payload):
+                return True
+            return self._save_single("保存虚拟机存储配置错误", self._save_vm_row, hs_name,
+                                     ("vm_saving", vm_uuid, payload))
+
+    def delete_vm(self, hs_name: str, vm_uuid: str) -> bool:
+        """删除单台虚拟机的存储配置和状态"""
+        return self._save_single("删除虚拟机错误", self._delete_vm_row, hs_name, vm_uuid)
+
+    def _save_vm_row(self, conn: sqlite3.Connection, staged: dict,
+                     hs_name: str, row: tuple) -> int:
+        table, vm_uuid, payload = row
+        self._upsert_keyed(conn, table, hs_name, vm_uuid, payload)
+        self._stage_keyed(staged, table, hs_name, {vm_uuid: self._digest(payload)})
+        return 1
+
+    def _delete_vm_row(self, conn: sqlite3.Connection, staged: dict,
+                       hs_name: str, vm_uuid: str) -> int:
+        changed = 0
+        for table, (key_col, _, _) in self.KEYED_TABLES.items():
+            cursor = conn.execute(
+                f"DELETE FROM {table} WHERE hs_name = ? AND {key_col} = ?", (hs_name, vm_uuid))
+            self._stage_keyed(staged, table, hs_name, {vm_uuid: None})
+            changed += cursor.rowcount
+        return changed
+
     # ==================== 虚拟机状态操作 ====================
     
     def save_vm_status(self, hs_name: str, vm_status: Dict[str, List[Any]]) -> bool:
-        """保存虚拟机状态"""
-        conn = self.get_connection()
-        try:
-            # 清除旧状态
-            conn.execute("DELETE FROM vm_status WHERE hs_name = ?", (hs_name,))
-            
-            # 插入新状态
-            sql = "INSERT INTO vm_status (hs_name, vm_uuid, status_data) VALUES (?, ?, ?)"
-            for vm_uuid, status_list in vm_status.items():
-                status_data = json.dumps([status.__dict__() if hasattr(status, '__dict__') else status for status in status_list])
-                conn.execute(sql, (hs_name, vm_uuid, status_data))
-            
-            conn.commit()
-            return True
-        except Exception as e:
-            print(f"保存虚拟机状态错误: {e}")
-            conn.rollback()
-            return False
-        finally:
-            conn.close()
+        """保存虚拟机状态（仅写入变化的行）"""
+        return self._save_single("保存虚拟机状态错误", self._save_vm_status, hs_name, vm_status)
+
+    def _save_vm_status(self, conn: sqlite3.Connection, staged: dict,
+                        hs_name: str, vm_status: Dict[str, List[Any]], keys: Optional[set] = None) -> int:
+        rows = {
+            vm_uuid: self._encode_status_list(status_list)
+            for vm_uuid, status_list in vm_status.items()
+        }
+        return self._diff_keyed(conn, staged, "vm_status", hs_name, rows, keys)
     
     def get_vm_status(self, hs_name: str) -> Dict[str, List[Any]]:
         """获取虚拟机状态"""
@@ -298,85 +790,136 @@ class HostDatabase:
             cursor = conn.execute("SELECT vm_uuid, status_data FROM vm_status WHERE hs_name = ?", (hs_name,))
             result = {}
             for row in cursor.fetchall():
-                result[row["vm_uuid"]] = json.loads(row["status_data"])
+                result[row["vm_uuid"]] = self._decode_status(row["status_data"])
             return result
         finally:
-            conn.close()
+            self.release_connection(conn)
     
+    def append_vm_status(self, hs_name: str, vm_uuid: str, status: Any, keep: int = None) -> bool:
+        """
+        在单台虚拟机的状态列表末尾追加一条样本（只读写这一行）
+        :param keep: 列表最多保留的样本数，为空时不限制
+        """
+        def append(status_list: list) -> list:
+            status_list.append(status)
+            return status_list[-keep:] if keep else status_list
+        return self._update_status_row("追加虚拟机状态错误", hs_name, vm_uuid, append)
+
+    def set_vm_power(self, hs_name: str, vm_uuid: str, power: VMPowers) -> bool:
+        """修改单台虚拟机最新状态样本的电源状态（没有样本时追加一条）"""
+        def update(status_list: list) -> list:
+            if not status_list:
+                return [HWStatus(ac_status=power)]
+            latest = status_list[-1]
+            if isinstance(latest, dict):
+                status_list[-1] = {**latest, "ac_status": VMPowers.to_json(power)}
+            else:
+                latest.ac_status = power
+            return status_list
+        return self._update_status_row("修改虚拟机电源状态错误", hs_name, vm_uuid, update)
+
+    def _update_status_row(self, error: str, hs_name: str, vm_uuid: str, change) -> bool:
+        """读取单台虚拟机的状态列表，经change处理后写回同一行"""
+        def saver(conn: sqlite3.Connection, staged: dict, hs_name: str, vm_uuid: str) -> int:
+            row = conn.execute(
+                "SELECT status_data FROM vm_status WHERE hs_name = ? AND vm_uuid = ?",
+                (hs_name, vm_uuid)).fetchone()
+            status_list = self._decode_status(row[0]) if row else []
+            payload = self._encode_status_list(change(status_list))
+            return self._save_vm_row(conn, staged, hs_name, ("vm_status", vm_uuid, payload))
+        return self._save_single(error, saver, hs_name, vm_uuid)
+
     # ==================== 虚拟机任务操作 ====================
     
     def save_vm_tasker(self, hs_name: str, vm_tasker: List[Any]) -> bool:
-        """保存虚拟机任务"""
-        conn = self.get_connection()
-        try:
-            # 清除旧任务
-            conn.execute("DELETE FROM vm_tasker WHERE hs_name = ?", (hs_name,))
-            
-            # 插入新任务
-            sql = "INSERT INTO vm_tasker (hs_name, task_data) VALUES (?, ?)"
-            for tasker in vm_tasker:
-                task_data = json.dumps(tasker.__dict__() if hasattr(tasker, '__dict__') else tasker)
-                conn.execute(sql, (hs_name, task_data))
-            
-            conn.commit()
-            return True
-        except Exception as e:
-            print(f"保存虚拟机任务错误: {e}")
-            conn.rollback()
-            return False
-        finally:
-            conn.close()
+        """保存虚拟机任务（仅写入变化的行）"""
+        return self._save_single("保存虚拟机任务错误", self._save_vm_tasker, hs_name, vm_tasker)
+
+    def _save_vm_tasker(self, conn: sqlite3.Connection, staged: dict,
+                        hs_name: str, vm_tasker: List[Any]) -> int:
+        rows = [(self._to_json(tasker),
+                 1 if (tasker.get('success') if isinstance(tasker, dict)
+                       else getattr(tasker, 'success', False)) else 0)
+                for tasker in vm_tasker]
+        return self._diff_listed(conn, staged, "vm_tasker", hs_name, rows)
     
     def get_vm_tasker(self, hs_name: str) -> List[Any]:
         """获取虚拟机任务"""
         conn = self.get_connection()
         try:
-            cursor = conn.execute("SELECT task_data FROM vm_tasker WHERE hs_name = ?", (hs_name,))
+            cursor = conn.execute("SELECT task_data FROM vm_tasker WHERE hs_name = ? ORDER BY id", (hs_name,))
             results = []
             for row in cursor.fetchall():
                 results.append(json.loads(row["task_data"]))
             return results
         finally:
-            conn.close()
+            self.release_connection(conn)
     
     # ==================== 日志记录操作 ====================
     
-    def save_logger(self, hs_name: str, save_logs: List[ZMessage]) -> bool:
-        """保存日志记录"""
+    def append_logger(self, hs_name: Optional[str], log: ZMessage):
+        """追加一条日志记录（异步批量写入）"""
+        self.logger.append(hs_name, log)
+
+    def flush_logger(self) -> int:
+        """立即写入所有排队中的日志记录，返回写入条数"""
+        return self.logger.flush()
+
+    def insert_logger(self, rows: List[tuple]) -> bool:
+        """
+        批量插入日志记录
+        :param rows: [(hs_name, log_data, log_level, log_action, log_success)]
+        """
+        with self.saving_lock:
+            conn = self.get_connection()
+            try:
+                conn.executemany(
+                    "INSERT INTO hs_logger (hs_name, log_data, log_level, log_action, log_success) "
+                    "VALUES (?, ?, ?, ?, ?)", rows)
+                conn.commit()
+                return True
+            except Exception as e:
+                print(f"保存日志记录错误: {e}")
+                conn.rollback()
+                return False
+            finally:
+                self.release_connection(conn)
+    
+    def get_logger(self, hs_name: str = None, limit: int = None) -> List[Any]:
+        """
+        获取日志记录
+        :param hs_name: 主机名称，为空时获取所有日志
+        :param limit: 仅获取最近的limit条（按时间正序返回）
+        """
         conn = self.get_connection()
         try:
-            # 清除旧日志
-            if hs_name:
-                conn.execute("DELETE FROM hs_logger WHERE hs_name = ?", (hs_name,))
+            where = "WHERE hs_name = ?" if hs_name else ""
+            params = (hs_name,) if hs_name else ()
+            if limit:
+                cursor = conn.execute(
+                    f"SELECT * FROM (SELECT id, log_data, created_at FROM hs_logger {where} "
+                    f"ORDER BY id DESC LIMIT ?) ORDER BY id", (*params, limit))
             else:
-                conn.execute("DELETE FROM hs_logger WHERE hs_name IS NULL")
-            
-            # 插入新日志
-            sql = "INSERT INTO hs_logger (hs_name, log_data, log_level) VALUES (?, ?, ?)"
-            for log in save_logs:
-                log_data = json.dumps(log.__dict__() if hasattr(log, '__dict__') else log)
-                log_level = getattr(log, 'level', 'INFO') if hasattr(log, 'level') else 'INFO'
-                conn.execute(sql, (hs_name, log_data, log_level))
+                # 获取所有日志，而不仅仅是hs_name为NULL的日志
+                cursor = conn.execute(
+                    f"SELECT log_data, created_at FROM hs_logger {where} ORDER BY created_at", params)
             
-            conn.commit()
-            return True
-        except Exception as e:
-            print(f"保存日志记录错误: {e}")
-            conn.rollback()
-            return False
+            results = []
+            for row in cursor.fetchall():
+                log_data = json.loads(row["log_data"])
+                log_data['created_at'] = row["created_at"]
+                results.append(log_data)
+            return results
         finally:
-            conn.close()
-    
-    def get_logger(self, hs_name: str = None) -> List[Any]:
-        """获取日志记录"""
+            self.release_connection(conn)
+
+    def get_global_logger(self, limit: int = None) -> List[Any]:
+        """获取不属于任何主机的全局日志记录（最近的limit条）"""
         conn = self.get_connection()
         try:
-            if hs_name:
-                cursor = conn.execute("SELECT log_data, created_at FROM hs_logger WHERE hs_name = ? ORDER BY created_at", (hs_name,))
-            else:
-                # 获取所有日志，而不仅仅是hs_name为NULL的日志
-                cursor = conn.execute("SELECT log_data, created_at FROM hs_logger ORDER BY created_at")
-            
+            cursor = conn.execute(
+                "SELECT * FROM (SELECT id, log_data, created_at FROM hs_logger WHERE hs_name IS NULL "
+                "ORDER BY id DESC LIMIT ?) ORDER BY id", (limit or -1,))
             results = []
             for row in cursor.fetchall():
                 log_data = json.loads(row["log_data"])
@@ -384,60 +927,440 @@ class HostDatabase:
                 results.append(log_data)
             return results
         finally:
-            conn.close()
-    
-    # ==================== 完整数据保存和加载 ====================
+            self.release_connection(conn)
     
-    def save_host_full_data(self, hs_name: str, host_data: Dict[str, Any]) -> bool:
-        """保存主机的完整数据"""
+    @staticmethod
+    def _page_filter(where: List[str], params: List[Any], start=None, end=None,
+                     after_id: int = None, before_id: int = None) -> str:
+        """
+        追加时间范围和游标条件，返回排序方向
+        after_id不为空时为增量模式（只取更新的行，按ID正序），否则按ID倒序翻页
+        """
+        for value, operator in ((start, ">="), (end, "<=")):
+            if value in (None, ""):
+                continue
+            if str(value).isdigit():  # Unix秒
+                where.append(f"created_at {operator} datetime(?, 'unixepoch')")
+                params.append(int(value))
+            else:
+                where.append(f"created_at {operator} ?")
+                params.append(value)
+        if after_id is not None:
+            where.append("id > ?")
+            params.append(int(after_id))
+            return "ASC"
+        if before_id is not None:
+            where.append("id < ?")
+            params.append(int(before_id))
+        return "DESC"
+
+    def query_logger(self, hs_name: str = None, level: str = None, action: str = None,
+                     success: bool = None, start=None, end=None, after_id: int = None,
+                     before_id: int = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        按条件分页查询日志记录（游标分页，结果按ID倒序）
+        :param start: 起始时间（Unix秒或'YYYY-MM-DD HH:MM:SS'，UTC）
+        :param end: 结束时间
+        :param after_id: 只返回ID大于该值的新日志
+        :param before_id: 只返回ID小于该值的旧日志（下一页）
+        """
+        where, params = [], []
+        if hs_name:
+            where.append("hs_name = ?")
+            params.append(hs_name)
+        if level:
+            where.append("log_level = ?")
+            params.append(level)
+        if action:
+            where.append("log_action = ?")
+            params.append(action)
+        if success is not None:
+            where.append("log_success = ?")
+            params.append(1 if success else 0)
+        order = self._page_filter(where, params, start, end, after_id, before_id)
+        conn = self.get_connection()
         try:
-            success = True
-            
-            # 保存主机配置
-            if 'hs_config' in host_data:
-                hs_config = HSConfig(**host_data['hs_config'])
-                success &= self.save_host_config(hs_name, hs_config)
-            
-            # 保存主机状态
-            if 'hs_status' in host_data:
-                success &= self.save_hs_status(hs_name, host_data['hs_status'])
-            
+            cursor = conn.execute(
+                f"SELECT id, hs_name, log_level, log_data, created_at FROM hs_logger "
+                f"{'WHERE ' + ' AND '.join(where) if where else ''} ORDER BY id {order} LIMIT ?",
+                (*params, limit))
+            rows = cursor.fetchall()
+        finally:
+            self.release_connection(conn)
+        if order == "ASC":
+            rows.reverse()
+        results = []
+        for row in rows:
+            log_data = json.loads(row["log_data"])
+            log_data['id'] = row["id"]
+            log_data['hs_name'] = row["hs_name"]
+            log_data['level'] = row["log_level"]
+            log_data['created_at'] = row["created_at"]
+            results.append(log_data)
+        return results
 
-            
-            # 保存虚拟机存储配置
-            if 'vm_saving' in host_data:
-                vm_saving = {}
-                for uuid, config in host_data['vm_saving'].items():
-                    vm_saving[uuid] = VMConfig(**config) if isinstance(config, dict) else config
-                success &= self.save_vm_saving(hs_name, vm_saving)
-            
-            # 保存虚拟机状态
-            if 'vm_status' in host_data:
-                success &= self.save_vm_status(hs_name, host_data['vm_status'])
-            
-            # 保存虚拟机任务
-            if 'vm_tasker' in host_data:
-                success &= self.save_vm_tasker(hs_name, host_data['vm_tasker'])
-            
-            # 保存日志记录
-            if 'save_logs' in host_data:
-                save_logs = []
-                for log in host_data['save_logs']:
-                    save_logs.append(ZMessage(**log) if isinstance(log, dict) else log)
-                success &= self.save_logger(hs_name, save_logs)
-            
-            return success
+    def query_tasker(self, hs_name: str = None, success: bool = None, start=None, end=None,
+                     after_id: int = None, before_id: int = None,
+                     limit: int = 100) -> List[Dict[str, Any]]:
+        """按条件分页查询任务记录（游标分页，结果按ID倒序），参数同query_logger"""
+        where, params = [], []
+        if hs_name:
+            where.append("hs_name = ?")
+            params.append(hs_name)
+        if success is not None:
+            where.append("task_success = ?")
+            params.append(1 if success else 0)
+        order = self._page_filter(where, params, start, end, after_id, before_id)
+        conn = self.get_connection()
+        try:
+            cursor = conn.execute(
+                f"SELECT id, hs_name, task_data, created_at FROM vm_tasker "
+                f"{'WHERE ' + ' AND '.join(where) if where else ''} ORDER BY id {order} LIMIT ?",
+                (*params, limit))
+            rows = cursor.fetchall()
+        finally:
+            self.release_connection(conn)
+        if order == "ASC":
+            rows.reverse()
+        results = []
+        for row in rows:
+            task_data = json.loads(row["task_data"])
+            task_data['id'] = row["id"]
+            task_data['hs_name'] = row["hs_name"]
+            task_data['created_at'] = row["created_at"]
+            results.append(task_data)
+        return results
+
+    def _fts_tokenize(self) -> Optional[str]:
+        """获取日志全文索引使用的分词器，未建立全文索引时返回None"""
+        if self.fts_tokenize is None:
+            conn = self.get_connection()
+            try:
+                row = conn.execute(
+                    "SELECT sql FROM sqlite_master WHERE name = 'hs_logger_fts'").fetchone()
+            finally:
+                self.release_connection(conn)
+            if row is None:
+                self.fts_tokenize = ""
+            else:
+                self.fts_tokenize = "trigram" if "trigram" in row[0] else "unicode61"
+        return self.fts_tokenize or None
+
+    def search_logger(self, keyword: str, hs_name: str = None, level: str = None,
+                      limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        全文搜索日志（消息、操作、结果），按相关度排序
+        每条结果的snippet为命中片段，命中词用\\x02和\\x03包围；
+        未建立全文索引或关键词过短（trigram分词要求至少3个字符）时退化为LIKE查询，snippet为None
+        :param keyword: 关键词，空格分隔的多个词需同时命中
+        """
+        terms = keyword.split()
+        if not terms:
+            return []
+        tokenize = self._fts_tokenize()
+        where, params = [], []
+        if hs_name:
+            where.append("l.hs_name = ?")
+            params.append(hs_name)
+        if level:
+            where.append("l.log_level = ?")
+            params.append(level)
+        if tokenize and (tokenize != "trigram" or all(len(term) >= 3 for term in terms)):
+            match = " ".join('"%s"' % term.replace('"', '""') for term in terms)
+            sql = ("SELECT l.id, l.hs_name, l.log_level, l.log_data, l.created_at, "
+                   "snippet(hs_logger_fts, -1, char(2), char(3), '…', 24) AS snippet, "
+                   "hs_logger_fts.rank AS score "
+                   "FROM hs_logger_fts JOIN hs_logger l ON l.id = hs_logger_fts.rowid "
+                   f"WHERE hs_logger_fts MATCH ? {''.join(' AND ' + w for w in where)} "
+                   "ORDER BY hs_logger_fts.rank LIMIT ? OFFSET ?")
+            params = [match, *params]
+        else:
+            for term in terms:
+                term = json.dumps(term)[1:-1]  # 与log_data中的JSON转义形式一致
+                where.append("l.log_data LIKE ? ESCAPE '\\'")
+                params.append("%" + term.replace("\\", "\\\\").replace("%", "\\%")
+                              .replace("_", "\\_") + "%")
+            sql = ("SELECT l.id, l.hs_name, l.log_level, l.log_data, l.created_at, "
+                   "NULL AS snippet, NULL AS score FROM hs_logger l "
+                   f"WHERE {' AND '.join(where)} ORDER BY l.id DESC LIMIT ? OFFSET ?")
+        conn = self.get_connection()
+        try:
+            rows = conn.execute(sql, (*params, limit, offset)).fetchall()
+        finally:
+            self.release_connection(conn)
+        results = []
+        for row in rows:
+            log_data = json.loads(row["log_data"])
+            log_data['id'] = row["id"]
+            log_data['hs_name'] = row["hs_name"]
+            log_data['level'] = row["log_level"]
+            log_data['created_at'] = row["created_at"]
+            log_data['snippet'] = row["snippet"]
+            log_data['score'] = row["score"]
+            results.append(log_data)
+        return results
+
+    # ==================== 数据保留与压缩 ====================
+
+    def get_retain_policy(self) -> Dict[str, Dict[str, Any]]:
+        """获取已保存的数据保留策略 {表名: 策略}"""
+        conn = self.get_connection()
+        try:
+            cursor = conn.execute("SELECT table_name, policy FROM hs_retain")
+            return {row["table_name"]: json.loads(row["policy"]) for row in cursor.fetchall()}
+        finally:
+            self.release_connection(conn)
+
+    def set_retain_policy(self, table: str, policy: Dict[str, Any]) -> bool:
+        """保存表的数据保留策略"""
+        conn = self.get_connection()
+        try:
+            conn.execute(
+                "INSERT INTO hs_retain (table_name, policy) VALUES (?, ?) "
+                "ON CONFLICT(table_name) DO UPDATE SET policy = excluded.policy, "
+                "updated_at = CURRENT_TIMESTAMP", (table, json.dumps(policy)))
+            conn.commit()
+            return True
         except Exception as e:
-            print(f"保存主机完整数据错误: {e}")
+            print(f"保存数据保留策略错误: {e}")
+            conn.rollback()
             return False
+        finally:
+            self.release_connection(conn)
+
+    def get_table_hosts(self, table: str) -> List[Optional[str]]:
+        """获取表中出现的所有主机名（包括全局记录的NULL）"""
+        conn = self.get_connection()
+        try:
+            cursor = conn.execute(f"SELECT DISTINCT hs_name FROM {table}")
+            return [row[0] for row in cursor.fetchall()]
+        finally:
+            self.release_connection(conn)
+
+    def get_nth_id(self, table: str, hs_name: Optional[str], keep: int) -> Optional[int]:
+        """获取主机保留最近keep行后，需要删除的最大行ID，不需要删除时返回None"""
+        conn = self.get_connection()
+        try:
+            row = conn.execute(
+                f"SELECT id FROM {table} WHERE hs_name IS ? ORDER BY id DESC LIMIT 1 OFFSET ?",
+                (hs_name, keep)).fetchone()
+            return row[0] if row else None
+        finally:
+            self.release_connection(conn)
+
+    def delete_rows_batch(self, table: str, select_sql: str, params: tuple) -> Dict[Optional[str], int]:
+        """
+        删除一批行并同步裁剪已持久化行的缓存
+        :param select_sql: 选出待删除行的 id, hs_name 的查询语句
+        :return: {hs_name: 删除行数}
+        """
+        with self.saving_lock:
+            conn = self.get_connection()
+            try:
+                rows = conn.execute(select_sql, params).fetchall()
+                conn.executemany(f"DELETE FROM {table} WHERE id = ?", [(row[0],) for row in rows])
+                conn.commit()
+            except Exception as e:
+                print(f"清理{table}数据错误: {e}")
+                conn.rollback()
+                return {}
+            finally:
+                self.release_connection(conn)
+            deleted = {}
+            removed = set()
+            for row_id, hs_name in rows:
+                deleted[hs_name] = deleted.get(hs_name, 0) + 1
+                removed.add(row_id)
+            if table in self.LISTED_TABLES:
+                for hs_name in deleted:
+                    cached = self.saved.get((table, hs_name))
+                    if cached is not None:
+                        self.saved[(table, hs_name)] = [
+                            item for item in cached if item[0] not in removed]
+            return deleted
+
+    def delete_rollup_batch(self, period: int, days: int, limit: int) -> int:
+        """删除一批超过保留天数的汇总数据，返回删除行数"""
+        with self.saving_lock:
+            conn = self.get_connection()
+            try:
+                cursor = conn.execute(
+                    "DELETE FROM hs_rollup WHERE (hs_name, period, bucket) IN ("
+                    "SELECT hs_name, period, bucket FROM hs_rollup "
+                    "WHERE period = ? AND bucket < CAST(strftime('%s', 'now') AS INTEGER) - ? LIMIT ?)",
+                    (period, days * 86400, limit))
+                conn.commit()
+                return cursor.rowcount
+            except Exception as e:
+                print(f"清理hs_rollup数据错误: {e}")
+                conn.rollback()
+                return 0
+            finally:
+                self.release_connection(conn)
+
+    def get_page_stats(self) -> Dict[str, int]:
+        """获取数据库页统计信息"""
+        conn = self.get_connection()
+        try:
+            return {
+                "page_size": conn.execute("PRAGMA page_size").fetchone()[0],
+                "page_count": conn.execute("PRAGMA page_count").fetchone()[0],
+                "freelist_count": conn.execute("PRAGMA freelist_count").fetchone()[0],
+                "auto_vacuum": conn.execute("PRAGMA auto_vacuum").fetchone()[0],
+            }
+        finally:
+            self.release_connection(conn)
+
+    def vacuum_pages(self, step: int = 500, wait: float = 0.05):
+        """
+        回收空闲页并更新查询优化统计
+        增量回收模式下分步执行incremental_vacuum，每步之间让出写锁；
+        未启用增量回收的旧数据库只能整库VACUUM，这里只执行optimize
+        """
+        conn = self.get_connection()
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                remain = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                while remain > 0:
+                    with self.saving_lock:
+                        conn.execute(f"PRAGMA incremental_vacuum({int(step)})").fetchall()
+                        conn.commit()
+                    freed, remain = remain, conn.execute("PRAGMA freelist_count").fetchone()[0]
+                    if remain >= freed:
+                        break
+                    time.sleep(wait)
+            conn.execute("PRAGMA optimize")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except Exception as e:
+            print(f"回收数据库空间错误: {e}")
+        finally:
+            self.release_connection(conn)
+
+    # ==================== 完整数据保存和加载 ====================
+
+    def _save_single(self, error: str, saver, hs_name: Optional[str], data) -> bool:
+        """在单独事务中执行一项增量保存"""
+        with self.saving_lock:
+            conn = self.get_connection()
+            try:
+                staged = {}
+                saver(conn, staged, hs_name, data)
+                self._commit(conn, staged)
+                return True
+            except Exception as e:
+                print(f"{error}: {e}")
+                conn.rollback()
+                return False
+            finally:
+                self.release_connection(conn)
     
+    def save_host_full_data(self, hs_name: str, host_data: Dict[str, Any],
+                            keys: Dict[str, Optional[set]] = None) -> bool:
+        """
+        保存主机的完整数据（单一事务内仅写入变化的行）
+        :param keys: 登记修改的行 {表名: 键集合}（见take_dirty），host_data中该表只包含这些键；
+                     为空或某表为None时该表整体按行摘要比对
+        """
+        keys = keys or {}
+        with self.saving_lock:
+            conn = self.get_connection()
+            try:
+                staged = {}
+                
+                # 保存主机配置
+                if 'hs_config' in host_data:
+                    hs_config = HSConfig(**host_data['hs_config'])
+                    self._save_host_config(conn, staged, hs_name, hs_config)
+                
+                # 主机状态由时序存储（series.record）追加写入，这里不再整体保存
+                
+                # 保存虚拟机存储配置
+                if 'vm_saving' in host_data:
+                    vm_saving = {}
+                    for uuid, config in host_data['vm_saving'].items():
+                        vm_saving[uuid] = VMConfig(**config) if isinstance(config, dict) else config
+                    self._save_vm_saving(conn, staged, hs_name, vm_saving, keys.get('vm_saving'))
+                
+                # 保存虚拟机状态
+                if 'vm_status' in host_data:
+                    self._save_vm_status(conn, staged, hs_name, host_data['vm_status'], keys.get('vm_status'))
+                
+                # 保存虚拟机任务
+                if 'vm_tasker' in host_data:
+                    self._save_vm_tasker(conn, staged, hs_name, host_data['vm_tasker'])
+                
+                # 日志记录通过append_logger追加写入，这里不再整体保存
+                
+                self._commit(conn, staged)
+                return True
+            except Exception as e:
+                print(f"保存主机完整数据错误: {e}")
+                conn.rollback()
+                return False
+            finally:
+                self.release_connection(conn)
+    
+    def get_all_host_data(self, timing: Dict[str, float] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        一次性读取所有主机的完整数据：每张表只查询一次，在同一读事务内按hs_name分组
+        :param timing: 不为空时写入每张表的读取耗时（秒）
+        :return: {hs_name: {"hs_config": 配置行字典, "hs_status": [...], "vm_saving": {...},
+                 "vm_status": {...}, "vm_tasker": [...], "save_logs": [...]}}
+        """
+        timing = timing if timing is not None else {}
+        conn = self.get_connection()
+        try:
+            conn.execute("BEGIN")  # 各表读取使用同一快照
+            started = time.perf_counter()
+            hosts = {}
+            for row in conn.execute("SELECT * FROM hs_config ORDER BY id").fetchall():
+                hosts[row["hs_name"]] = {
+                    "hs_config": dict(row), "hs_status": [], "vm_saving": {},
+                    "vm_status": {}, "vm_tasker": [], "save_logs": []}
+            timing["hs_config"], started = time.perf_counter() - started, time.perf_counter()
+            # 每台主机最近的状态和日志（先按索引选出行ID，再读取数据列）
+            for row in conn.execute(
+                    "SELECT hs_name, status_data FROM hs_status WHERE id IN ("
+                    "SELECT id FROM (SELECT id, ROW_NUMBER() OVER "
+                    "(PARTITION BY hs_name ORDER BY id DESC) AS rn FROM hs_status) WHERE rn <= ?) "
+                    "ORDER BY id", (self.STATUS_WINDOW,)):
+                if row[0] in hosts:
+                    hosts[row[0]]["hs_status"].append(self._decode_status(row[1]))
+            timing["hs_status"], started = time.perf_counter() - started, time.perf_counter()
+            for row in conn.execute("SELECT hs_name, vm_uuid, vm_config FROM vm_saving"):
+                if row[0] in hosts:
+                    hosts[row[0]]["vm_saving"][row[1]] = json.loads(row[2])
+            timing["vm_saving"], started = time.perf_counter() - started, time.perf_counter()
+            for row in conn.execute("SELECT hs_name, vm_uuid, status_data FROM vm_status"):
+                if row[0] in hosts:
+                    hosts[row[0]]["vm_status"][row[1]] = self._decode_status(row[2])
+            timing["vm_status"], started = time.perf_counter() - started, time.perf_counter()
+            for row in conn.execute("SELECT hs_name, task_data FROM vm_tasker ORDER BY id"):
+                if row[0] in hosts:
+                    hosts[row[0]]["vm_tasker"].append(json.loads(row[1]))
+            timing["vm_tasker"], started = time.perf_counter() - started, time.perf_counter()
+            for row in conn.execute(
+                    "SELECT hs_name, log_data, created_at FROM hs_logger WHERE id IN ("
+                    "SELECT id FROM (SELECT id, ROW_NUMBER() OVER "
+                    "(PARTITION BY hs_name ORDER BY id DESC) AS rn FROM hs_logger "
+                    "WHERE hs_name IS NOT NULL) WHERE rn <= ?) ORDER BY id", (self.LOGS_WINDOW,)):
+                if row[0] in hosts:
+                    log_data = json.loads(row[1])
+                    log_data['created_at'] = row[2]
+                    hosts[row[0]]["save_logs"].append(log_data)
+            timing["hs_logger"] = time.perf_counter() - started
+            return hosts
+        finally:
+            conn.rollback()  # 只读事务，结束快照
+            self.release_connection(conn)
+
     def get_host_full_data(self, hs_name: str) -> Dict[str, Any]:
         """获取主机的完整数据"""
         return {
             "hs_config": self.get_host_config(hs_name),
-            "hs_status": self.get_hs_status(hs_name),
+            "hs_status": self.get_hs_status(hs_name, self.STATUS_WINDOW),
             "vm_saving": self.get_vm_saving(hs_name),
             "vm_status": self.get_vm_status(hs_name),
             "vm_tasker": self.get_vm_tasker(hs_name),
-            "save_logs": self.get_logger(hs_name)
-        }
\ No newline at end of file
+            "save_logs": self.get_logger(hs_name, self.LOGS_WINDOW)
+        }
@@ -0,0 +1,234 @@
+import os
+import json
+import sqlite3
+from typing import List
+
+
+class DataMigrate:
+    """数据库结构版本迁移：按版本号依次执行未执行过的迁移步骤，并记录到hs_migration_log"""
+
+    # 迁移步骤: (版本号, 说明, 处理方法名)，只能追加，不能修改已发布的步骤
+    MIGRATIONS = [
+        (1, "基线表结构 (HostManage.sql)", "migrate_baseline"),
+        (2, "hs_config补全爱快OS/端口/映射/扩展字段", "migrate_host_columns"),
+        (3, "hs_global添加状态数据紧凑格式开关", "migrate_packed_flag"),
+        (4, "日志/任务表添加筛选字段和分页索引", "migrate_query_columns"),
+        (5, "日志全文索引 (FTS5)", "migrate_logger_fts"),
+        (6, "vm_status按主机和虚拟机唯一", "migrate_status_unique"),
+        (7, "日志/任务按主机和ID排序的分页索引", "migrate_page_index"),
+    ]
+    # 基线结构文件名
+    SCHEMA_FILE = "HostManage.sql"
+
+    def __init__(self, db):
+        """
+        :param db: HostDatabase实例
+        """
+        self.db = db
+
+    # 目标版本 =================================================
+    @property
+    def latest(self) -> int:
+        return self.MIGRATIONS[-1][0]
+
+    # 读取当前版本 =============================================
+    @staticmethod
+    def current(conn: sqlite3.Connection) -> int:
+        try:
+            row = conn.execute(
+                "SELECT MAX(CAST(version AS INTEGER)) FROM hs_migration_log").fetchone()
+            return row[0] or 0
+        except sqlite3.OperationalError:  # 迁移记录表不存在，尚未初始化
+            return 0
+
+    # 执行迁移 =================================================
+    def upgrade(self) -> int:
+        """
+        执行所有未执行的迁移步骤，结构已是最新时只执行一次版本查询
+        :return: 迁移后的版本号
+        """
+        conn = self.db.get_connection()
+        try:
+            version = self.current(conn)
+            if version >= self.latest:
+                return version
+            # 获取写锁后重新读取版本，避免多个进程重复迁移
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = self.current(conn)
+                for number, description, handler in self.MIGRATIONS:
+                    if number <= version:
+                        continue
+                    getattr(self, handler)(conn)
+                    conn.execute(
+                        "INSERT INTO hs_migration_log (version, description) VALUES (?, ?)",
+                        (str(number), description))
+                    print(f"[Migrate] 已升级数据库到版本{number}: {description}")
+                    version = number
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            return version
+        finally:
+            self.db.release_connection(conn)
+
+    # 分割SQL脚本 ==============================================
+    @staticmethod
+    def split(script: str) -> List[str]:
+        """按完整语句分割SQL脚本，正确处理字符串、注释和触发器中的分号"""
+        statements = []
+        buffer = ""
+        for part in script.split(";"):
+            buffer += part + ";"
+            if sqlite3.complete_statement(buffer):
+                statements.append(buffer.strip())
+                buffer = ""
+        # 末尾剩余的只可能是注释或空白（不以分号结尾的语句视为不完整）
+        return [stmt for stmt in statements if DataMigrate.strip_comments(stmt) != ";"]
+
+    # 去除注释 =================================================
+    @staticmethod
+    def strip_comments(statement: str) -> str:
+        lines = [line for line in statement.splitlines() if not line.strip().startswith("--")]
+        return "".join(lines).strip()
+
+    # 查找基线结构文件 =========================================
+    def schema_path(self) -> str:
+        """优先使用程序自带的HostConfig/HostManage.sql，其次使用数据库目录下的副本"""
+        bundled = os.path.join(os.path.dirname(__file__), "..", "HostConfig", self.SCHEMA_FILE)
+        if os.path.exists(bundled):
+            return os.path.normpath(bundled)
+        return os.path.join(os.path.dirname(self.db.db_path), self.SCHEMA_FILE)
+
+    # 版本1: 基线表结构 ========================================
+    def migrate_baseline(self, conn: sqlite3.Connection):
+        with open(self.schema_path(), "r", encoding="utf-8") as f:
+            script = f.read()
+        for statement in self.split(script):
+            conn.execute(statement)
+
+    # 版本2: 旧数据库补全hs_config字段 =========================
+    def migrate_host_columns(self, conn: sqlite3.Connection):
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(hs_config)").fetchall()}
+        for name, define in (
+                ("i_kuai_addr", "TEXT DEFAULT ''"),
+                ("i_kuai_user", "TEXT DEFAULT ''"),
+                ("i_kuai_pass", "TEXT DEFAULT ''"),
+                ("ports_start", "INTEGER DEFAULT 0"),
+                ("ports_close", "INTEGER DEFAULT 0"),
+                ("remote_port", "INTEGER DEFAULT 0"),
+                ("system_maps", "TEXT DEFAULT '{}'"),
+                ("public_addr", "TEXT DEFAULT '[]'"),
+                ("extend_data", "TEXT DEFAULT '{}'")):
+            if name not in columns:
+                conn.execute(f"ALTER TABLE hs_config ADD COLUMN {name} {define}")
+
+    # 版本3: 状态数据紧凑格式开关 ==============================
+    def migrate_packed_flag(self, conn: sqlite3.Connection):
+        conn.execute("ALTER TABLE hs_global ADD COLUMN packed INTEGER DEFAULT 0")
+
+    # 版本4: 日志/任务筛选字段和分页索引 =======================
+    def migrate_query_columns(self, conn: sqlite3.Connection):
+        logger = {row[1] for row in conn.execute("PRAGMA table_info(hs_logger)").fetchall()}
+        if "log_action" not in logger:
+            conn.execute("ALTER TABLE hs_logger ADD COLUMN log_action TEXT DEFAULT ''")
+        if "log_success" not in logger:
+            conn.execute("ALTER TABLE hs_logger ADD COLUMN log_success INTEGER DEFAULT 1")
+        tasker = {row[1] for row in conn.execute("PRAGMA table_info(vm_tasker)").fetchall()}
+        if "task_success" not in tasker:
+            conn.execute("ALTER TABLE vm_tasker ADD COLUMN task_success INTEGER DEFAULT 0")
+        # 回填已有记录 =========================================
+        rows = conn.execute("SELECT id, log_data FROM hs_logger").fetchall()
+        conn.executemany(
+            "UPDATE hs_logger SET log_action = ?, log_success = ? WHERE id = ?",
+            [(str(data.get("actions") or ""), 1 if data.get("success", True) else 0, row[0])
+             for row in rows for data in (self.load_json(row[1]),)])
+        rows = conn.execute("SELECT id, task_data FROM vm_tasker").fetchall()
+        conn.executemany(
+            "UPDATE vm_tasker SET task_success = ? WHERE id = ?",
+            [(1 if self.load_json(row[1]).get("success") else 0, row[0]) for row in rows])
+        # 分页查询索引（普通索引隐含rowid，可直接按id排序翻页） ===
+        for statement in (
+                "CREATE INDEX IF NOT EXISTS idx_hs_logger_host_created ON hs_logger(hs_name, created_at)",
+                "CREATE INDEX IF NOT EXISTS idx_hs_logger_host_level ON hs_logger(hs_name, log_level)",
+                "CREATE INDEX IF NOT EXISTS idx_hs_logger_level_id ON hs_logger(log_level)",
+                "CREATE INDEX IF NOT EXISTS idx_hs_logger_action ON hs_logger(log_action)",
+                "CREATE INDEX IF NOT EXISTS idx_hs_logger_success ON hs_logger(log_success)",
+                "CREATE INDEX IF NOT EXISTS idx_vm_tasker_host_created ON vm_tasker(hs_name, created_at)"):
+            conn.execute(statement)
+
+    # 版本5: 日志全文索引 =====================================
+    # 外部内容表指向从log_data提取文本的视图，由触发器在插入/删除日志时同步
+    LOGGER_FTS = """
+        CREATE VIEW IF NOT EXISTS hs_logger_text AS
+        SELECT id,
+               json_extract(log_data, '$.message') AS message,
+               json_extract(log_data, '$.actions') AS actions,
+               json_extract(log_data, '$.results') AS results
+        FROM hs_logger;
+
+        CREATE VIRTUAL TABLE IF NOT EXISTS hs_logger_fts USING fts5(
+            message, actions, results,
+            content = 'hs_logger_text', content_rowid = 'id', tokenize = '{tokenize}'
+        );
+
+        CREATE TRIGGER IF NOT EXISTS hs_logger_fts_insert AFTER INSERT ON hs_logger BEGIN
+            INSERT INTO hs_logger_fts (rowid, message, actions, results) VALUES (
+                new.id,
+                json_extract(new.log_data, '$.message'),
+                json_extract(new.log_data, '$.actions'),
+                json_extract(new.log_data, '$.results'));
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS hs_logger_fts_delete AFTER DELETE ON hs_logger BEGIN
+            INSERT INTO hs_logger_fts (hs_logger_fts, rowid, message, actions, results) VALUES (
+                'delete', old.id,
+                json_extract(old.log_data, '$.message'),
+                json_extract(old.log_data, '$.actions'),
+                json_extract(old.log_data, '$.results'));
+        END;
+
+        INSERT INTO hs_logger_fts (hs_logger_fts) VALUES ('rebuild');
+    """
+
+    def migrate_logger_fts(self, conn: sqlite3.Connection):
+        # SQLite未编译JSON1/FTS5时跳过，日志搜索退化为LIKE查询
+        try:
+            conn.execute("SELECT json_extract('{}', '$.a')")
+            conn.execute("CREATE VIRTUAL TABLE temp.fts_probe USING fts5(a)")
+            conn.execute("DROP TABLE temp.fts_probe")
+        except sqlite3.OperationalError as e:
+            print(f"[Migrate] 当前SQLite不支持全文索引，跳过: {e}")
+            return
+        # trigram分词支持中文和任意子串匹配（SQLite 3.34+）
+        tokenize = "trigram" if sqlite3.sqlite_version_info >= (3, 34, 0) else "unicode61"
+        for statement in self.split(self.LOGGER_FTS.replace("{tokenize}", tokenize)):
+            conn.execute(statement)
+
+    # 版本6: vm_status唯一约束 ================================
+    def migrate_status_unique(self, conn: sqlite3.Connection):
+        # 旧版本按先更新后插入写入，并发时可能产生重复行，只保留最新的一行
+        conn.execute(
+            "DELETE FROM vm_status WHERE id NOT IN "
+            "(SELECT MAX(id) FROM vm_status GROUP BY hs_name, vm_uuid)")
+        conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_vm_status_host_uuid ON vm_status(hs_name, vm_uuid)")
+
+    # 版本7: 按主机和ID排序的分页索引 ========================
+    def migrate_page_index(self, conn: sqlite3.Connection):
+        # 按主机加时间范围查询时，(hs_name, created_at)索引需要额外排序才能按ID翻页
+        # 改为按(hs_name, id)排序并带上created_at，时间条件在索引内过滤，取满一页即停止
+        for table in ("hs_logger", "vm_tasker"):
+            conn.execute(f"DROP INDEX IF EXISTS idx_{table}_host_created")
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{table}_host_id ON {table}(hs_name, id, created_at)")
+
+    # 解析JSON（损坏的记录视为空字典） ==========================
+    @staticmethod
+    def load_json(text) -> dict:
+        try:
+            data = json.loads(text)
+            return data if isinstance(data, dict) else {}
+        except (TypeError, ValueError):
+            return {}
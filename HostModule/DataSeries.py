@@ -0,0 +1,100 @@
+import time
+import threading
+from collections import deque
+from typing import Dict, Any, Optional
+
+from MainObject.Public.HWStatus import HWStatus
+
+
+class DataSeries:
+    """主机状态时序存储：原始样本保存在有界环形缓冲区，并按1m/5m/1h/1d自动汇总"""
+
+    # 汇总粒度（秒）
+    PERIODS = (60, 300, 3600, 86400)
+    # 参与汇总的指标
+    METRICS = ("cpu_usage", "mem_usage", "hdd_usage",
+               "network_u", "network_d", "cpu_heats", "cpu_power")
+
+    def __init__(self, db, raw_size: int = 1440):
+        """
+        :param db: HostDatabase实例
+        :param raw_size: 每台主机在内存中保留的原始样本数
+        """
+        self.db = db
+        self.raw_size = raw_size
+        self.rings: Dict[str, deque] = {}  # hs_name -> deque[(时间戳, HWStatus)]
+        self.locker = threading.Lock()
+
+    # 获取主机的环形缓冲区（首次访问时从数据库加载） ===========
+    def ring(self, hs_name: str) -> deque:
+        with self.locker:
+            if hs_name in self.rings:
+                return self.rings[hs_name]
+        ring = deque(maxlen=self.raw_size)
+        for at, data in self.db.get_hs_status_series(hs_name, self.raw_size):
+            ring.append((at, HWStatus(**data)))
+        with self.locker:
+            return self.rings.setdefault(hs_name, ring)
+
+    # 记录一个样本 =============================================
+    def record(self, hs_name: str, status: HWStatus, at: int = None) -> bool:
+        at = int(at if at is not None else time.time())
+        self.ring(hs_name).append((at, status))
+        values = [self.metric(status, name) for name in self.METRICS]
+        return self.db.insert_hs_status(hs_name, status, at, [
+            (hs_name, period, at - at % period, *values) for period in self.PERIODS])
+
+    # 删除主机的缓存 ===========================================
+    def forget(self, hs_name: str):
+        with self.locker:
+            self.rings.pop(hs_name, None)
+
+    # 最新样本 =================================================
+    def latest(self, hs_name: str) -> Optional[tuple]:
+        ring = self.ring(hs_name)
+        return ring[-1] if ring else None
+
+    # 查询区间数据 =============================================
+    def query(self, hs_name: str, start: int = None, end: int = None,
+              max_points: int = 360) -> Dict[str, Any]:
+        """
+        按时间区间查询状态，自动选择能在max_points内覆盖区间的最细粒度
+        :return: {"period": 0表示原始样本/汇总秒数, "points": [...]}
+        """
+        end = int(end if end is not None else time.time())
+        start = int(start if start is not None else end - 3600)
+        span = max(end - start, 1)
+        # 原始样本覆盖区间且点数不超限时直接返回 ===================
+        ring = list(self.ring(hs_name))
+        if ring and ring[0][0] <= start:
+            points = [
+                {"at": at, **{name: self.metric(status, name) for name in self.METRICS}}
+                for at, status in ring if start <= at <= end
+            ]
+            if len(points) <= max_points:
+                return {"period": 0, "start": start, "end": end, "points": points}
+        # 选择汇总粒度 =============================================
+        period = self.PERIODS[-1]
+        for candidate in self.PERIODS:
+            if span / candidate <= max_points:
+                period = candidate
+                break
+        points = []
+        for row in self.db.get_hs_rollup(hs_name, period, start - start % period, end):
+            samples = row["samples"] or 1
+            point = {"at": row["bucket"], "samples": row["samples"]}
+            for name in self.METRICS:
+                point[name] = {
+                    "min": row[f"{name}_min"],
+                    "avg": round(row[f"{name}_sum"] / samples, 2),
+                    "max": row[f"{name}_max"],
+                }
+            points.append(point)
+        return {"period": period, "start": start, "end": end, "points": points}
+
+    # 读取指标值 ===============================================
+    @staticmethod
+    def metric(status, name: str) -> int:
+        if isinstance(status, dict):
+            return status.get(name, 0) or 0
+        return getattr(status, name, 0) or 0
@@ -0,0 +1,150 @@
+import time
+import threading
+import contextlib
+from typing import Dict, List, Callable, ContextManager, Optional, Any
+
+
+class DataTicket:
+    """持久化凭据：登记的变更写入数据库后完成，调用方可等待以保证读到自己的写入"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.success = False
+
+    # 标记完成 =================================================
+    def done(self, success: bool):
+        self.success = success
+        self.event.set()
+
+    # 等待写入完成 =============================================
+    def wait(self, timeout: float = None) -> bool:
+        """
+        :param timeout: 最长等待时间（秒），为空时一直等待
+        :return: 是否已成功写入数据库
+        """
+        return self.event.wait(timeout) and self.success
+
+
+class DataWriter:
+    """延迟写入服务：接口只登记"哪台主机的哪部分数据(哪些行)变了"，由后台线程合并后只写入登记的行"""
+
+    # 可登记的数据部分
+    PARTS = ("hs_config", "vm_saving", "vm_status", "vm_tasker")
+
+    def __init__(self, db, source: Callable[[str, dict], Optional[Dict[str, Any]]],
+                 delay: float = 0.2, guard: Optional[Callable[[str], ContextManager]] = None):
+        """
+        :param db: HostDatabase实例
+        :param source: 读取主机待保存数据的回调 (主机名, 登记的修改{表名: 键集合或None}) -> host_data，
+                       主机已删除时返回None
+        :param delay: 合并窗口（秒），窗口内对同一主机的多次登记只写入一次
+        :param guard: 返回主机读锁上下文的回调 (主机名)，读取和写入在该锁内完成，
+                      压缩任务在主机写锁内删除行时不会写入删除前读取的数据
+        """
+        self.db = db
+        self.source = source
+        self.guard = guard
+        self.delay = delay
+        self.pending: set = set()  # 有待写入变更的主机（变更的行登记在db.dirty）
+        self.tickets: Dict[str, List[DataTicket]] = {}  # hs_name -> 等待中的凭据
+        self.locker = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.thread: threading.Thread | None = None
+        self.stopped = False
+        self.marked = 0  # 累计登记次数
+        self.written = 0  # 累计写入主机次数
+
+    # 登记变更 =================================================
+    def mark(self, hs_name: str, *parts: str, keys: tuple = ()) -> DataTicket:
+        """
+        登记主机数据变更
+        :param parts: 变化的数据部分，为空时表示全部
+        :param keys: 变化的虚拟机UUID（vm_saving/vm_status），为空时整个数据部分按行摘要比对
+        :return: 持久化凭据
+        """
+        for part in parts or self.PARTS:
+            self.db.mark_dirty(part, hs_name, *keys)
+        ticket = DataTicket()
+        with self.locker:
+            stopped = self.stopped
+            if not stopped:
+                self.pending.add(hs_name)
+                self.tickets.setdefault(hs_name, []).append(ticket)
+                self.marked += 1
+                self.locker.notify()
+        # 已停止时直接写入（在self.locker外，写入时要获取主机锁）
+        if stopped:
+            ticket.done(self.write(hs_name))
+            return ticket
+        self.start()
+        return ticket
+
+    # 丢弃主机的待写入变更（主机已删除） =======================
+    def discard(self, hs_name: str):
+        with self.locker:
+            self.pending.discard(hs_name)
+            for ticket in self.tickets.pop(hs_name, []):
+                ticket.done(True)
+
+    # 启动写入线程 =============================================
+    def start(self):
+        if self.thread is not None:
+            return
+        with self.locker:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="DataWriter", daemon=True)
+                self.thread.start()
+
+    # 写入线程主循环 ===========================================
+    def run(self):
+        while True:
+            with self.locker:
+                while not self.pending and not self.stopped:
+                    self.locker.wait()
+                if self.stopped:
+                    return
+            time.sleep(self.delay)
+            self.flush()
+
+    # 立即写入所有待写入的变更 =================================
+    def flush(self) -> bool:
+        with self.flush_lock:
+            with self.locker:
+                pending, self.pending = self.pending, set()
+                tickets, self.tickets = self.tickets, {}
+            success = True
+            for hs_name in pending:
+                result = self.write(hs_name)
+                for ticket in tickets.get(hs_name, []):
+                    ticket.done(result)
+                success &= result
+            return success
+
+    # 写入单台主机 =============================================
+    def write(self, hs_name: str) -> bool:
+        """只写入主机登记修改的行（也用于定时保存），写入失败的修改放回，下次重试"""
+        dirty = {}
+        try:
+            with self.guard(hs_name) if self.guard else contextlib.nullcontext():
+                dirty = self.db.take_dirty(hs_name)
+                if not dirty:
+                    return True
+                host_data = self.source(hs_name, dirty)
+                if host_data is None:
+                    return True
+                self.written += 1
+                if self.db.save_host_full_data(hs_name, host_data, dirty):
+                    return True
+        except Exception as e:
+            print(f"[DataWriter] 保存主机{hs_name}数据出错: {e}")
+        self.db.keep_dirty(hs_name, dirty)
+        return False
+
+    # 停止写入线程并写入剩余变更 ===============================
+    def close(self):
+        with self.locker:
+            self.stopped = True
+            self.locker.notify_all()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5)
+        self.flush()
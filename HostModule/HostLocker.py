@@ -0,0 +1,123 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# 加锁顺序 #####################################################################
+# 同时持有多把锁时必须按以下顺序获取，反向获取会造成死锁：
+#   0. DataCompact.running、DataWriter.flush_lock  压缩/延迟写入的任务锁，
+#                              持有期间按主机获取读锁/写锁，再获取数据库锁
+#   1. HostManage.engine_lock  主机表（添加/删除/替换主机时写，遍历主机时读）
+#   2. HostManage.building     单台主机的快照生成锁（生成时再获取该主机的读锁）
+#   3. BaseServer.locker       单台主机的内存数据（vm_saving/vm_status/vm_tasker）
+#                              同一线程一次只持有一台主机的锁，多台主机逐台加锁
+#   4. 叶子锁：HostManage.snapshot_lock、HostRunner.busy_lock、HostSchedule.locker、
+#      DataWriter.locker、HostDatabase内部的锁，持有期间不再获取上面的任何锁
+# API读取主机和虚拟机列表时使用已发布的HostSnapshot，不获取以上任何锁
+# 约定：
+#   - 持有主机写锁时不访问远程接口（VMRest/iKuai）也不等待其他线程，
+#     Crontabs等耗时操作先写入局部变量，完成后在写锁内整体替换
+#   - 持有主机写锁时可以写入数据库的单行数据（数据库锁是叶子锁）
+#   - 写锁可重入，持有写锁的线程可以再获取读锁；读锁可重入，但不能升级为写锁
+# ##############################################################################
+
+
+class HostLocker:
+    """读写锁：多个读者可同时持有，写者独占；有写者等待时新的读者排队（写者优先，避免写者饥饿）"""
+
+    def __init__(self):
+        self.changed = threading.Condition(threading.Lock())
+        self.readers: dict[int, int] = {}  # 线程ID -> 重入次数
+        self.writer: int | None = None  # 持有写锁的线程ID
+        self.writes = 0  # 写锁重入次数
+        self.waiting = 0  # 等待中的写者数量
+        # 竞争统计 =============================================
+        self.contended = 0  # 需要等待才能获取锁的次数
+        self.wait_seconds = 0.0  # 累计等待时间
+        self.max_wait = 0.0
+
+    # 获取读锁 =================================================
+    def acquire_read(self):
+        ident = threading.get_ident()
+        with self.changed:
+            # 重入的读者和持有写锁的线程不排队，否则会与等待中的写者互相等待
+            if ident in self.readers or self.writer == ident:
+                self.readers[ident] = self.readers.get(ident, 0) + 1
+                return
+            if self.writer is not None or self.waiting:
+                started = time.perf_counter()
+                while self.writer is not None or self.waiting:
+                    self.changed.wait()
+                self.count_wait(time.perf_counter() - started)
+            self.readers[ident] = 1
+
+    # 释放读锁 =================================================
+    def release_read(self):
+        ident = threading.get_ident()
+        with self.changed:
+            depth = self.readers[ident] - 1
+            if depth:
+                self.readers[ident] = depth
+                return
+            del self.readers[ident]
+            if not self.readers:
+                self.changed.notify_all()
+
+    # 获取写锁 =================================================
+    def acquire_write(self):
+        ident = threading.get_ident()
+        with self.changed:
+            if self.writer == ident:
+                self.writes += 1
+                return
+            if ident in self.readers:
+                raise RuntimeError("HostLocker: cannot upgrade read lock to write lock")
+            if self.writer is not None or self.readers:
+                started = time.perf_counter()
+                self.waiting += 1
+                try:
+                    while self.writer is not None or self.readers:
+                        self.changed.wait()
+                finally:
+                    self.waiting -= 1
+                self.count_wait(time.perf_counter() - started)
+            self.writer, self.writes = ident, 1
+
+    # 释放写锁 =================================================
+    def release_write(self):
+        with self.changed:
+            self.writes -= 1
+            if not self.writes:
+                self.writer = None
+                self.changed.notify_all()
+
+    # 上下文管理 ===============================================
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield self
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield self
+        finally:
+            self.release_write()
+
+    # 记录等待（调用方持有changed） ============================
+    def count_wait(self, seconds: float):
+        self.contended += 1
+        self.wait_seconds += seconds
+        self.max_wait = max(self.max_wait, seconds)
+
+    # 竞争统计 =================================================
+    def stats(self) -> dict:
+        with self.changed:
+            return {
+                "contended": self.contended,
+                "wait_seconds": round(self.wait_seconds, 3),
+                "max_wait": round(self.max_wait, 3),
+            }
@@ -1,25 +1,68 @@
+import os
 import json
+import math
+import time
 import secrets
+import threading
 import traceback
+import contextlib
+from collections import deque
 
 from HostServer.Template import BaseServer
 from MainObject.Config.HSConfig import HSConfig
-from MainObject.Server.HSEngine import HEConfig
+from MainObject.Server.HSEngine import HEImport
 from MainObject.Config.VMConfig import VMConfig
 from MainObject.Config.NCConfig import NCConfig
 from MainObject.Public.ZMessage import ZMessage
 from HostModule.DataManage import HostDatabase
+from HostModule.DataBackup import DataBackup
+from HostModule.DataCompact import DataCompact
+from HostModule.DataWriter import DataWriter, DataTicket
+from HostModule.HostRunner import HostRunner
+from HostModule.HostLocker import HostLocker
+from HostModule.HostSnapshot import HostSnapshot
+from HostModule.HostSchedule import HostSchedule
 
 
 class HostManage:
     # 初始化 #####################################################################
     def __init__(self):
+        # 主机表：添加/删除/替换主机时持有engine_lock写锁，遍历主机时使用hosts()返回的副本
+        # 每台主机的内存数据由server.locker保护，加锁顺序见HostModule/HostLocker.py
         self.engine: dict[str, BaseServer] = {}
-        self.logger: list[ZMessage] = []
+        self.engine_lock = HostLocker()
+        self.logger: deque[ZMessage] = deque(maxlen=1000)  # 最近的全局日志
         self.bearer: str = ""
         self.saving: str = "./DataSaving"
         # 初始化数据库
         self.db = HostDatabase(self.saving + "/hostmanage.db")
+        # 数据保留与压缩任务
+        self.compact = DataCompact(self.db, on_trim=self.trim_data,
+                                   guard=lambda hs_name: self.host_lock(hs_name, write=True))
+        # 在线备份任务（备份到saving目录下的backup子目录）
+        self.backup = DataBackup(self.db, lambda: os.path.join(self.saving, "backup"))
+        # 延迟合并写入服务
+        self.writer = DataWriter(self.db, self.host_data, guard=self.host_lock)
+        # 主机并发启动/停止执行器
+        self.runner = HostRunner(workers=16, timeout=30.0)
+        # 最近一次加载的耗时报告
+        self.load_report: dict = {}
+        # 最近一次启动/停止各主机的结果 {"load": {...}, "exit": {...}}
+        self.readiness: dict = {}
+        # 定时任务: 默认间隔（秒）、单台主机限时（秒）、各主机执行指标
+        self.cron_interval: float = 60.0
+        self.cron_timeout: float = 45.0
+        self.cron_stats: dict[str, dict] = {}
+        # 单独设置了间隔的主机（hs_config.extend_data["cron_interval"]），各自一个定时任务
+        self.cron_custom: set[str] = set()
+        self.schedule = HostSchedule()
+        # 已发布的主机快照: hs_name -> HostSnapshot，整体替换引用发布，读取时不加锁
+        self.snapshots: dict[str, HostSnapshot] = {}
+        # 每台主机的快照生成锁，同一时刻只有一个线程生成同一台主机的快照
+        self.building: dict[str, threading.Lock] = {}
+        self.snapshot_lock = threading.Lock()
+        # 内存数据已从数据库加载的主机，未加载（冷缓存）时首次读取会访问数据库
+        self.loaded: set[str] = set()
         # 从数据库加载全局配置
         self._load_global_config()
 
@@ -29,6 +72,7 @@ class HostManage:
         global_config = self.db.get_global_config()
         self.bearer = global_config.get("bearer", "")
         self.saving = global_config.get("saving", "./DataSaving")
+        self.db.packed = global_config.get("packed", False)
 
         # 如果Token为空，自动生成一个新的Token
         if not self.bearer:
@@ -41,7 +85,7 @@ class HostManage:
     def __dict__(self):
         return {
             "engine": {
-                string: server.__dict__() for string, server in self.engine.items()
+                string: server.__dict__() for string, server in self.hosts().items()
             },
             "logger": [
                 logger.__dict__() for logger in self.logger
@@ -49,6 +93,12 @@ class HostManage:
             "bearer": self.bearer
         }
 
+    # 主机表副本 #################################################################
+    def hosts(self) -> dict[str, BaseServer]:
+        """返回主机表的副本，遍历期间添加或删除主机不影响遍历"""
+        with self.engine_lock.read():
+            return dict(self.engine)
+
     # 设置/重置访问Token ##########################################################
     def set_pass(self, bearer: str = "") -> str:
         """
@@ -74,31 +124,174 @@ class HostManage:
         """
         return token and token == self.bearer
 
+    # 登记主机数据变更 ###########################################################
+    def mark(self, hs_name: str, *parts: str, keys: tuple = ()) -> DataTicket:
+        """
+        登记主机数据变更，由后台线程合并后写入数据库
+        :param parts: 变化的数据部分（hs_config/vm_saving/vm_status/vm_tasker），为空表示全部
+        :param keys: 变化的虚拟机UUID，指定时只写入这些虚拟机的行
+        :return: 持久化凭据，需要读到自己的写入时调用wait()
+        """
+        self.invalidate(hs_name)
+        return self.writer.mark(hs_name, *parts, keys=keys)
+
+    # 读取缓存失效 ###############################################################
+    def invalidate(self, hs_name: str):
+        """主机内存数据被修改后调用：递增主机版本号，已发布的快照随之过期"""
+        server = self.engine.get(hs_name)
+        if server is not None:
+            server.touch()
+
+    # 加载主机数据 ###############################################################
+    def load_host(self, hs_name: str) -> BaseServer | None:
+        """获取主机实例，内存数据尚未从数据库加载时先加载一次"""
+        server = self.engine.get(hs_name)
+        if server is None:
+            return None
+        if hs_name not in self.loaded:
+            server.data_get()
+            self.loaded.add(hs_name)
+        return server
+
+    # 获取主机快照 #############################################################
+    def snapshot(self, hs_name: str) -> HostSnapshot | None:
+        """
+        获取主机当前的快照，版本号未变化时直接返回已发布的快照；
+        已过期且其他线程正在生成新快照时先返回上一个快照，不等待
+        """
+        server = self.load_host(hs_name)
+        if server is None:
+            return None
+        current = self.snapshots.get(hs_name)
+        if current is not None and current.server is server and current.version == server.version:
+            return current
+        return self.publish(hs_name, wait=current is None or current.server is not server)
+
+    # 发布主机快照 #############################################################
+    def publish(self, hs_name: str, wait: bool = True) -> HostSnapshot | None:
+        """
+        生成主机的新快照并替换已发布的快照
+        :param wait: 其他线程正在生成时是否等待，不等待时返回上一个快照
+        """
+        with self.snapshot_lock:
+            building = self.building.setdefault(hs_name, threading.Lock())
+        if not building.acquire(blocking=wait):
+            return self.snapshots.get(hs_name)
+        try:
+            server = self.engine.get(hs_name)
+            if server is None:
+                return None
+            # 等待期间其他线程已生成同一版本的快照
+            current = self.snapshots.get(hs_name)
+            if current is not None and current.server is server and current.version == server.version:
+                return current
+            snapshot = HostSnapshot.build(server, hs_name, self.db.series.latest(hs_name))
+            # 生成期间主机被删除或替换时不发布
+            if self.engine.get(hs_name) is server:
+                self.snapshots[hs_name] = snapshot
+            return snapshot
+        finally:
+            building.release()
+
+    # 获取虚拟机列表 #############################################################
+    def get_vms(self, hs_name: str) -> dict | None:
+        """
+        获取主机下所有虚拟机的配置和状态，直接读取主机快照
+        返回的字典由多个请求共享，调用方不能修改
+        """
+        snapshot = self.snapshot(hs_name)
+        return snapshot.vms if snapshot is not None else None
+
+    # 主机锁 #####################################################################
+    def host_lock(self, hs_name: str, write: bool = False):
+        """主机内存数据的读锁/写锁上下文，主机不存在时不加锁（数据库锁在其内获取）"""
+        server = self.engine.get(hs_name) if hs_name else None
+        if server is None:
+            return contextlib.nullcontext()
+        return server.locker.write() if write else server.locker.read()
+
+    # 读取待保存的主机数据 #######################################################
+    def host_data(self, hs_name: str, dirty: dict) -> dict | None:
+        """
+        读取主机登记修改的数据
+        :param dirty: {表名: 键集合}（见HostDatabase.take_dirty），键集合为None时读取整张表
+        """
+        server = self.engine.get(hs_name)
+        if server is None:
+            return None
+        host_data = {}
+        with server.locker.read():
+            if "hs_config" in dirty and server.hs_config is not None:
+                host_data["hs_config"] = server.hs_config.__dict__()
+            if "vm_saving" in dirty:
+                host_data["vm_saving"] = {
+                    vm_uuid: vm_config.__dict__() if callable(getattr(vm_config, "__dict__", None))
+                    else vm_config
+                    for vm_uuid, vm_config in self._dirty_rows(server.vm_saving, dirty["vm_saving"])}
+            if "vm_status" in dirty:
+                host_data["vm_status"] = {
+                    vm_uuid: list(status)
+                    for vm_uuid, status in self._dirty_rows(server.vm_status, dirty["vm_status"])}
+            if "vm_tasker" in dirty:
+                host_data["vm_tasker"] = list(server.vm_tasker)
+        return host_data
+
+    @staticmethod
+    def _dirty_rows(rows: dict, keys: set | None):
+        """登记修改的行（已删除的键不返回），keys为None时返回全部行"""
+        if keys is None:
+            return rows.items()
+        return [(key, rows[key]) for key in keys if key in rows]
+
+    # 同步裁剪内存数据 ###########################################################
+    def trim_data(self, table: str, hs_name: str, count: int):
+        """
+        压缩任务删除了数据库中主机最旧的count行后，同步删除内存中对应的记录
+        vm_tasker的删除和本方法在同一主机写锁内执行（DataCompact的guard）
+        """
+        server = self.engine.get(hs_name) if hs_name else None
+        if table == "vm_tasker" and server is not None:
+            with server.locker.write():
+                del server.vm_tasker[:count]
+            self.invalidate(hs_name)
+
     # 获取主机 ###################################################################
     def get_host(self, hs_name: str) -> BaseServer | None:
-        if hs_name not in self.engine:
-            return None
-        return self.engine[hs_name]
+        # 单次取值，判断和读取之间主机被删除时不会出错
+        return self.engine.get(hs_name)
 
     # 添加主机 ###################################################################
     def add_host(self, hs_name: str, hs_type: str, hs_conf: HSConfig) -> ZMessage:
         if hs_name in self.engine:
             return ZMessage(success=False, message="Host already add")
-        if hs_type not in HEConfig:
+        server_class = HEImport(hs_type)
+        if server_class is None:
             return ZMessage(success=False, message="Host unsupported")
-        self.engine[hs_name] = HEConfig[hs_type]["Imported"](hs_conf, db=self.db, hs_name=hs_name)
-        self.engine[hs_name].HSCreate()
-        self.engine[hs_name].HSLoader()
+        server = server_class(hs_conf, db=self.db, hs_name=hs_name)
+        with self.engine_lock.write():
+            if hs_name in self.engine:
+                return ZMessage(success=False, message="Host already add")
+            self.engine[hs_name] = server
+        # 初始化和启动在锁外进行，可能需要较长时间
+        server.HSCreate()
+        server.HSLoader()
         # 保存主机配置到数据库
         self.db.save_host_config(hs_name, hs_conf)
+        self.cron_setup()
         return ZMessage(success=True, message="Host added successful")
 
     # 删除主机 ###################################################################
     def del_host(self, server):
-        if server in self.engine:
-            del self.engine[server]
+        with self.engine_lock.write():
+            removed = self.engine.pop(server, None) is not None
+        if removed:
+            self.writer.discard(server)
+            self.loaded.discard(server)
+            self.snapshots.pop(server, None)
+            self.cron_setup()
             # 从数据库删除主机配置
             self.db.delete_host_config(server)
+            self.db.series.forget(server)
             return True
         return False
 
@@ -107,110 +300,145 @@ class HostManage:
         if hs_name not in self.engine:
             return ZMessage(success=False, message="Host not found")
         
-        # 保存原有的虚拟机数据
-        old_server = self.engine[hs_name]
-        old_vm_saving = old_server.vm_saving
-        old_vm_status = old_server.vm_status
-        old_vm_tasker = old_server.vm_tasker
-        old_save_logs = old_server.hs_logger
-        
         # 创建新的主机对象
-        self.engine[hs_name] = HEConfig[hs_conf.server_type]["Imported"](hs_conf, db=self.db, hs_name=hs_name)
-        
-        # 恢复虚拟机数据
-        self.engine[hs_name].vm_saving = old_vm_saving
-        self.engine[hs_name].vm_status = old_vm_status
-        self.engine[hs_name].vm_tasker = old_vm_tasker
-        self.engine[hs_name].hs_logger = old_save_logs
-        
-        self.engine[hs_name].HSUnload()
-        self.engine[hs_name].HSLoader()
+        server_class = HEImport(hs_conf.server_type)
+        if server_class is None:
+            return ZMessage(success=False, message="Host unsupported")
+        server = server_class(hs_conf, db=self.db, hs_name=hs_name)
+
+        # 转移原有的虚拟机数据并替换主机（先主机表锁，再主机锁）
+        with self.engine_lock.write():
+            old_server = self.engine.get(hs_name)
+            if old_server is None:
+                return ZMessage(success=False, message="Host not found")
+            with old_server.locker.write():
+                server.vm_saving = old_server.vm_saving
+                server.vm_status = old_server.vm_status
+                server.vm_tasker = old_server.vm_tasker
+                server.hs_logger = old_server.hs_logger
+            self.engine[hs_name] = server
+
+        self.invalidate(hs_name)
+        server.HSUnload()
+        server.HSLoader()
         # 保存主机配置到数据库
         self.db.save_host_config(hs_name, hs_conf)
+        self.cron_setup()
         return ZMessage(success=True, message="Host updated successful")
 
     # 修改主机 ###################################################################
     def pwr_host(self, hs_name: str, hs_flag: bool) -> ZMessage:
-        if hs_name not in self.engine:
+        server = self.engine.get(hs_name)
+        if server is None:
             return ZMessage(success=False, message="Host not found")
         if hs_flag:
-            self.engine[hs_name].HSLoader()
+            server.HSLoader()
         else:
-            self.engine[hs_name].HSUnload()
+            server.HSUnload()
         return ZMessage(success=True, message="Host enable=" + str(hs_flag))
 
     # 加载信息 ###################################################################
     def all_load(self):
-        """从数据库加载所有信息"""
+        """从数据库加载所有信息（每张表只读取一次），并输出各阶段耗时"""
+        timing = {}
+        reading = {}
         try:
-            # 加载全局日志
-            self.logger = []
-            global_logs = self.db.get_logger()
+            # 加载最近的全局日志
+            started = time.perf_counter()
+            self.logger.clear()
+            global_logs = self.db.get_global_logger(self.logger.maxlen)
             for log_data in global_logs:
                 self.logger.append(ZMessage(**log_data) if isinstance(log_data, dict) else log_data)
-
-            # 加载所有主机配置
-            host_configs = self.db.get_all_host_configs()
-            for host_config in host_configs:
-                hs_name = host_config["hs_name"]
-
-                # 重建HSConfig对象
-                hs_conf_data = dict(host_config)
-                hs_conf_data["extend_data"] = json.loads(host_config["extend_data"]) if host_config[
-                    "extend_data"] else {}
-                # 解析新字段的JSON数据
-                hs_conf_data["system_maps"] = json.loads(host_config["system_maps"]) if host_config.get(
-                    "system_maps") else {}
-                hs_conf_data["public_addr"] = json.loads(host_config["public_addr"]) if host_config.get(
-                    "public_addr") else []
-
-                # 移除数据库字段，只保留配置字段
-                for field in ["id", "hs_name", "created_at", "updated_at"]:
-                    hs_conf_data.pop(field, None)
-
-                hs_conf = HSConfig(**hs_conf_data)
-
-                # 获取主机完整数据
-                host_full_data = self.db.get_host_full_data(hs_name)
-
-                # 创建BaseServer实例
-                if hs_conf.server_type in HEConfig:
-                    server_class = HEConfig[hs_conf.server_type]["Imported"]
-                    self.engine[hs_name] = server_class(
+            timing["global_logs"] = time.perf_counter() - started
+
+            # 一次性读取所有主机数据
+            started = time.perf_counter()
+            all_data = self.db.get_all_host_data(reading)
+            timing["bulk_read"] = time.perf_counter() - started
+
+            # 创建主机实例
+            build = 0.0
+            for hs_name, host_full_data in all_data.items():
+                started = time.perf_counter()
+                hs_conf = self._host_config(host_full_data["hs_config"])
+                server_class = HEImport(hs_conf.server_type)
+                if server_class is None:
+                    continue
+                server = server_class(
                     hs_conf,
-                        db=self.db,
-                        hs_name=hs_name,
-                        hs_status=host_full_data["hs_status"],
-                        vm_saving=host_full_data["vm_saving"],
-                        vm_status=host_full_data["vm_status"],
-                        vm_tasker=host_full_data["vm_tasker"],
-                        save_logs=host_full_data["save_logs"],
-                    )
-                    # 确保状态数据正确加载到服务器实例
-                    self.engine[hs_name].hs_status = host_full_data["hs_status"]
-                    self.engine[hs_name].vm_status = host_full_data["vm_status"]
-                    self.engine[hs_name].HSLoader()
+                    db=self.db,
+                    hs_name=hs_name,
+                    vm_saving={
+                        vm_uuid: VMConfig(**vm_config) if isinstance(vm_config, dict) else vm_config
+                        for vm_uuid, vm_config in host_full_data["vm_saving"].items()},
+                    vm_status=host_full_data["vm_status"],
+                    vm_tasker=host_full_data["vm_tasker"],
+                )
+                server.hs_status = deque(host_full_data["hs_status"], maxlen=self.db.STATUS_WINDOW)
+                server.hs_logger = deque(
+                    (ZMessage(**log_data) for log_data in host_full_data["save_logs"]),
+                    maxlen=server.hs_logger.maxlen)
+                with self.engine_lock.write():
+                    self.engine[hs_name] = server
+                self.loaded.add(hs_name)
+                self.invalidate(hs_name)
+                build += time.perf_counter() - started
+            timing["build"] = build
+
+            # 并发启动所有主机，单台主机超时不影响其他主机
+            started = time.perf_counter()
+            self.readiness["load"] = self.runner.run("HSLoader", self.hosts())
+            timing["HSLoader"] = time.perf_counter() - started
         except Exception as e:
             print(f"加载数据时出错: {e}")
             traceback.print_exc()
+        self.load_report = {"hosts": len(self.engine), "phases": timing, "tables": reading}
+        print(f"[HostManage] 加载{len(self.engine)}台主机，各阶段耗时:")
+        for name, spent in list(timing.items()) + [(f"  {k}", v) for k, v in reading.items()]:
+            print(f"[HostManage]   {name:<14}{spent * 1000:>10.2f} ms")
+        self._print_readiness("启动", self.readiness.get("load", {}))
+
+    # 输出各主机启动/停止结果 ####################################################
+    def _print_readiness(self, action: str, results: dict):
+        summary = HostRunner.summary(results)
+        print(f"[HostManage] {action}主机 {summary['ready']}/{summary['total']} 成功")
+        for hs_name, result in results.items():
+            if result["state"] != "ready":
+                print(f"[HostManage]   {hs_name:<14}{result['state']:<8}"
+                      f"{result['seconds']:>8.2f} s  {result['message']}")
+
+    # 解析主机配置行 #############################################################
+    @staticmethod
+    def _host_config(host_config: dict) -> HSConfig:
+        hs_conf_data = dict(host_config)
+        # 解析JSON字段
+        hs_conf_data["extend_data"] = json.loads(host_config["extend_data"]) if host_config.get(
+            "extend_data") else {}
+        hs_conf_data["system_maps"] = json.loads(host_config["system_maps"]) if host_config.get(
+            "system_maps") else {}
+        hs_conf_data["public_addr"] = json.loads(host_config["public_addr"]) if host_config.get(
+            "public_addr") else []
+        # 移除数据库字段，只保留配置字段
+        for field in ["id", "hs_name", "created_at", "updated_at"]:
+            hs_conf_data.pop(field, None)
+        return HSConfig(**hs_conf_data)
 
     # 保存信息 ###################################################################
-    def all_save(self) -> bool:
-        """保存所有信息到数据库"""
+    def all_save(self, hosts: list = None) -> bool:
+        """
+        保存所有信息到数据库
+        :param hosts: 只保存这些主机，为空时保存全部主机
+        """
         try:
             success = True
-            # 保存全局日志
-            if self.logger:
-                self.db.save_logger(None, self.logger)
-
-            # 保存每个主机的数据
-            for hs_name, server in self.engine.items():
-                # 确保状态数据是最新的
-                host_data = server.__dict__()
-                # 强制包含hs_status和vm_status数据
-                host_data["hs_status"] = server.hs_status
-                host_data["vm_status"] = server.vm_status
-                success &= self.db.save_host_full_data(hs_name, host_data)
+            # 写入排队中的日志
+            self.db.flush_logger()
+
+            # 只写入每台主机登记修改的行（在主机读锁内读取和写入）
+            for hs_name in self.hosts():
+                if hosts is not None and hs_name not in hosts:
+                    continue
+                success &= self.writer.write(hs_name)
 
             return success
         except Exception as e:
@@ -220,8 +448,14 @@ class HostManage:
 
     # 退出程序 ###################################################################
     def all_exit(self):
-        for server in self.engine:
-            self.engine[server].HSUnload()
+        self.schedule.stop()
+        # 写入所有待写入的变更
+        self.writer.close()
+        # 并发停止所有主机，单台主机超时不影响其他主机
+        self.readiness["exit"] = self.runner.run("HSUnload", self.hosts(), timeout=10.0)
+        self._print_readiness("停止", self.readiness["exit"])
+        # 关闭数据库长连接
+        self.db.close()
 
     # 扫描虚拟机 #################################################################
     def scan_vms(self, hs_name: str, prefix: str = "") -> ZMessage:
@@ -231,11 +465,10 @@ class HostManage:
         :param prefix: 虚拟机名称前缀过滤（如果为空，则使用主机配置的filter_name）
         :return: 操作结果
         """
-        if hs_name not in self.engine:
+        server = self.engine.get(hs_name)
+        if server is None:
             return ZMessage(success=False, message=f"Host {hs_name} not found")
 
-        server = self.engine[hs_name]
-
         try:
             # 获取VMRestAPI实例（假设是Vmware类型）
             if not hasattr(server, 'vmrest_api'):
@@ -295,11 +528,13 @@ class HostManage:
                     hdd_all={},  # 空字典
                 )
 
-                # 添加到服务器的虚拟机配置中
-                server.vm_saving[vmx_name] = default_vm_config
+                # 添加到服务器的虚拟机配置中（数据库只写入这台虚拟机）
+                if not server.set_vm(default_vm_config):
+                    return ZMessage(success=False, message="Failed to save scanned VMs to database")
 
                 # 初始化虚拟机状态为空列表
-                server.vm_status[vmx_name] = []
+                with server.locker.write():
+                    server.vm_status.setdefault(vmx_name, [])
 
                 added_count += 1
 
@@ -312,12 +547,6 @@ class HostManage:
                 )
                 server.add_log(log_msg)
 
-            # 保存到数据库
-            if added_count > 0:
-                success = server.data_set()
-                if not success:
-                    return ZMessage(success=False, message="Failed to save scanned VMs to database")
-
             return ZMessage(
                 success=True,
                 message=f"扫描完成。共扫描到{scanned_count}台虚拟机，新增{added_count}台虚拟机配置。",
@@ -332,19 +561,104 @@ class HostManage:
             return ZMessage(success=False, message=f"扫描虚拟机时出错: {str(e)}")
 
     # 定时任务 #################################################################
-    def exe_cron(self):
-        for server in self.engine:
-            print(f'[Cron] 执行{server}的定时任务')
-            self.engine[server].Crontabs()
-        print('[Cron] 执行定时任务完成')
-        
-        # 自动保存状态数据到数据库
+    def exe_cron(self, hosts: list = None) -> dict:
+        """
+        并发执行主机的定时任务，每台主机单独限时，超时的主机被取消且不保存本次结果
+        :param hosts: 执行的主机，为空时执行所有使用默认间隔的主机
+        :return: 各主机的执行结果
+        """
+        engine = self.hosts()
+        if hosts is None:
+            hosts = [hs_name for hs_name in engine if hs_name not in self.cron_custom]
+        servers = {hs_name: engine[hs_name] for hs_name in hosts if hs_name in engine}
+        for hs_name, server in servers.items():
+            # 上一次超时后仍在执行的主机保持取消状态，本轮会被跳过，
+            # 清除取消标记会让超时的线程继续修改内存数据
+            if not self.runner.is_busy("Crontabs", hs_name):
+                server.cancelled.clear()
+        print(f'[Cron] 并发执行{len(servers)}台主机的定时任务')
+        results = self.runner.run(
+            "Crontabs", servers, timeout=self.cron_timeout,
+            on_timeout=lambda hs_name, server: server.cancelled.set())
+        completed = [hs_name for hs_name, result in results.items() if result["state"] == "ready"]
+        # 在定时任务线程中生成并发布新快照，API读取时不再生成
+        for hs_name in completed:
+            self.invalidate(hs_name)
+            self.publish(hs_name)
+        self._cron_metrics(results)
+        summary = HostRunner.summary(results)
+        print(f"[Cron] 执行定时任务完成: {summary['ready']}/{summary['total']}，"
+              f"最慢{summary['slowest']}")
+        for hs_name, result in results.items():
+            if result["state"] != "ready":
+                print(f"[Cron]   {hs_name}: {result['state']} {result['message']}")
+
+        # 只保存本轮执行完成的主机
         print('[Cron] 开始保存状态数据到数据库')
-        save_success = self.all_save()
+        save_success = self.all_save(completed)
         if save_success:
             print('[Cron] 状态数据保存成功')
         else:
             print('[Cron] 状态数据保存失败')
+        return results
+
+    # 启动定时任务 ###############################################################
+    def cron_start(self):
+        """登记主机定时任务和数据维护任务并启动调度器，主机定时任务立即执行一次"""
+        self.cron_setup()
+        self.schedule.add("save", self.all_save, 300, mode="delay", priority=5)
+        self.schedule.add("compact", self.compact.run, 3600, mode="delay", priority=10)
+        self.schedule.add("backup", self.backup.run, 86400, mode="delay", priority=10)
+        self.schedule.start()
+
+    # 同步主机定时任务 ###########################################################
+    def cron_setup(self):
+        """
+        按主机配置同步定时任务：使用默认间隔的主机合并为cron任务，
+        单独设置间隔的主机各自一个cron:<主机名>任务，修改主机配置后调用
+        """
+        custom = {}
+        for hs_name, server in self.hosts().items():
+            extend = (server.hs_config.extend_data if server.hs_config else None) or {}
+            if not extend.get("cron_interval"):
+                continue
+            try:
+                interval = float(extend["cron_interval"])
+            except (TypeError, ValueError):
+                interval = 0.0
+            # 无效的间隔忽略，主机使用默认间隔
+            if not (interval > 0 and math.isfinite(interval)):
+                print(f"[Cron] 主机{hs_name}的cron_interval无效，使用默认间隔: {extend['cron_interval']}")
+                continue
+            custom[hs_name] = interval
+        for name in list(self.schedule.jobs):
+            if name.startswith("cron:") and name[5:] not in custom:
+                self.schedule.remove(name)
+        for hs_name, interval in custom.items():
+            job = self.schedule.jobs.get(f"cron:{hs_name}")
+            if job is None or job.interval != interval:
+                self.schedule.add(f"cron:{hs_name}", lambda hs_name=hs_name: self.exe_cron([hs_name]),
+                                  interval, delay=0, jitter=min(5.0, interval / 10))
+        self.cron_custom = set(custom)
+        if "cron" not in self.schedule.jobs:
+            self.schedule.add("cron", self.exe_cron, self.cron_interval, delay=0)
+
+    # 记录定时任务指标 ###########################################################
+    def _cron_metrics(self, results: dict):
+        finished_at = int(time.time())
+        for hs_name, result in results.items():
+            metric = self.cron_stats.setdefault(hs_name, {
+                "runs": 0, "ready": 0, "failed": 0, "timeout": 0, "error": 0, "skipped": 0,
+                "max_seconds": 0.0, "max_lag": 0.0})
+            metric["runs"] += 1
+            metric[result["state"]] += 1
+            metric["max_seconds"] = max(metric["max_seconds"], result["seconds"])
+            metric["max_lag"] = max(metric["max_lag"], result["lag"])
+            metric.update(last_state=result["state"], last_seconds=result["seconds"],
+                          last_lag=result["lag"], last_message=result["message"],
+                          finished_at=finished_at)
+        for hs_name in [hs_name for hs_name in self.cron_stats if hs_name not in self.engine]:
+            del self.cron_stats[hs_name]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,113 @@
+import time
+import threading
+from collections import deque
+from typing import Dict, Any, Callable
+
+
+class HostRunner:
+    """主机生命周期并发执行器：用有限数量的线程对多台主机执行同一操作（如HSLoader/HSUnload/Crontabs），每台主机单独超时"""
+
+    def __init__(self, workers: int = 16, timeout: float = 30.0):
+        """
+        :param workers: 最多同时执行的主机数量
+        :param timeout: 单台主机的超时时间（秒），从该主机开始执行时计算
+        """
+        self.workers = workers
+        self.timeout = timeout
+        # 仍在执行的(操作, 主机名)，包括超时后仍在后台运行的线程，用于避免同一主机重叠执行
+        self.busy: set = set()
+        self.busy_lock = threading.Lock()
+
+    # 并发执行 =================================================
+    def run(self, action: str, servers: Dict[str, Any], timeout: float = None,
+            on_timeout: Callable[[str, Any], None] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        对每台主机调用server.<action>()，超时的主机不再等待（线程在后台自行结束），
+        并立即补充执行排队中的主机，一台主机卡住不会拖慢其他主机
+        :param action: 主机方法名
+        :param servers: {主机名: 主机实例}
+        :param on_timeout: 主机超时后的回调 (主机名, 主机实例)，用于通知主机尽快放弃本次执行
+        :return: {主机名: {"state": ready/failed/timeout/error/skipped, "seconds": 耗时,
+                           "lag": 开始前的排队时间, "message": 说明}}
+                 上一次执行仍未结束的主机不会重复执行，状态为skipped
+        """
+        timeout = self.timeout if timeout is None else timeout
+        begin = time.perf_counter()
+        pending = deque(servers.items())
+        running: Dict[str, tuple] = {}  # hs_name -> (开始时间, 结果)
+        results: Dict[str, Dict[str, Any]] = {}
+        changed = threading.Condition()
+
+        def execute(hs_name: str, server, box: dict):
+            try:
+                result = getattr(server, action)()
+                # 返回ZMessage的按success判断，返回bool的按值判断，未实现的操作(返回None)视为成功
+                if result is None or isinstance(result, bool):
+                    success, message = result is not False, ""
+                else:
+                    success, message = getattr(result, "success", True), getattr(result, "message", "")
+                box["state"] = "ready" if success else "failed"
+                box["message"] = message
+            except Exception as e:
+                box["state"], box["message"] = "error", str(e)
+            finally:
+                with self.busy_lock:
+                    self.busy.discard((action, hs_name))
+            with changed:
+                box["finished"] = time.perf_counter()
+                changed.notify()
+
+        with changed:
+            while pending or running:
+                # 补充执行排队中的主机 =============================
+                while pending and len(running) < self.workers:
+                    hs_name, server = pending.popleft()
+                    with self.busy_lock:
+                        if (action, hs_name) in self.busy:
+                            results[hs_name] = {"state": "skipped", "seconds": 0.0, "lag": 0.0,
+                                                "message": f"previous {action} still running"}
+                            continue
+                        self.busy.add((action, hs_name))
+                    box = {}
+                    running[hs_name] = (time.perf_counter(), box)
+                    threading.Thread(target=execute, args=(hs_name, server, box),
+                                     name=f"{action}-{hs_name}", daemon=True).start()
+                # 收集已完成和已超时的主机 =========================
+                now = time.perf_counter()
+                wait = timeout
+                for hs_name, (started, box) in list(running.items()):
+                    lag = round(started - begin, 3)
+                    if "finished" in box:
+                        results[hs_name] = {"state": box["state"], "message": box["message"],
+                                            "seconds": round(box["finished"] - started, 3), "lag": lag}
+                    elif now - started >= timeout:
+                        results[hs_name] = {"state": "timeout", "message": f"{action} timeout",
+                                            "seconds": round(now - started, 3), "lag": lag}
+                        if on_timeout is not None:
+                            on_timeout(hs_name, servers[hs_name])
+                    else:
+                        wait = min(wait, started + timeout - now)
+                        continue
+                    del running[hs_name]
+                if running and not (pending and len(running) < self.workers):
+                    changed.wait(wait)
+        return results
+
+    # 是否仍在执行 =============================================
+    def is_busy(self, action: str, hs_name: str) -> bool:
+        """主机的上一次操作是否仍在执行（包括已超时但线程尚未结束的）"""
+        with self.busy_lock:
+            return (action, hs_name) in self.busy
+
+    # 汇总结果 =================================================
+    @staticmethod
+    def summary(results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        states: Dict[str, list] = {}
+        for hs_name, result in results.items():
+            states.setdefault(result["state"], []).append(hs_name)
+        return {
+            "total": len(results),
+            "ready": len(states.get("ready", [])),
+            "states": states,
+            "slowest": max(results.items(), key=lambda item: item[1]["seconds"])[0] if results else None,
+        }
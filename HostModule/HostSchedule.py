@@ -0,0 +1,234 @@
+import time
+import heapq
+import random
+import threading
+from typing import Dict, Any, Callable, List
+
+
+class ScheduleJob:
+    """定时任务：按固定频率(rate)或固定间隔(delay)重复执行"""
+
+    # 执行方式
+    RATE = "rate"  # 按计划时间点执行，不受执行耗时影响（不漂移）
+    DELAY = "delay"  # 上一次执行结束后再等待interval秒
+
+    def __init__(self, name: str, func: Callable[[], Any], interval: float, mode: str = RATE,
+                 jitter: float = 0.0, priority: int = 0, skip_if_running: bool = True):
+        """
+        :param name: 任务名称（唯一）
+        :param func: 执行的函数
+        :param interval: 执行间隔（秒）
+        :param mode: rate/delay
+        :param jitter: 每次执行随机延后0~jitter秒，避免多个任务同时执行
+        :param priority: 同时到期时数值小的先执行
+        :param skip_if_running: 到期时上一次仍在执行则跳过本次
+        """
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.mode = mode
+        self.jitter = jitter
+        self.priority = priority
+        self.skip_if_running = skip_if_running
+        self.enabled = True
+        # 调度状态 =============================================
+        self.planned = 0.0  # 计划执行时间（不含抖动，monotonic）
+        self.fire_at = 0.0  # 实际执行时间（含抖动，monotonic）
+        self.running = False
+        self.generation = 0  # 添加/修改任务时由调度器重新分配，使堆中的旧条目失效
+        # 执行指标 =============================================
+        self.runs = 0
+        self.errors = 0
+        self.skipped = 0  # 到期时上一次仍在执行而跳过的次数
+        self.missed = 0  # 执行耗时超过间隔而错过的计划次数（rate模式）
+        self.last_error = ""
+        self.last_start = 0.0  # 最近一次开始时间（Unix秒）
+        self.last_seconds = 0.0
+        self.max_seconds = 0.0
+        self.total_seconds = 0.0
+        self.last_lag = 0.0  # 最近一次开始时间相对计划时间的延迟
+        self.max_lag = 0.0
+
+    # 转换为字典 ===============================================
+    def __dict__(self):
+        now = time.monotonic()
+        return {
+            "name": self.name,
+            "interval": self.interval,
+            "mode": self.mode,
+            "jitter": self.jitter,
+            "priority": self.priority,
+            "skip_if_running": self.skip_if_running,
+            "enabled": self.enabled,
+            "running": self.running,
+            "next_run": round(time.time() + self.fire_at - now, 3) if self.enabled else None,
+            "runs": self.runs,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "missed": self.missed,
+            "last_error": self.last_error,
+            "last_start": round(self.last_start, 3),
+            "last_seconds": round(self.last_seconds, 3),
+            "max_seconds": round(self.max_seconds, 3),
+            "avg_seconds": round(self.total_seconds / self.runs, 3) if self.runs else 0.0,
+            "last_lag": round(self.last_lag, 3),
+            "max_lag": round(self.max_lag, 3),
+        }
+
+
+class HostSchedule:
+    """定时任务调度器：最小堆按到期时间排序，单线程调度，每次执行在独立线程中进行"""
+
+    # 可通过update修改的任务属性
+    OPTIONS = ("interval", "mode", "jitter", "priority", "skip_if_running", "enabled")
+
+    def __init__(self):
+        self.jobs: Dict[str, ScheduleJob] = {}
+        self.heap: List[tuple] = []  # (执行时间, 优先级, 序号, 任务名, 版本)
+        self.sequence = 0  # 只增不减，同时用作堆条目序号和任务版本
+        self.locker = threading.Condition()
+        self.thread: threading.Thread | None = None
+        self.stopped = False
+
+    # 添加任务 =================================================
+    def add(self, name: str, func: Callable[[], Any], interval: float, delay: float = None,
+            **options) -> ScheduleJob:
+        """
+        添加或替换任务
+        :param delay: 首次执行前的等待时间（秒），为空时等待一个interval
+        :param options: 见ScheduleJob的参数
+        """
+        job = ScheduleJob(name, func, interval, **options)
+        with self.locker:
+            # 删除后重新添加的同名任务也不会与堆中的旧条目版本相同
+            self.renew(job)
+            self.jobs[name] = job
+            self.plan(job, time.monotonic() + (interval if delay is None else delay))
+        return job
+
+    # 删除任务 =================================================
+    def remove(self, name: str) -> bool:
+        with self.locker:
+            return self.jobs.pop(name, None) is not None
+
+    # 修改任务 =================================================
+    def update(self, name: str, **options) -> ScheduleJob | None:
+        """修改任务属性，修改间隔后从当前时间重新计划"""
+        with self.locker:
+            job = self.jobs.get(name)
+            if job is None:
+                return None
+            for key, value in options.items():
+                if key in self.OPTIONS and value is not None:
+                    setattr(job, key, value)
+            self.renew(job)
+            if job.enabled:
+                self.plan(job, time.monotonic() + job.interval)
+            return job
+
+    # 立即执行 =================================================
+    def trigger(self, name: str) -> bool:
+        with self.locker:
+            job = self.jobs.get(name)
+            if job is None:
+                return False
+            self.renew(job)
+            self.plan(job, time.monotonic(), jitter=False)
+            return True
+
+    # 任务指标 =================================================
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        with self.locker:
+            return {name: job.__dict__() for name, job in sorted(self.jobs.items())}
+
+    # 启动调度线程 =============================================
+    def start(self):
+        with self.locker:
+            if self.thread is not None:
+                return
+            self.stopped = False
+            self.thread = threading.Thread(target=self.loop, name="HostSchedule", daemon=True)
+            self.thread.start()
+
+    # 停止调度线程 =============================================
+    def stop(self):
+        with self.locker:
+            self.stopped = True
+            self.locker.notify_all()
+
+    # 分配新版本，使堆中该任务的旧条目失效（调用方持有locker） =
+    def renew(self, job: ScheduleJob):
+        self.sequence += 1
+        job.generation = self.sequence
+
+    # 计划下一次执行（调用方持有locker） =======================
+    def plan(self, job: ScheduleJob, planned: float, jitter: bool = True):
+        job.planned = planned
+        job.fire_at = planned + (random.uniform(0, job.jitter) if jitter and job.jitter > 0 else 0.0)
+        self.sequence += 1
+        heapq.heappush(self.heap, (job.fire_at, job.priority, self.sequence, job.name, job.generation))
+        self.locker.notify()
+
+    # 调度循环 =================================================
+    def loop(self):
+        with self.locker:
+            while not self.stopped:
+                if not self.heap:
+                    self.locker.wait()
+                    continue
+                now = time.monotonic()
+                if self.heap[0][0] > now:
+                    self.locker.wait(self.heap[0][0] - now)
+                    continue
+                _, _, _, name, generation = heapq.heappop(self.heap)
+                job = self.jobs.get(name)
+                if job is None or job.generation != generation or not job.enabled:
+                    continue
+                self.dispatch(job, now)
+
+    # 分派到期的任务（调用方持有locker） =======================
+    def dispatch(self, job: ScheduleJob, now: float):
+        planned, fire_at = job.planned, job.fire_at
+        if job.mode == ScheduleJob.RATE:
+            # 按计划时间点推进，错过的计划点直接跳过而不是补执行
+            following = planned + job.interval
+            if following <= now:
+                behind = int((now - following) // job.interval) + 1
+                job.missed += behind
+                following += behind * job.interval
+            self.plan(job, following)
+        if job.running and job.skip_if_running:
+            job.skipped += 1
+            if job.mode == ScheduleJob.DELAY:
+                self.plan(job, now + job.interval)
+            return
+        job.running = True
+        threading.Thread(target=self.execute, args=(job, job.generation, now - fire_at),
+                         name=f"Job-{job.name}", daemon=True).start()
+
+    # 执行任务 =================================================
+    def execute(self, job: ScheduleJob, generation: int, lag: float):
+        job.last_start = time.time()
+        started = time.perf_counter()
+        error = ""
+        try:
+            job.func()
+        except Exception as e:
+            error = str(e)
+            print(f"[Schedule] 执行任务{job.name}出错: {e}")
+        spent = time.perf_counter() - started
+        with self.locker:
+            job.running = False
+            job.runs += 1
+            job.last_seconds = spent
+            job.max_seconds = max(job.max_seconds, spent)
+            job.total_seconds += spent
+            job.last_lag = lag
+            job.max_lag = max(job.max_lag, lag)
+            if error:
+                job.errors += 1
+                job.last_error = error
+            # 固定间隔模式在执行结束后计划下一次
+            if job.mode == ScheduleJob.DELAY and job.generation == generation \
+                    and self.jobs.get(job.name) is job:
+                self.plan(job, time.monotonic() + job.interval)
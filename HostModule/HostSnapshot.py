@@ -0,0 +1,92 @@
+import time
+
+from MainObject.Config.VMPowers import VMPowers
+
+
+class HostSnapshot:
+    """
+    主机只读快照：某一版本的主机信息、虚拟机配置/状态，生成后不再修改，
+    由HostManage替换引用整体发布，API读取时直接序列化快照而无需加锁
+    快照中的字典由多个请求共享，调用方不能修改
+    """
+
+    __slots__ = ("server", "hs_name", "version", "built_at", "host", "vms", "running")
+
+    def __init__(self, server, hs_name: str, version: int, host: dict, vms: dict, running: int):
+        for name, value in (("server", server), ("hs_name", hs_name), ("version", version),
+                            ("built_at", time.time()), ("host", host), ("vms", vms), ("running", running)):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("HostSnapshot is immutable")
+
+    # 生成快照 =================================================
+    @classmethod
+    def build(cls, server, hs_name: str, latest: tuple | None = None) -> "HostSnapshot":
+        """
+        在主机读锁内读取内存数据，配置和状态来自同一版本
+        :param latest: 时序存储中最新的主机状态 (时间戳, HWStatus)
+        """
+        with server.locker.read():
+            version = server.version
+            hs_config = server.hs_config
+            vms = {
+                vm_uuid: {
+                    'uuid': vm_uuid,
+                    'config': cls.serialize(vm_config),
+                    'status': cls.serialize(server.vm_status.get(vm_uuid)),
+                    # 状态查询失败时为开始过期的时间，status是上一次成功查询的结果
+                    'stale': server.vm_stale.get(vm_uuid)
+                }
+                for vm_uuid, vm_config in server.vm_saving.items()
+            }
+            config = hs_config.__dict__() if hs_config else {}
+        host = {
+            'name': hs_name,
+            'type': hs_config.server_type if hs_config else '',
+            'addr': hs_config.server_addr if hs_config else '',
+            'config': config,
+            'vm_count': len(vms),
+            'status': 'active',  # 可以根据实际情况判断
+            'usage': {
+                'cpu_usage': getattr(latest[1], 'cpu_usage', 0),
+                'mem_usage': getattr(latest[1], 'mem_usage', 0),
+                'updated_at': latest[0],
+            } if latest else None
+        }
+        return cls(server, hs_name, version, host, vms, cls.count_running(vms))
+
+    # 统计运行中的虚拟机 =======================================
+    @staticmethod
+    def count_running(vms: dict) -> int:
+        started = VMPowers.to_json(VMPowers.STARTED)
+        running = 0
+        for vm_data in vms.values():
+            status = vm_data['status']
+            if status and isinstance(status[-1], dict) and status[-1].get('ac_status') == started:
+                running += 1
+        return running
+
+    # 转换为可JSON化的数据 =====================================
+    @staticmethod
+    def serialize(obj):
+        if obj is None or isinstance(obj, (str, int, float, bool)):
+            return obj
+        if isinstance(obj, dict):
+            return {k: HostSnapshot.serialize(v) for k, v in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            return [HostSnapshot.serialize(item) for item in obj]
+        # 检查是否为函数对象
+        if callable(obj):
+            return f"<function: {getattr(obj, '__name__', 'unknown')}>"
+        # 尝试调用__dict__()方法
+        if hasattr(obj, '__dict__') and callable(obj.__dict__):
+            try:
+                return obj.__dict__()
+            except (TypeError, AttributeError):
+                pass
+        # 尝试使用vars()获取属性字典
+        try:
+            return {k: HostSnapshot.serialize(v) for k, v in vars(obj).items()}
+        except (TypeError, AttributeError):
+            return str(obj)
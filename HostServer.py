@@ -2,15 +2,25 @@
 OpenIDCS Flask Server
 提供主机和虚拟机管理的Web界面和API接口
 """
+import sys
+import html
+import time
 import secrets
-import threading
-import json
+import math
 from functools import wraps
+
+# 启动耗时分析（python HostServer.py --profile-startup），需在导入其他模块前安装
+boot_profile = None
+if '--profile-startup' in sys.argv:
+    from HostModule.BootProfile import BootProfile
+    boot_profile = BootProfile().install()
+
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for
 
 from HostModule.HostManage import HostManage
+from HostModule.HostRunner import HostRunner
 from MainObject.Config.HSConfig import HSConfig
-from MainObject.Server.HSEngine import HEConfig
+from MainObject.Server.HSEngine import HEConfig, HETiming
 from MainObject.Config.VMConfig import VMConfig
 from MainObject.Config.VMPowers import VMPowers
 from MainObject.Config.NCConfig import NCConfig
@@ -19,7 +29,10 @@ app = Flask(__name__, template_folder='WebDesigns', static_folder='static')
 app.secret_key = secrets.token_hex(32)
 
 # 全局主机管理实例
+started = time.perf_counter()
 hs_manage = HostManage()
+if boot_profile is not None:
+    boot_profile.phase('HostManage()', time.perf_counter() - started)
 
 
 # ============================================================================
@@ -53,6 +66,17 @@ def api_response(code=200, msg='success', data=None):
     return jsonify({'code': code, 'msg': msg, 'data': data})
 
 
+# ============================================================================
+# 数据持久化
+# ============================================================================
+def persist(hs_name: str, *parts: str, keys: tuple = ()) -> bool:
+    """登记主机数据变更（后台合并写入，keys指定时只写入这些虚拟机的行），请求带sync=true参数时等待写入完成"""
+    ticket = hs_manage.mark(hs_name, *parts, keys=keys)
+    if request.args.get('sync', '').lower() in ('1', 'true'):
+        return ticket.wait(10)
+    return True
+
+
 # ============================================================================
 # 页面路由
 # ============================================================================
@@ -192,15 +216,11 @@ def get_token():
 def get_hosts():
     """获取所有主机列表"""
     hosts_data = {}
-    for hs_name, server in hs_manage.engine.items():
-        hosts_data[hs_name] = {
-            'name': hs_name,
-            'type': server.hs_config.server_type if server.hs_config else '',
-            'addr': server.hs_config.server_addr if server.hs_config else '',
-            'config': server.hs_config.__dict__() if server.hs_config else {},
-            'vm_count': len(server.vm_saving),
-            'status': 'active'  # 可以根据实际情况判断
-        }
+    # 直接使用各主机已发布的快照，不等待定时任务
+    for hs_name in hs_manage.hosts():
+        snapshot = hs_manage.snapshot(hs_name)
+        if snapshot is not None:
+            hosts_data[hs_name] = snapshot.host
     return api_response(200, 'success', hosts_data)
 
 
@@ -215,38 +235,35 @@ def get_host(hs_name):
     # 检查是否需要详细信息（通过查询参数控制）
     include_status = request.args.get('status', 'false').lower() == 'true'
     
-    # 构建基础响应数据（快速获取）
+    # 构建基础响应数据（来自主机快照）
+    snapshot = hs_manage.snapshot(hs_name)
+    if snapshot is None:
+        return api_response(404, '主机不存在')
     host_data = {
         'name': hs_name,
-        'type': server.hs_config.server_type if server.hs_config else '',
-        'addr': server.hs_config.server_addr if server.hs_config else '',
-        'config': server.hs_config.__dict__() if server.hs_config else {},
-        'vm_count': len(server.vm_saving),
-        'vm_list': list(server.vm_saving.keys()),
-        'last_updated': getattr(server, '_status_cache_time', 0)
+        'type': snapshot.host['type'],
+        'addr': snapshot.host['addr'],
+        'config': snapshot.host['config'],
+        'vm_count': len(snapshot.vms),
+        'vm_list': list(snapshot.vms),
+        'last_updated': 0
     }
 
     # 只有明确要求时才获取状态信息（避免每次调用都执行耗时的系统检查）
     if include_status:
         try:
-            cached_status = getattr(server, '_status_cache', None)
-            cache_time = getattr(server, '_status_cache_time', 0)
-            
-            # 检查缓存是否有效（30秒内的数据认为是新鲜的）
-            import time
-            current_time = int(time.time())
-            if cached_status and (current_time - cache_time) < 30:
-                host_data['status'] = cached_status
-                host_data['status_source'] = 'cached'
+            latest = hs_manage.db.series.latest(hs_name)
+            if latest:
+                # 使用定时任务采集的最新样本
+                host_data['status'] = latest[1].__dict__()
+                host_data['status_source'] = 'series'
+                host_data['last_updated'] = latest[0]
             else:
-                # 获取新状态并缓存
+                # 尚无样本时实时获取
                 status_obj = server.HSStatus()
                 if status_obj:
                     host_data['status'] = status_obj.__dict__()
                     host_data['status_source'] = 'fresh'
-                    # 缓存状态数据
-                    server._status_cache = status_obj.__dict__()
-                    server._status_cache_time = current_time
                 else:
                     host_data['status'] = {}
                     host_data['status_source'] = 'unavailable'
@@ -280,7 +297,8 @@ def add_host():
     result = hs_manage.add_host(hs_name, hs_type, hs_conf)
 
     if result.success:
-        hs_manage.all_save()
+        if not persist(hs_name):
+            return api_response(500, '数据保存失败')
         return api_response(200, result.message)
     return api_response(400, result.message)
 
@@ -299,7 +317,8 @@ def update_host(hs_name):
     result = hs_manage.set_host(hs_name, hs_conf)
 
     if result.success:
-        hs_manage.all_save()
+        if not persist(hs_name):
+            return api_response(500, '数据保存失败')
         return api_response(200, result.message)
     return api_response(400, result.message)
 
@@ -309,7 +328,6 @@ def update_host(hs_name):
 def delete_host(hs_name):
     """删除主机"""
     if hs_manage.del_host(hs_name):
-        hs_manage.all_save()
         return api_response(200, '主机已删除')
     return api_response(404, '主机不存在')
 
@@ -324,7 +342,8 @@ def host_power(hs_name):
     result = hs_manage.pwr_host(hs_name, enable)
 
     if result.success:
-        hs_manage.all_save()
+        if not persist(hs_name):
+            return api_response(500, '数据保存失败')
         return api_response(200, result.message)
     return api_response(400, result.message)
 
@@ -332,26 +351,25 @@ def host_power(hs_name):
 @app.route('/api/hosts/<hs_name>/status', methods=['GET'])
 @require_auth
 def get_host_status(hs_name):
-    """获取主机状态"""
+    """获取主机状态（优先读取定时任务采集的最新样本）"""
     server = hs_manage.get_host(hs_name)
     if not server:
         return api_response(404, '主机不存在')
 
-    # 检查是否强制刷新缓存
+    # 检查是否强制刷新
     force_refresh = request.args.get('refresh', 'false').lower() == 'true'
     
     import time
     current_time = int(time.time())
-    cache_time = getattr(server, '_status_cache_time', 0)
-    cached_status = getattr(server, '_status_cache', None)
+    latest = hs_manage.db.series.latest(hs_name)
     
-    # 检查缓存是否有效（60秒内的数据认为是新鲜的）
-    if not force_refresh and cached_status and (current_time - cache_time) < 60:
+    # 检查最新样本是否有效（两个采集周期内的数据认为是新鲜的）
+    if not force_refresh and latest and (current_time - latest[0]) < 120:
         return api_response(200, 'success', {
-            'status': cached_status,
-            'source': 'cached',
-            'cached_at': cache_time,
-            'age_seconds': current_time - cache_time
+            'status': latest[1].__dict__(),
+            'source': 'series',
+            'cached_at': latest[0],
+            'age_seconds': current_time - latest[0]
         })
     
     # 获取新状态
@@ -359,15 +377,10 @@ def get_host_status(hs_name):
         status = server.HSStatus()
         if status:
             status_data = status.__dict__()
-            # 更新缓存
-            server._status_cache = status_data
-            server._status_cache_time = current_time
-            
             return api_response(200, 'success', {
                 'status': status_data,
                 'source': 'fresh' if force_refresh else 'auto_refreshed',
                 'cached_at': current_time,
-                'cache_duration': 60
             })
         else:
             return api_response(500, 'failed', {
@@ -381,6 +394,21 @@ def get_host_status(hs_name):
         })
 
 
+@app.route('/api/hosts/<hs_name>/status/history', methods=['GET'])
+@require_auth
+def get_host_status_history(hs_name):
+    """获取主机状态历史（按时间范围自动选择原始样本或1m/5m/1h/1d汇总）"""
+    if not hs_manage.get_host(hs_name):
+        return api_response(404, '主机不存在')
+    try:
+        start = request.args.get('start', type=int)
+        end = request.args.get('end', type=int)
+        points = request.args.get('points', 360, type=int)
+        return api_response(200, 'success', hs_manage.db.series.query(hs_name, start, end, points))
+    except Exception as e:
+        return api_response(500, f'获取主机状态历史失败: {str(e)}')
+
+
 # ============================================================================
 # 虚拟机管理API
 # ============================================================================
@@ -392,43 +420,8 @@ def get_vms(hs_name):
     if not server:
         return api_response(404, '主机不存在')
     
-    # 从数据库重新加载数据
-    server.data_get()
-
-    def serialize_obj(obj):
-        """将对象序列化为可JSON化的格式"""
-        if obj is None:
-            return None
-        if isinstance(obj, (str, int, float, bool)):
-            return obj
-        if isinstance(obj, dict):
-            return {k: serialize_obj(v) for k, v in obj.items()}
-        if isinstance(obj, (list, tuple)):
-            return [serialize_obj(item) for item in obj]
-        # 检查是否为函数对象
-        if callable(obj):
-            return f"<function: {getattr(obj, '__name__', 'unknown')}>"
-        # 尝试调用__dict__()方法
-        if hasattr(obj, '__dict__') and callable(obj.__dict__):
-            try:
-                return obj.__dict__()
-            except (TypeError, AttributeError):
-                pass
-        # 尝试使用vars()获取属性字典
-        try:
-            return {k: serialize_obj(v) for k, v in vars(obj).items()}
-        except (TypeError, AttributeError):
-            return str(obj)
-
-    vms_data = {}
-    for vm_uuid, vm_config in server.vm_saving.items():
-        status = server.vm_status.get(vm_uuid)
-        vms_data[vm_uuid] = {
-            'uuid': vm_uuid,
-            'config': serialize_obj(vm_config),
-            'status': serialize_obj(status)
-        }
-
+    # 读取内存中的数据（版本号未变化时直接返回缓存结果）
+    vms_data = hs_manage.get_vms(hs_name)
     return api_response(200, 'success', vms_data)
 
 
@@ -462,12 +455,13 @@ def get_vm(hs_name, vm_uuid):
                 status_result.append(None)
 
     # 如果vm_config已经是字典则直接使用，否则调用__dict__()方法
-    if isinstance(vm_config, dict):
-        config_data = vm_config
-    elif hasattr(vm_config, '__dict__') and callable(getattr(vm_config, '__dict__', None)):
-        config_data = vm_config.__dict__()
-    else:
-        config_data = vm_config if vm_config else {}
+    with server.locker.read():
+        if isinstance(vm_config, dict):
+            config_data = vm_config
+        elif hasattr(vm_config, '__dict__') and callable(getattr(vm_config, '__dict__', None)):
+            config_data = vm_config.__dict__()
+        else:
+            config_data = vm_config if vm_config else {}
     
     return api_response(200, 'success', {
         'uuid': vm_uuid,
@@ -498,7 +492,6 @@ def create_vm(hs_name):
     result = server.VMCreate(vm_config)
 
     if result and result.success:
-        hs_manage.all_save()
         return api_response(200, result.message if result.message else '虚拟机创建成功')
 
     return api_response(400, result.message if result else '创建失败')
@@ -526,7 +519,6 @@ def update_vm(hs_name, vm_uuid):
     result = server.VMUpdate(vm_config)
 
     if result and result.success:
-        hs_manage.all_save()
         return api_response(200, result.message if result.message else '虚拟机更新成功')
 
     return api_response(400, result.message if result else '更新失败')
@@ -543,7 +535,6 @@ def delete_vm(hs_name, vm_uuid):
     result = server.VMDelete(vm_uuid)
 
     if result and result.success:
-        hs_manage.all_save()
         return api_response(200, result.message if result.message else '虚拟机已删除')
 
     return api_response(400, result.message if result else '删除失败')
@@ -632,11 +623,9 @@ def get_vm_status(hs_name, vm_uuid):
 @require_auth
 def scan_vms(hs_name):
     """扫描主机上的虚拟机"""
-    server = hs_manage.get_host(hs_name)
-    if server:
-        # 扫描前先从数据库重新加载数据
-        server.data_get()
-    
+    # 扫描前确保主机数据已从数据库加载
+    hs_manage.load_host(hs_name)
+
     data = request.get_json() or {}
     prefix = data.get('prefix', '')  # 前缀过滤，为空则使用主机配置的filter_name
 
@@ -644,7 +633,8 @@ def scan_vms(hs_name):
 
     if result.success:
         # 保存系统配置
-        hs_manage.all_save()
+        if not persist(hs_name):
+            return api_response(500, '数据保存失败')
         return api_response(200, result.message, result.results)
 
     return api_response(400, result.message)
@@ -698,17 +688,137 @@ def get_system_stats():
     total_vms = 0
     running_vms = 0
 
-    for server in hs_manage.engine.values():
-        total_vms += len(server.vm_saving)
-        # 统计运行中的虚拟机数量（根据实际状态判断）
+    engine = hs_manage.hosts()
+    for hs_name in engine:
+        snapshot = hs_manage.snapshot(hs_name)
+        if snapshot is not None:
+            total_vms += len(snapshot.vms)
+            # 统计运行中的虚拟机数量（根据快照中最新的电源状态）
+            running_vms += snapshot.running
 
     return api_response(200, 'success', {
-        'host_count': len(hs_manage.engine),
+        'host_count': len(engine),
         'vm_count': total_vms,
         'running_vm_count': running_vms
     })
 
 
+@app.route('/api/system/readiness', methods=['GET'])
+@require_auth
+def get_readiness():
+    """获取最近一次启动/停止各主机的结果"""
+    return api_response(200, 'success', {
+        action: {'summary': HostRunner.summary(results), 'hosts': results}
+        for action, results in hs_manage.readiness.items()
+    })
+
+
+@app.route('/api/system/cron', methods=['GET'])
+@require_auth
+def get_cron_stats():
+    """获取定时任务各主机的执行耗时、排队延迟和超时统计"""
+    return api_response(200, 'success', {
+        'timeout': hs_manage.cron_timeout,
+        'jobs': {name: job for name, job in hs_manage.schedule.metrics().items()
+                 if name == 'cron' or name.startswith('cron:')},
+        'hosts': hs_manage.cron_stats
+    })
+
+
+@app.route('/api/system/jobs', methods=['GET'])
+@require_auth
+def get_jobs():
+    """获取所有定时任务的配置和执行指标"""
+    return api_response(200, 'success', hs_manage.schedule.metrics())
+
+
+@app.route('/api/system/jobs/<name>', methods=['PUT'])
+@require_auth
+def update_job(name):
+    """修改定时任务（interval/mode/jitter/priority/skip_if_running/enabled）"""
+    data = request.get_json() or {}
+    if data.get('mode') not in (None, 'rate', 'delay'):
+        return api_response(400, f"不支持的执行方式: {data['mode']}")
+    for key in ('interval', 'jitter'):
+        if data.get(key) is not None:
+            try:
+                data[key] = float(data[key])
+            except (TypeError, ValueError):
+                return api_response(400, f'{key}必须是数字')
+            if not math.isfinite(data[key]):
+                return api_response(400, f'{key}必须是有限的数字')
+    if data.get('interval') is not None and data['interval'] <= 0:
+        return api_response(400, '执行间隔必须大于0')
+    job = hs_manage.schedule.update(name, **data)
+    if job is None:
+        return api_response(404, '定时任务不存在')
+    return api_response(200, '定时任务已更新', job.__dict__())
+
+
+@app.route('/api/system/jobs/<name>/run', methods=['POST'])
+@require_auth
+def run_job(name):
+    """立即执行一次定时任务"""
+    if not hs_manage.schedule.trigger(name):
+        return api_response(404, '定时任务不存在')
+    return api_response(200, '定时任务已触发')
+
+
+@app.route('/api/system/retention', methods=['GET'])
+@require_auth
+def get_retention():
+    """获取数据保留策略及最近一次压缩报告"""
+    return api_response(200, 'success', {
+        'policy': hs_manage.compact.get_policy(),
+        'report': hs_manage.compact.last_report
+    })
+
+
+@app.route('/api/system/retention/<table>', methods=['PUT'])
+@require_auth
+def set_retention(table):
+    """更新表的数据保留策略"""
+    data = request.get_json() or {}
+    if not hs_manage.compact.set_policy(table, data):
+        return api_response(400, f'不支持的表或保存失败: {table}')
+    return api_response(200, '保留策略已更新', hs_manage.compact.get_policy().get(table))
+
+
+@app.route('/api/system/compact', methods=['POST'])
+@require_auth
+def run_compact():
+    """立即执行一次数据清理与压缩"""
+    try:
+        report = hs_manage.compact.run()
+        return api_response(200, f"已删除{report['rows']}行，回收{report['pages']}页", report)
+    except Exception as e:
+        return api_response(500, f'压缩失败: {str(e)}')
+
+
+@app.route('/api/system/backup', methods=['GET'])
+@require_auth
+def get_backups():
+    """获取已有的备份文件及最近一次备份报告"""
+    return api_response(200, 'success', {
+        'backups': hs_manage.backup.backups(),
+        'report': hs_manage.backup.last_report
+    })
+
+
+@app.route('/api/system/backup', methods=['POST'])
+@require_auth
+def run_backup():
+    """立即执行一次在线备份（compress: 是否压缩，keep: 保留最近的备份数量）"""
+    data = request.get_json(silent=True) or {}
+    try:
+        keep = data.get('keep')
+        report = hs_manage.backup.run(
+            compress=data.get('compress'), keep=int(keep) if keep is not None else None)
+        return api_response(200, f"已备份到{report['file']}", report)
+    except Exception as e:
+        return api_response(500, f'备份失败: {str(e)}')
+
+
 # ============================================================================
 # NAT端口转发管理API
 # ============================================================================
@@ -726,20 +836,21 @@ def get_vm_nat_rules(hs_name, vm_uuid):
 
     # 从vm_config中获取NAT规则
     nat_rules = []
-    if hasattr(vm_config, 'nat_all') and vm_config.nat_all:
-        for idx, rule in enumerate(vm_config.nat_all):
-            if hasattr(rule, '__dict__') and callable(rule.__dict__):
-                nat_rules.append(rule.__dict__())
-            elif isinstance(rule, dict):
-                nat_rules.append(rule)
-            else:
-                nat_rules.append({
-                    'protocol': getattr(rule, 'protocol', 'tcp'),
-                    'external_port': getattr(rule, 'external_port', 0),
-                    'internal_port': getattr(rule, 'internal_port', 0),
-                    'internal_ip': getattr(rule, 'internal_ip', ''),
-                    'description': getattr(rule, 'description', '')
-                })
+    with server.locker.read():
+        if hasattr(vm_config, 'nat_all') and vm_config.nat_all:
+            for idx, rule in enumerate(vm_config.nat_all):
+                if hasattr(rule, '__dict__') and callable(rule.__dict__):
+                    nat_rules.append(rule.__dict__())
+                elif isinstance(rule, dict):
+                    nat_rules.append(rule)
+                else:
+                    nat_rules.append({
+                        'protocol': getattr(rule, 'protocol', 'tcp'),
+                        'external_port': getattr(rule, 'external_port', 0),
+                        'internal_port': getattr(rule, 'internal_port', 0),
+                        'internal_ip': getattr(rule, 'internal_ip', ''),
+                        'description': getattr(rule, 'description', '')
+                    })
 
     return api_response(200, 'success', nat_rules)
 
@@ -768,11 +879,13 @@ def add_vm_nat_rule(hs_name, vm_uuid):
     }
 
     # 添加到vm_config
-    if not hasattr(vm_config, 'nat_all') or vm_config.nat_all is None:
-        vm_config.nat_all = []
-    vm_config.nat_all.append(nat_rule)
+    with server.locker.write():
+        if not hasattr(vm_config, 'nat_all') or vm_config.nat_all is None:
+            vm_config.nat_all = []
+        vm_config.nat_all.append(nat_rule)
 
-    hs_manage.all_save()
+    if not persist(hs_name, "vm_saving", keys=(vm_uuid,)):
+        return api_response(500, '数据保存失败')
     return api_response(200, 'NAT规则添加成功')
 
 
@@ -788,14 +901,14 @@ def delete_vm_nat_rule(hs_name, vm_uuid, rule_index):
     if not vm_config:
         return api_response(404, '虚拟机不存在')
 
-    if not hasattr(vm_config, 'nat_all') or not vm_config.nat_all:
-        return api_response(404, 'NAT规则不存在')
-
-    if rule_index < 0 or rule_index >= len(vm_config.nat_all):
-        return api_response(404, 'NAT规则索引无效')
-
-    vm_config.nat_all.pop(rule_index)
-    hs_manage.all_save()
+    with server.locker.write():
+        if not hasattr(vm_config, 'nat_all') or not vm_config.nat_all:
+            return api_response(404, 'NAT规则不存在')
+        if rule_index < 0 or rule_index >= len(vm_config.nat_all):
+            return api_response(404, 'NAT规则索引无效')
+        vm_config.nat_all.pop(rule_index)
+    if not persist(hs_name, "vm_saving", keys=(vm_uuid,)):
+        return api_response(500, '数据保存失败')
     return api_response(200, 'NAT规则已删除')
 
 
@@ -816,21 +929,22 @@ def get_vm_ip_addresses(hs_name, vm_uuid):
 
     # 从vm_config中获取IP地址列表
     ip_list = []
-    if hasattr(vm_config, 'ip_all') and vm_config.ip_all:
-        for ip in vm_config.ip_all:
-            if hasattr(ip, '__dict__') and callable(ip.__dict__):
-                ip_list.append(ip.__dict__())
-            elif isinstance(ip, dict):
-                ip_list.append(ip)
-            else:
-                ip_list.append({
-                    'type': getattr(ip, 'type', 'ipv4'),
-                    'address': getattr(ip, 'address', ''),
-                    'netmask': getattr(ip, 'netmask', ''),
-                    'gateway': getattr(ip, 'gateway', ''),
-                    'nic': getattr(ip, 'nic', ''),
-                    'description': getattr(ip, 'description', '')
-                })
+    with server.locker.read():
+        if hasattr(vm_config, 'ip_all') and vm_config.ip_all:
+            for ip in vm_config.ip_all:
+                if hasattr(ip, '__dict__') and callable(ip.__dict__):
+                    ip_list.append(ip.__dict__())
+                elif isinstance(ip, dict):
+                    ip_list.append(ip)
+                else:
+                    ip_list.append({
+                        'type': getattr(ip, 'type', 'ipv4'),
+                        'address': getattr(ip, 'address', ''),
+                        'netmask': getattr(ip, 'netmask', ''),
+                        'gateway': getattr(ip, 'gateway', ''),
+                        'nic': getattr(ip, 'nic', ''),
+                        'description': getattr(ip, 'description', '')
+                    })
 
     return api_response(200, 'success', ip_list)
 
@@ -860,11 +974,13 @@ def add_vm_ip_address(hs_name, vm_uuid):
     }
 
     # 添加到vm_config
-    if not hasattr(vm_config, 'ip_all') or vm_config.ip_all is None:
-        vm_config.ip_all = []
-    vm_config.ip_all.append(ip_config)
+    with server.locker.write():
+        if not hasattr(vm_config, 'ip_all') or vm_config.ip_all is None:
+            vm_config.ip_all = []
+        vm_config.ip_all.append(ip_config)
 
-    hs_manage.all_save()
+    if not persist(hs_name, "vm_saving", keys=(vm_uuid,)):
+        return api_response(500, '数据保存失败')
     return api_response(200, 'IP地址添加成功')
 
 
@@ -880,14 +996,14 @@ def delete_vm_ip_address(hs_name, vm_uuid, ip_index):
     if not vm_config:
         return api_response(404, '虚拟机不存在')
 
-    if not hasattr(vm_config, 'ip_all') or not vm_config.ip_all:
-        return api_response(404, 'IP地址不存在')
-
-    if ip_index < 0 or ip_index >= len(vm_config.ip_all):
-        return api_response(404, 'IP地址索引无效')
-
-    vm_config.ip_all.pop(ip_index)
-    hs_manage.all_save()
+    with server.locker.write():
+        if not hasattr(vm_config, 'ip_all') or not vm_config.ip_all:
+            return api_response(404, 'IP地址不存在')
+        if ip_index < 0 or ip_index >= len(vm_config.ip_all):
+            return api_response(404, 'IP地址索引无效')
+        vm_config.ip_all.pop(ip_index)
+    if not persist(hs_name, "vm_saving", keys=(vm_uuid,)):
+        return api_response(500, '数据保存失败')
     return api_response(200, 'IP地址已删除')
 
 
@@ -908,21 +1024,22 @@ def get_vm_proxy_configs(hs_name, vm_uuid):
 
     # 从vm_config中获取代理配置列表
     proxy_list = []
-    if hasattr(vm_config, 'proxy_all') and vm_config.proxy_all:
-        for proxy in vm_config.proxy_all:
-            if hasattr(proxy, '__dict__') and callable(proxy.__dict__):
-                proxy_list.append(proxy.__dict__())
-            elif isinstance(proxy, dict):
-                proxy_list.append(proxy)
-            else:
-                proxy_list.append({
-                    'domain': getattr(proxy, 'domain', ''),
-                    'backend_ip': getattr(proxy, 'backend_ip', ''),
-                    'backend_port': getattr(proxy, 'backend_port', 80),
-                    'ssl_enabled': getattr(proxy, 'ssl_enabled', False),
-                    'ssl_type': getattr(proxy, 'ssl_type', ''),
-                    'description': getattr(proxy, 'description', '')
-                })
+    with server.locker.read():
+        if hasattr(vm_config, 'proxy_all') and vm_config.proxy_all:
+            for proxy in vm_config.proxy_all:
+                if hasattr(proxy, '__dict__') and callable(proxy.__dict__):
+                    proxy_list.append(proxy.__dict__())
+                elif isinstance(proxy, dict):
+                    proxy_list.append(proxy)
+                else:
+                    proxy_list.append({
+                        'domain': getattr(proxy, 'domain', ''),
+                        'backend_ip': getattr(proxy, 'backend_ip', ''),
+                        'backend_port': getattr(proxy, 'backend_port', 80),
+                        'ssl_enabled': getattr(proxy, 'ssl_enabled', False),
+                        'ssl_type': getattr(proxy, 'ssl_type', ''),
+                        'description': getattr(proxy, 'description', '')
+                    })
 
     return api_response(200, 'success', proxy_list)
 
@@ -954,83 +1071,143 @@ def add_vm_proxy_config(hs_name, vm_uuid):
     }
 
     # 添加到vm_config
-    if not hasattr(vm_config, 'proxy_all') or vm_config.proxy_all is None:
-        vm_config.proxy_all = []
-    vm_config.proxy_all.append(proxy_config)
+    with server.locker.write():
+        if not hasattr(vm_config, 'proxy_all') or vm_config.proxy_all is None:
+            vm_config.proxy_all = []
+        vm_config.proxy_all.append(proxy_config)
 
-    hs_manage.all_save()
+    if not persist(hs_name, "vm_saving", keys=(vm_uuid,)):
+        return api_response(500, '数据保存失败')
     return api_response(200, '代理配置添加成功')
 
 
+def page_args():
+    """读取分页查询的公共参数: 时间范围、游标和条数"""
+    args = request.args
+    after_id = args.get('after_id', type=int)
+    before_id = args.get('before_id', type=int)
+    success = args.get('success', '')
+    return {
+        'hs_name': args.get('hs_name') or None,
+        'success': None if success == '' else success.lower() in ('1', 'true'),
+        'start': args.get('start') or None,
+        'end': args.get('end') or None,
+        'after_id': after_id,
+        'before_id': before_id,
+        'limit': max(1, min(args.get('limit', 100, type=int), 1000)),
+    }
+
+
+def page_result(items: list, query: dict) -> dict:
+    """
+    组装分页结果
+    latest_id: 当前最新记录ID，自动刷新时作为after_id只拉取新记录
+    next_before: 下一页游标（作为before_id），没有更多记录时为None
+    """
+    ids = [item['id'] for item in items]
+    return {
+        'items': items,
+        'latest_id': max(ids) if ids else query['after_id'],
+        'next_before': min(ids) if ids and query['after_id'] is None
+                       and len(items) >= query['limit'] else None,
+    }
+
+
 @app.route('/api/logs', methods=['GET'])
 @require_auth
 def get_logs():
-    """获取日志记录"""
+    """
+    获取日志记录（游标分页）
+    参数: hs_name, level, action, success, start, end, after_id, before_id, limit
+    """
     try:
-        hs_name = request.args.get('hs_name')
-        limit = int(request.args.get('limit', 100))
-        
-        # 直接从数据库查询以获取hs_name信息
-        conn = hs_manage.db.get_connection()
-        try:
-            if hs_name:
-                cursor = conn.execute("SELECT hs_name, log_level, log_data, created_at FROM hs_logger WHERE hs_name = ? ORDER BY created_at DESC LIMIT ?", 
-                                     (hs_name, limit))
-            else:
-                cursor = conn.execute("SELECT hs_name, log_level, log_data, created_at FROM hs_logger ORDER BY created_at DESC LIMIT ?", 
-                                     (limit,))
-            
-            processed_logs = []
-            for row in cursor.fetchall():
-                log_data = json.loads(row["log_data"])
-                processed_log = {
-                    'id': '',  # 可以添加rowid但暂时为空
-                    'actions': log_data.get('actions', ''),
-                    'message': log_data.get('message', '无消息内容'),
-                    'success': log_data.get('success', True),
-                    'results': log_data.get('results', {}),
-                    'execute': log_data.get('execute', None),
-                    'level': row['log_level'] or ('ERROR' if not log_data.get('success', True) else 'INFO'),
-                    'timestamp': row['created_at'],
-                    'host': row['hs_name'] or '系统',
-                    'created_at': row['created_at']
-                }
-                processed_logs.append(processed_log)
-            
-            return api_response(200, '获取日志成功', processed_logs)
-        finally:
-            conn.close()
+        query = page_args()
+        logs = hs_manage.db.query_logger(
+            level=request.args.get('level') or None,
+            action=request.args.get('action') or None,
+            **query)
+        processed_logs = []
+        for log_data in logs:
+            processed_logs.append({
+                'id': log_data['id'],
+                'actions': log_data.get('actions', ''),
+                'message': log_data.get('message', '无消息内容'),
+                'success': log_data.get('success', True),
+                'results': log_data.get('results', {}),
+                'execute': log_data.get('execute', None),
+                'level': log_data['level'] or ('ERROR' if not log_data.get('success', True) else 'INFO'),
+                'timestamp': log_data['created_at'],
+                'host': log_data['hs_name'] or '系统',
+                'created_at': log_data['created_at']
+            })
+        return api_response(200, '获取日志成功', page_result(processed_logs, query))
     except Exception as e:
         return api_response(500, f'获取日志失败: {str(e)}')
 
 
+def highlight(text: str, snippet: str = None, terms: list = None) -> str:
+    """生成HTML安全的高亮片段：snippet中命中词由\\x02/\\x03包围，否则在text中标记terms"""
+    if snippet is not None:
+        escaped = html.escape(snippet)
+        return escaped.replace('\x02', '<mark>').replace('\x03', '</mark>')
+    escaped = html.escape(text or '')
+    for term in terms or []:
+        escaped = escaped.replace(html.escape(term), f'<mark>{html.escape(term)}</mark>')
+    return escaped
+
+
+@app.route('/api/logs/search', methods=['GET'])
+@require_auth
+def search_logs():
+    """
+    全文搜索日志，按相关度排序
+    参数: q(关键词，空格分隔), hs_name, level, limit, offset
+    """
+    try:
+        keyword = request.args.get('q', '').strip()
+        if not keyword:
+            return api_response(400, '搜索关键词不能为空')
+        limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+        offset = max(0, request.args.get('offset', 0, type=int))
+        logs = hs_manage.db.search_logger(
+            keyword,
+            hs_name=request.args.get('hs_name') or None,
+            level=request.args.get('level') or None,
+            limit=limit, offset=offset)
+        items = []
+        for log_data in logs:
+            items.append({
+                'id': log_data['id'],
+                'actions': log_data.get('actions', ''),
+                'message': log_data.get('message', '无消息内容'),
+                'success': log_data.get('success', True),
+                'results': log_data.get('results', {}),
+                'level': log_data['level'] or ('ERROR' if not log_data.get('success', True) else 'INFO'),
+                'timestamp': log_data['created_at'],
+                'host': log_data['hs_name'] or '系统',
+                'created_at': log_data['created_at'],
+                'snippet': highlight(log_data.get('message', ''), log_data['snippet'], keyword.split()),
+                'score': log_data['score']
+            })
+        return api_response(200, '搜索日志成功', {
+            'items': items,
+            'next_offset': offset + limit if len(items) >= limit else None
+        })
+    except Exception as e:
+        return api_response(500, f'搜索日志失败: {str(e)}')
+
+
 @app.route('/api/tasks', methods=['GET'])
 @require_auth
 def get_tasks():
-    """获取任务记录"""
+    """
+    获取任务记录（游标分页）
+    参数: hs_name, success, start, end, after_id, before_id, limit
+    """
     try:
-        hs_name = request.args.get('hs_name')
-        limit = int(request.args.get('limit', 100))
-        
-        # 从vm_tasker表获取任务数据
-        conn = hs_manage.db.get_connection()
-        try:
-            if hs_name:
-                cursor = conn.execute("SELECT task_data, created_at FROM vm_tasker WHERE hs_name = ? ORDER BY created_at DESC LIMIT ?", 
-                                     (hs_name, limit))
-            else:
-                cursor = conn.execute("SELECT task_data, created_at FROM vm_tasker ORDER BY created_at DESC LIMIT ?", 
-                                     (limit,))
-            
-            tasks = []
-            for row in cursor.fetchall():
-                task_data = json.loads(row["task_data"])
-                task_data['created_at'] = row["created_at"]
-                tasks.append(task_data)
-            
-            return api_response(200, '获取任务成功', tasks)
-        finally:
-            conn.close()
+        query = page_args()
+        tasks = hs_manage.db.query_tasker(**query)
+        return api_response(200, '获取任务成功', page_result(tasks, query))
     except Exception as e:
         return api_response(500, f'获取任务失败: {str(e)}')
 
@@ -1047,56 +1224,17 @@ def delete_vm_proxy_config(hs_name, vm_uuid, proxy_index):
     if not vm_config:
         return api_response(404, '虚拟机不存在')
 
-    if not hasattr(vm_config, 'proxy_all') or not vm_config.proxy_all:
-        return api_response(404, '代理配置不存在')
-
-    if proxy_index < 0 or proxy_index >= len(vm_config.proxy_all):
-        return api_response(404, '代理配置索引无效')
-
-    vm_config.proxy_all.pop(proxy_index)
-    hs_manage.all_save()
+    with server.locker.write():
+        if not hasattr(vm_config, 'proxy_all') or not vm_config.proxy_all:
+            return api_response(404, '代理配置不存在')
+        if proxy_index < 0 or proxy_index >= len(vm_config.proxy_all):
+            return api_response(404, '代理配置索引无效')
+        vm_config.proxy_all.pop(proxy_index)
+    if not persist(hs_name, "vm_saving", keys=(vm_uuid,)):
+        return api_response(500, '数据保存失败')
     return api_response(200, '代理配置已删除')
 
 
-# ============================================================================
-# 定时任务
-# ============================================================================
-def cron_scheduler():
-    """定时任务调度器，每分钟执行一次exe_cron"""
-    try:
-        hs_manage.exe_cron()
-    except Exception as e:
-        print(f"[Cron] 执行定时任务出错: {e}")
-
-    # 设置下一次执行（60秒后）
-    timer = threading.Timer(60, cron_scheduler)
-    timer.daemon = True  # 设为守护线程，主程序退出时自动结束
-    timer.start()
-
-
-def start_cron_scheduler():
-    """启动定时任务调度器，立即执行一次并开始定时循环（非阻塞）"""
-
-    def initial_run():
-        """初始执行，在单独线程中运行以避免阻塞启动"""
-        try:
-            hs_manage.exe_cron()
-            print("[Cron] 初始执行完成")
-        except Exception as e:
-            print(f"[Cron] 初始执行出错: {e}")
-
-        # 初始执行完成后，60秒后开始定时循环
-        timer = threading.Timer(60, cron_scheduler)
-        timer.daemon = True
-        timer.start()
-
-    print("[Cron] 启动定时任务调度器...")
-    # 在单独线程中执行初始化，不阻塞主程序启动
-    init_thread = threading.Thread(target=initial_run, daemon=True)
-    init_thread.start()
-    print("[Cron] 定时任务已启动（后台运行），每60秒执行一次")
-
-
 # ============================================================================
 # 启动服务
 # ============================================================================
@@ -1113,11 +1251,29 @@ def init_app():
         hs_manage.set_pass()
         print(f"已生成访问Token: {hs_manage.bearer}")
 
-    # 启动定时任务调度器
-    start_cron_scheduler()
+    # 启动定时任务调度器（主机定时任务立即执行一次，之后每60秒一次；
+    # 另有定期保存、数据压缩（每小时）和在线备份（每天）任务）
+    hs_manage.cron_start()
+
+
+def profile_startup():
+    """启动耗时分析：加载所有主机后输出各模块导入耗时和各阶段初始化耗时，不启动Web服务"""
+    started = time.perf_counter()
+    hs_manage.all_load()
+    boot_profile.phase('HostManage.all_load', time.perf_counter() - started)
+    for name, seconds in hs_manage.load_report.get('phases', {}).items():
+        boot_profile.phase(f'  {name}', seconds)
+    for hs_type, seconds in HETiming.items():
+        boot_profile.phase(f'  HEImport({hs_type})', seconds)
+    boot_profile.remove()
+    print(boot_profile.report())
+    hs_manage.all_exit()
 
 
 if __name__ == '__main__':
+    if boot_profile is not None:
+        profile_startup()
+        sys.exit(0)
     init_app()
     print(f"\n{'=' * 60}")
     print(f"OpenIDCS Server 启动中...")
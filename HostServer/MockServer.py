@@ -0,0 +1,334 @@
+import time
+import random
+import threading
+
+from HostServer.Template import BaseServer
+from MainObject.Config.HSConfig import HSConfig
+from MainObject.Config.VMPowers import VMPowers
+from MainObject.Public.HWStatus import HWStatus
+from MainObject.Config.VMConfig import VMConfig
+from MainObject.Public.ZMessage import ZMessage
+
+
+class MockHypervisor:
+    """
+    进程内模拟的虚拟化平台：保存虚拟机的电源状态和资源使用，不访问任何外部程序
+    接口与VRestAPI中HostManage用到的部分一致（return_vmx/vmx_name），扫描虚拟机时可直接使用
+    所有方法线程安全，内部锁是叶子锁，模拟延迟在锁外等待
+    """
+
+    # 电源命令 -> (过渡状态, 最终状态)
+    TRANSITIONS = {
+        VMPowers.S_START: (VMPowers.ON_OPEN, VMPowers.STARTED),
+        VMPowers.S_RESET: (VMPowers.ON_OPEN, VMPowers.STARTED),
+        VMPowers.A_WAKED: (VMPowers.ON_WAKE, VMPowers.STARTED),
+        VMPowers.S_CLOSE: (VMPowers.ON_STOP, VMPowers.STOPPED),
+        VMPowers.H_CLOSE: (VMPowers.STOPPED, VMPowers.STOPPED),
+        VMPowers.A_PAUSE: (VMPowers.ON_SAVE, VMPowers.SUSPEND),
+    }
+
+    def __init__(self, latency: dict = None, error_rate: float = 0.0,
+                 transition: float = 2.0, seed: int = 0):
+        """
+        :param latency: 按操作设置的延迟（秒），值为数字或[最小, 最大]：
+                        list/sample/power/create/update/delete/loader/network
+        :param error_rate: 单台虚拟机状态采样失败的比例
+        :param transition: 电源操作从过渡状态到最终状态的时间（秒）
+        """
+        self.latency = dict(latency or {})
+        self.error_rate = error_rate
+        self.transition = transition
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.vms: dict[str, dict] = {}  # 虚拟机名称 -> 模拟状态
+        self.calls: dict[str, int] = {}  # 操作 -> 调用次数
+
+    # 模拟延迟 =================================================
+    def wait(self, action: str):
+        with self.lock:
+            self.calls[action] = self.calls.get(action, 0) + 1
+            delay = self.latency.get(action, 0)
+            if isinstance(delay, (list, tuple)):
+                delay = self.random.uniform(*delay)
+        if delay:
+            time.sleep(delay)
+
+    # 虚拟机名称 ===============================================
+    @staticmethod
+    def vmx_name(vmx_path: str) -> str:
+        return vmx_path.rsplit("/", 1)[-1].removesuffix(".vmx")
+
+    # 登记虚拟机（无延迟） =====================================
+    def register(self, vm_name: str, power: VMPowers = VMPowers.STOPPED,
+                 cpu_num: int = 2, mem_num: int = 2048) -> bool:
+        with self.lock:
+            if vm_name in self.vms:
+                return False
+            self.vms[vm_name] = {
+                "path": f"/mock/{vm_name}/{vm_name}.vmx", "power": power, "target": power, "until": 0.0,
+                "cpu_num": cpu_num, "mem_num": mem_num, "cpu_usage": 0, "mem_usage": 0}
+            return True
+
+    # 添加虚拟机 ===============================================
+    def loader_vmx(self, vm_name: str, cpu_num: int = 2, mem_num: int = 2048) -> ZMessage:
+        self.wait("create")
+        if not self.register(vm_name, VMPowers.STOPPED, cpu_num, mem_num):
+            return ZMessage(success=False, actions="loader_vmx", message=f"{vm_name} already exists")
+        return ZMessage(success=True, actions="loader_vmx")
+
+    # 修改虚拟机 ===============================================
+    def update_vmx(self, config: VMConfig) -> ZMessage:
+        self.wait("update")
+        with self.lock:
+            vm = self.vms.get(config.vm_uuid)
+            if vm is None:
+                return ZMessage(success=False, actions="update_vmx", message=f"{config.vm_uuid} not found")
+            vm["cpu_num"] = config.cpu_num or vm["cpu_num"]
+            vm["mem_num"] = config.mem_num or vm["mem_num"]
+        return ZMessage(success=True, actions="update_vmx")
+
+    # 删除虚拟机 ===============================================
+    def delete_vmx(self, vm_name: str) -> ZMessage:
+        self.wait("delete")
+        with self.lock:
+            if self.vms.pop(vm_name, None) is None:
+                return ZMessage(success=False, actions="delete_vmx", message=f"{vm_name} not found")
+        return ZMessage(success=True, actions="delete_vmx")
+
+    # 虚拟机列表 ===============================================
+    def return_vmx(self) -> ZMessage:
+        self.wait("list")
+        with self.lock:
+            results = [{"id": vm_name, "path": vm["path"]} for vm_name, vm in self.vms.items()]
+        return ZMessage(success=True, actions="return_vmx", results=results)
+
+    # 电源操作 =================================================
+    def powers_set(self, vm_name: str, power: VMPowers) -> ZMessage:
+        """电源命令立即进入过渡状态，transition秒后变为最终状态"""
+        self.wait("power")
+        if power not in self.TRANSITIONS:
+            return ZMessage(success=False, actions="powers_set", message=f"unsupported power: {power}")
+        with self.lock:
+            vm = self.vms.get(vm_name)
+            if vm is None:
+                return ZMessage(success=False, actions="powers_set", message=f"{vm_name} not found")
+            vm["power"], vm["target"] = self.TRANSITIONS[power]
+            vm["until"] = time.time() + self.transition
+            return ZMessage(success=True, actions="powers_set", results={"power_state": vm["power"].name})
+
+    # 状态采样 =================================================
+    def sample(self, vm_names: list[str]) -> dict[str, HWStatus | None]:
+        """
+        一次采样多台虚拟机的电源状态和资源使用，运行中的虚拟机使用率随机波动
+        :return: {虚拟机名称: 状态}，不存在或注入失败的为None
+        """
+        self.wait("sample")
+        now = time.time()
+        results = {}
+        with self.lock:
+            for vm_name in vm_names:
+                vm = self.vms.get(vm_name)
+                if vm is None or (self.error_rate and self.random.random() < self.error_rate):
+                    results[vm_name] = None
+                    continue
+                if vm["power"] != vm["target"] and now >= vm["until"]:
+                    vm["power"] = vm["target"]
+                if vm["power"] == VMPowers.STARTED:
+                    vm["cpu_usage"] = min(100, max(1, vm["cpu_usage"] + self.random.randint(-10, 10)))
+                    vm["mem_usage"] = min(vm["mem_num"], max(
+                        vm["mem_num"] // 4, vm["mem_usage"] + self.random.randint(-64, 64)))
+                else:
+                    vm["cpu_usage"] = vm["mem_usage"] = 0
+                results[vm_name] = HWStatus(
+                    ac_status=vm["power"], cpu_total=vm["cpu_num"], cpu_usage=vm["cpu_usage"],
+                    mem_total=vm["mem_num"], mem_usage=vm["mem_usage"])
+        return results
+
+    # 调用统计 =================================================
+    def stats(self) -> dict:
+        with self.lock:
+            powers = {}
+            for vm in self.vms.values():
+                powers[vm["power"].name] = powers.get(vm["power"].name, 0) + 1
+            return {"vms": len(self.vms), "powers": powers, "calls": dict(self.calls)}
+
+
+class HostServer(BaseServer):
+    # 宿主机服务 ###########################################################
+    def __init__(self, config: HSConfig, **kwargs):
+        super().__init__(config)
+        super().__load__(**kwargs)
+        # 模拟参数（hs_config.extend_data） ========================
+        extend = self.hs_config.extend_data or {}
+        self.vm_count = int(extend.get("vm_count", 100))  # 模拟平台上初始的虚拟机数量
+        self.vm_prefix = str(extend.get("vm_prefix", "mock_"))
+        self.cpu_total = int(extend.get("cpu_total", 64))
+        self.mem_total = int(extend.get("mem_total", 262144))
+        self.random = random.Random(extend.get("seed", 0))
+        # 与Vmware64使用同一属性名，HostManage.scan_vms可以扫描模拟平台上的虚拟机
+        self.vmrest_api = MockHypervisor(
+            latency=extend.get("latency"),
+            error_rate=float(extend.get("error_rate", 0.0)),
+            transition=float(extend.get("transition", 2.0)),
+            seed=int(extend.get("seed", 0)),
+        )
+        self.running = False
+
+    # 宿主机状态 ###########################################################
+    def HSStatus(self) -> HWStatus:
+        if len(self.hs_status) == 0:
+            return self.host_usage()
+        return self.hs_status[-1]
+
+    # 汇总虚拟机使用率 #####################################################
+    def host_usage(self) -> HWStatus:
+        with self.locker.read():
+            latest = [status[-1] for status in self.vm_status.values()
+                      if status and isinstance(status[-1], HWStatus)]
+        cpu_used = sum(status.cpu_usage * status.cpu_total for status in latest) / 100
+        return HWStatus(
+            ac_status=VMPowers.STARTED,
+            cpu_model="Mock CPU",
+            cpu_total=self.cpu_total,
+            cpu_usage=min(100, int(cpu_used * 100 / self.cpu_total)),
+            mem_total=self.mem_total,
+            mem_usage=min(self.mem_total, sum(status.mem_usage for status in latest)),
+            cpu_heats=40 + self.random.randint(0, 20),
+        )
+
+    # 宿主机状态 ###########################################################
+    def Crontabs(self) -> bool:
+        # 虚拟机列表 ===============================
+        all_vms = self.vmrest_api.return_vmx()
+        if not all_vms.success:
+            self.set_stale(list(self.vm_status))
+            return False
+        vm_names = []
+        for now_vmx in all_vms.results:
+            vm_name = self.vmrest_api.vmx_name(now_vmx.get("path", ""))
+            if self.hs_config.filter_name != "":
+                if not vm_name.startswith(self.hs_config.filter_name):
+                    continue
+            vm_names.append(vm_name)
+        # 采样状态（锁外），采样失败的虚拟机保留上一次的状态 ===
+        samples = self.vmrest_api.sample(vm_names)
+        if self.apply_poll(vm_names, samples) is None:
+            return False
+        # 宿主机状态由虚拟机使用率汇总 =============
+        self.add_status(self.host_usage())
+        return True
+
+    # 初始宿主机 ###########################################################
+    def HSCreate(self) -> ZMessage:
+        hs_result = ZMessage(success=True, actions="HSCreate")
+        self.add_log(hs_result)
+        return hs_result
+
+    # 还原宿主机 ###########################################################
+    def HSDelete(self) -> ZMessage:
+        hs_result = ZMessage(success=True, actions="HSDelete")
+        self.add_log(hs_result)
+        return hs_result
+
+    # 读取宿主机 ###########################################################
+    def HSLoader(self) -> ZMessage:
+        """生成模拟平台上的虚拟机，并补充数据库中已保存但模拟平台上不存在的虚拟机"""
+        self.vmrest_api.wait("loader")
+        with self.locker.read():
+            saved = list(self.vm_saving.items())
+        for i in range(self.vm_count):
+            self.vmrest_api.register(f"{self.vm_prefix}{i:04d}", VMPowers.STARTED if i % 2 else VMPowers.STOPPED)
+        for vm_name, vm_config in saved:
+            self.vmrest_api.register(vm_name, cpu_num=getattr(vm_config, "cpu_num", 0) or 2,
+                                     mem_num=getattr(vm_config, "mem_num", 0) or 2048)
+        self.running = True
+        hs_result = ZMessage(success=True, actions="HSLoader", message="OK")
+        self.add_log(hs_result)
+        return hs_result
+
+    # 卸载宿主机 ###########################################################
+    def HSUnload(self) -> ZMessage:
+        if not self.running:
+            return ZMessage(success=False, actions="HSUnload", message="Mock host is not running")
+        self.vmrest_api.wait("loader")
+        self.running = False
+        hs_result = ZMessage(success=True, actions="HSUnload", message="Mock host stopped")
+        self.add_log(hs_result)
+        return hs_result
+
+    # 宿主机操作 ###########################################################
+    def HSAction(self, action: str = "") -> ZMessage:
+        hs_result = ZMessage(success=True, actions="HSAction")
+        self.add_log(hs_result)
+        return hs_result
+
+    # 静态IP ###############################################################
+    def NCStatic(self, ip, mac, uuid, flag=True) -> ZMessage:
+        self.vmrest_api.wait("network")
+        return ZMessage(success=True, actions="NCStatic")
+
+    # 端口映射 #############################################################
+    def PortsMap(self, ip, in_pt, ex_pt=None, flag=True) -> ZMessage:
+        self.vmrest_api.wait("network")
+        return ZMessage(success=True, actions="PortsMap")
+
+    # 虚拟机列出 ###########################################################
+    def VMStatus(self, select: str = "") -> dict[str, list[HWStatus]]:
+        with self.locker.read():
+            if len(select) > 0:
+                if select not in self.vm_status:
+                    return {select: [HWStatus()]}
+                return {select: list(self.vm_status[select])}
+            return {vm_uuid: list(status) for vm_uuid, status in self.vm_status.items()}
+
+    # 创建虚拟机 ###########################################################
+    def VMCreate(self, config: VMConfig) -> ZMessage:
+        hs_result = self.vmrest_api.loader_vmx(
+            config.vm_uuid, cpu_num=config.cpu_num or 2, mem_num=config.mem_num or 2048)
+        if hs_result.success:
+            self.set_vm(config)
+            self.add_vm_status(config.vm_uuid, HWStatus(ac_status=VMPowers.STOPPED), keep=1)
+        hs_result.actions = "VMCreate"
+        self.add_log(hs_result)
+        return hs_result
+
+    # 安装虚拟机 ###########################################################
+    def VInstall(self, config: VMConfig) -> ZMessage:
+        pass
+
+    # 配置虚拟机 ###########################################################
+    def VMUpdate(self, config: VMConfig) -> ZMessage:
+        vm_uuid = config.vm_uuid
+        if vm_uuid not in self.vm_saving:
+            return ZMessage(
+                success=False, actions="VMUpdate",
+                message=f"虚拟机 {vm_uuid} 不存在")
+        hs_result = self.vmrest_api.update_vmx(config)
+        if hs_result.success:
+            self.set_vm(config)
+        hs_result.actions = "VMUpdate"
+        self.add_log(hs_result)
+        return hs_result
+
+    # 删除虚拟机 ###########################################################
+    def VMDelete(self, select: str) -> ZMessage:
+        hs_result = self.vmrest_api.delete_vmx(select)
+        if hs_result.success:
+            self.del_vm(select)
+        self.add_log(hs_result)
+        return hs_result
+
+    # 虚拟机电源 ###########################################################
+    def VMPowers(self, select: str, power: VMPowers) -> ZMessage:
+        hs_result = self.vmrest_api.powers_set(select, power)
+        # 记录过渡状态，下次定时任务时以模拟平台的状态为准
+        if hs_result.success:
+            self.set_vm_power(select, VMPowers[hs_result.results["power_state"]])
+        self.add_log(hs_result)
+        return hs_result
+
+    # 虚拟机控制 ###########################################################
+    def VConsole(self, select: str) -> str:
+        if select not in self.vmrest_api.vms:
+            return ""
+        return f"mock://{self.hs_name}/{select}"
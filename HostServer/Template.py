@@ -1,26 +1,34 @@
 import abc
+import time
+import threading
+from collections import deque
+
 from MainObject.Config.HSConfig import HSConfig
 from MainObject.Server.HSTasker import HSTasker
 from MainObject.Config.VMPowers import VMPowers
 from MainObject.Public.HWStatus import HWStatus
 from MainObject.Public.ZMessage import ZMessage
 from MainObject.Config.VMConfig import VMConfig
-from NetsManage import NetsManage
+from HostModule.HostLocker import HostLocker
 
 
 class BaseServer(abc.ABC):
     def __init__(self, config: HSConfig, **kwargs):
         # 宿主机配置 =========================================
         self.hs_config: HSConfig | None = config  # 物理机配置
-        self.hs_status: list[HWStatus] = []  # Hosts主机使用率
-        self.hs_logger: list[ZMessage] = []  # SUB搜集日志记录
+        self.hs_status: deque[HWStatus] = deque(maxlen=60)  # 最近的主机使用率
+        self.hs_logger: deque[ZMessage] = deque(maxlen=1000)  # 最近日志记录
         # 虚拟机配置 =========================================
         self.vm_saving: dict[str, VMConfig] = {}  # 存储的配置
         self.vm_status: dict[str, list[HWStatus]] = {}  # 状态
         self.vm_tasker: list[HSTasker] = []  # SUB搜集任务列表
+        self.vm_stale: dict[str, int] = {}  # 状态未能刷新的虚拟机 -> 开始过期的时间（Unix秒，不保存）
         # 数据库引用 =========================================
         self.db = kwargs.get('db', None)  # 数据库操作实例
         self.hs_name = kwargs.get('hs_name', '')  # 主机名称
+        self.version: int = 0  # 虚拟机配置/状态的版本号，每次修改后递增
+        self.cancelled = threading.Event()  # 定时任务超时后被设置，Crontabs应尽快放弃本次执行
+        self.locker = HostLocker()  # 内存数据读写锁，加锁顺序见HostModule/HostLocker.py
         # 加载数据 ===========================================
         self.__load__(**kwargs)
 
@@ -40,29 +48,30 @@ class BaseServer(abc.ABC):
 
     # 转换为字典 =============================================
     def __dict__(self):
-        return {
-            "hs_config": self.__to_dict__(self.hs_config),
-            "hs_status": [
-                self.__to_dict__(status)
-                for status in self.hs_status
-            ],
-            "vm_saving": {
-                string: self.__to_dict__(saving)
-                for string, saving in self.vm_saving.items()
-            },
-            "vm_status": {
-                string: self.__to_dict__(record)
-                for string, record in self.vm_status.items()
-            },
-            "vm_tasker": [
-                self.__to_dict__(tasker)
-                for tasker in self.vm_tasker
-            ],
-            "save_logs": [
-                self.__to_dict__(logger)
-                for logger in self.hs_logger
-            ]
-        }
+        with self.locker.read():
+            return {
+                "hs_config": self.__to_dict__(self.hs_config),
+                "hs_status": [
+                    self.__to_dict__(status)
+                    for status in self.hs_status
+                ],
+                "vm_saving": {
+                    string: self.__to_dict__(saving)
+                    for string, saving in self.vm_saving.items()
+                },
+                "vm_status": {
+                    string: self.__to_dict__(record)
+                    for string, record in self.vm_status.items()
+                },
+                "vm_tasker": [
+                    self.__to_dict__(tasker)
+                    for tasker in self.vm_tasker
+                ],
+                "save_logs": [
+                    self.__to_dict__(logger)
+                    for logger in self.hs_logger
+                ]
+            }
 
     # 加载数据 ===============================================
     def __load__(self, **kwargs):
@@ -73,13 +82,15 @@ class BaseServer(abc.ABC):
     # 读取数据 ===============================================
     def __read__(self, data: dict):
         self.hs_config = HSConfig(data["hs_config"])
-        self.hs_status = data["hs_status"]
+        self.hs_status = deque(data["hs_status"], maxlen=self.hs_status.maxlen)
         self.vm_saving = data["vm_saving"]
         self.vm_status = data["vm_status"]
         self.vm_tasker = data["vm_tasker"]
-        self.hs_logger = data["save_logs"]
+        self.hs_logger = deque(data["save_logs"], maxlen=self.hs_logger.maxlen)
 
     # 执行此任务 =============================================
+    # 执行时间较长的实现应在循环中检查self.cancelled，超时后不再修改内存数据；
+    # 远程查询在锁外进行，结果在self.locker写锁内整体替换
     def Crontabs(self) -> ZMessage:
         pass
 
@@ -109,6 +120,7 @@ class BaseServer(abc.ABC):
 
     # 静态IP #########################################################
     def NCStatic(self, ip, mac, uuid, flag=True) -> ZMessage:
+        from NetsManage import NetsManage  # 按需导入（依赖requests）
         nc_server = NetsManage(
             self.hs_config.i_kuai_addr,
             self.hs_config.i_kuai_user,
@@ -122,6 +134,7 @@ class BaseServer(abc.ABC):
     # 端口映射 #######################################################
     def PortsMap(self, ip, in_pt, ex_pt=None,
                  flag=True) -> ZMessage:
+        from NetsManage import NetsManage  # 按需导入（依赖requests）
         nc_server = NetsManage(
             self.hs_config.i_kuai_addr,
             self.hs_config.i_kuai_user,
@@ -172,50 +185,174 @@ class BaseServer(abc.ABC):
         """从数据库重新加载虚拟机数据"""
         if self.db and self.hs_name:
             try:
-                # 从数据库获取主机状态
-                hs_status_data = self.db.get_hs_status(self.hs_name)
-                if hs_status_data:
-                    self.hs_status = hs_status_data
-
-                # 从数据库获取虚拟机配置
+                # 先读取到局部变量，读取完成后在写锁内整体替换
+                hs_status_data = self.db.get_hs_status(self.hs_name, self.hs_status.maxlen)
                 vm_saving_data = self.db.get_vm_saving(self.hs_name)
-                if vm_saving_data:
-                    self.vm_saving = {}
-                    for vm_uuid, vm_config in vm_saving_data.items():
-                        if isinstance(vm_config, dict):
-                            self.vm_saving[vm_uuid] = VMConfig(**vm_config)
-                        else:
-                            self.vm_saving[vm_uuid] = vm_config
-
-                # 从数据库获取虚拟机状态
                 vm_status_data = self.db.get_vm_status(self.hs_name)
-                if vm_status_data:
-                    self.vm_status = vm_status_data
-
-                # 从数据库获取虚拟机任务
                 vm_tasker_data = self.db.get_vm_tasker(self.hs_name)
-                if vm_tasker_data:
-                    self.vm_tasker = vm_tasker_data
-
-                # 从数据库获取日志记录
-                logger_data = self.db.get_logger(self.hs_name)
-                if logger_data:
-                    self.hs_logger = []
-                    for log_data in logger_data:
-                        if isinstance(log_data, dict):
-                            self.hs_logger.append(ZMessage(**log_data))
-                        else:
-                            self.hs_logger.append(log_data)
+                logger_data = self.db.get_logger(self.hs_name, self.hs_logger.maxlen)
+
+                with self.locker.write():
+                    # 最近的主机状态
+                    if hs_status_data:
+                        self.hs_status = deque(hs_status_data, maxlen=self.hs_status.maxlen)
+
+                    # 虚拟机配置
+                    if vm_saving_data:
+                        self.vm_saving = {}
+                        for vm_uuid, vm_config in vm_saving_data.items():
+                            if isinstance(vm_config, dict):
+                                self.vm_saving[vm_uuid] = VMConfig(**vm_config)
+                            else:
+                                self.vm_saving[vm_uuid] = vm_config
+
+                    # 虚拟机状态
+                    if vm_status_data:
+                        self.vm_status = vm_status_data
 
+                    # 虚拟机任务
+                    if vm_tasker_data:
+                        self.vm_tasker = vm_tasker_data
+
+                    # 最近的日志记录
+                    if logger_data:
+                        self.hs_logger = deque(maxlen=self.hs_logger.maxlen)
+                        for log_data in logger_data:
+                            if isinstance(log_data, dict):
+                                self.hs_logger.append(ZMessage(**log_data))
+                            else:
+                                self.hs_logger.append(log_data)
+
+                    self.touch()
                 return True
             except Exception as e:
                 print(f"从数据库加载数据失败: {e}")
                 return False
         return False
 
+    # 添加主机状态 ###################################################
+    def add_status(self, status: HWStatus):
+        """添加主机状态样本，内存中只保留最近的样本，数据库追加写入并汇总"""
+        self.hs_status.append(status)
+        if self.db and self.hs_name:
+            self.db.series.record(self.hs_name, status)
+
+    # 标记数据变化 ###################################################
+    def touch(self) -> int:
+        """虚拟机配置或状态在内存中被修改后调用，使读取缓存失效"""
+        self.version += 1
+        return self.version
+
+    # 登记未保存的修改 ###############################################
+    def mark_dirty(self, table: str, *keys: str):
+        """内存数据已修改但未写入数据库时调用，定时保存只写入登记的行（见HostDatabase.mark_dirty）"""
+        if self.db and self.hs_name:
+            self.db.mark_dirty(table, self.hs_name, *keys)
+
+    # 合并查询结果 ###################################################
+    def apply_poll(self, vm_names: list[str], results: dict[str, HWStatus | None]) -> dict[str, int] | None:
+        """
+        在写锁内用本次查询结果整体替换虚拟机状态，查询失败的虚拟机保留上一次的状态并标记为过期
+        :param vm_names: 本次列出的虚拟机（不在列表中的虚拟机被移除）
+        :param results: {虚拟机名称: 状态}，查询失败的为None
+        :return: 过期的虚拟机 {名称: 开始过期的时间}，已取消时返回None且不修改内存数据
+        """
+        if self.cancelled.is_set():
+            return None
+        now = int(time.time())
+        with self.locker.write():
+            if self.cancelled.is_set():
+                return None
+            vm_status: dict[str, list[HWStatus]] = {}
+            vm_stale: dict[str, int] = {}
+            changed: list[str] = []  # 状态变化、新增或移除的虚拟机，保存时只写入这些行
+            for vm_name in vm_names:
+                status = results.get(vm_name)
+                old = self.vm_status.get(vm_name)
+                if status is not None:
+                    vm_status[vm_name] = [status]
+                    if not old or len(old) != 1 or self.__to_dict__(old[0]) != status.__dict__():
+                        changed.append(vm_name)
+                    continue
+                vm_status[vm_name] = old or [HWStatus(ac_status=VMPowers.UNKNOWN)]
+                vm_stale[vm_name] = self.vm_stale.get(vm_name, now)
+                if not old:
+                    changed.append(vm_name)
+            changed.extend(vm_name for vm_name in self.vm_status if vm_name not in vm_status)
+            self.vm_status = vm_status
+            self.vm_stale = vm_stale
+            if changed:
+                self.mark_dirty("vm_status", *changed)
+            self.touch()
+        return vm_stale
+
+    # 标记过期状态 ###################################################
+    def set_stale(self, vm_names: list[str]):
+        """无法获取虚拟机列表时调用，保留上一次的状态并全部标记为过期"""
+        now = int(time.time())
+        with self.locker.write():
+            self.vm_stale = {vm_name: self.vm_stale.get(vm_name, now) for vm_name in vm_names}
+            self.touch()
+
+    # 保存虚拟机配置 #################################################
+    def set_vm(self, config: VMConfig) -> bool:
+        """更新单台虚拟机的配置，数据库只写入这一行"""
+        with self.locker.write():
+            self.vm_saving[config.vm_uuid] = config
+            self.touch()
+            if self.db and self.hs_name and not self.db.upsert_vm(self.hs_name, config.vm_uuid, config):
+                self.mark_dirty("vm_saving", config.vm_uuid)  # 写入失败，定时保存时重试
+                return False
+            return True
+
+    # 删除虚拟机配置 #################################################
+    def del_vm(self, vm_uuid: str) -> bool:
+        """删除单台虚拟机的配置和状态，数据库只删除这台虚拟机的行"""
+        with self.locker.write():
+            self.vm_saving.pop(vm_uuid, None)
+            self.vm_status.pop(vm_uuid, None)
+            self.vm_stale.pop(vm_uuid, None)
+            self.touch()
+            if self.db and self.hs_name and not self.db.delete_vm(self.hs_name, vm_uuid):
+                self.mark_dirty("vm_saving", vm_uuid)
+                self.mark_dirty("vm_status", vm_uuid)
+                return False
+            return True
+
+    # 添加虚拟机状态 #################################################
+    def add_vm_status(self, vm_uuid: str, status: HWStatus, keep: int = None) -> bool:
+        """追加单台虚拟机的状态样本，数据库只读写这台虚拟机的行"""
+        with self.locker.write():
+            status_list = self.vm_status.setdefault(vm_uuid, [])
+            status_list.append(status)
+            if keep:
+                del status_list[:-keep]
+            self.touch()
+            if self.db and self.hs_name and not self.db.append_vm_status(self.hs_name, vm_uuid, status, keep):
+                self.mark_dirty("vm_status", vm_uuid)
+                return False
+            return True
+
+    # 修改虚拟机电源 #################################################
+    def set_vm_power(self, vm_uuid: str, power: VMPowers) -> bool:
+        """修改单台虚拟机最新状态样本的电源状态，数据库只读写这台虚拟机的行"""
+        with self.locker.write():
+            status_list = self.vm_status.setdefault(vm_uuid, [])
+            if not status_list:
+                status_list.append(HWStatus(ac_status=power))
+            elif isinstance(status_list[-1], dict):
+                status_list[-1] = {**status_list[-1], "ac_status": VMPowers.to_json(power)}
+            else:
+                status_list[-1].ac_status = power
+            self.touch()
+            if self.db and self.hs_name and not self.db.set_vm_power(self.hs_name, vm_uuid, power):
+                self.mark_dirty("vm_status", vm_uuid)
+                return False
+            return True
+
     # 添加日志记录 ###################################################
     def add_log(self, log: ZMessage):
-        """添加日志记录并保存到数据库"""
+        """添加日志记录，内存中只保留最近的记录，数据库追加写入"""
         self.hs_logger.append(log)
         if self.db and self.hs_name:
-            self.db.save_logger(self.hs_name, self.hs_logger)
+            self.db.append_logger(self.hs_name, log)
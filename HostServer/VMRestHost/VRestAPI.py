@@ -1,4 +1,11 @@
+import os
+import time
+import random
+import threading
+from collections import deque
+
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 
 from MainObject.Config.VMConfig import VMConfig
@@ -8,15 +15,49 @@ from MainObject.Config.VMPowers import VMPowers
 
 
 class VRestAPI:
+    # 可以安全重试的HTTP方法（读操作），其他方法只在连接超时（请求未发出）时重试
+    RETRY_METHODS = ("GET", "HEAD", "OPTIONS")
+    # 服务端暂时不可用，可以重试的状态码
+    RETRY_STATUS = (502, 503, 504)
+
     def __init__(self,
                  host_addr="localhost:8697",
                  host_user="root",
                  host_pass="password",
-                 ver_agent=21):
+                 ver_agent=21,
+                 index_ttl=30.0,
+                 timeout=(3.05, 30.0),
+                 retries=2,
+                 backoff=0.2,
+                 pool_size=8):
+        """
+        :param timeout: (连接超时, 读取超时)秒，vmrest无响应时不会一直阻塞
+        :param retries: 可重试请求的最大重试次数
+        :param backoff: 重试等待的基数（秒），第n次重试随机等待0~backoff*2^n秒
+        :param pool_size: 连接池大小（同时保持的长连接数量）
+        """
         self.host_addr = host_addr
         self.host_user = host_user
         self.host_pass = host_pass
         self.ver_agent = ver_agent
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        # 长连接会话：复用TCP连接和认证信息 =======================
+        self.session = requests.Session()
+        self.session.auth = HTTPBasicAuth(host_user, host_pass)
+        self.session.headers["Content-Type"] = "application/vnd.vmware.vmw.rest-v1+json"
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # 请求耗时统计: "方法 路径" -> {...} =========================
+        self.latency: dict[str, dict] = {}
+        self.latency_lock = threading.Lock()
+        # 虚拟机名称 -> ID索引（由一次/vms响应生成，超过index_ttl秒后重新获取）
+        self.index_ttl = index_ttl
+        self.vmx_index: dict[str, str] = {}
+        self.index_time = 0.0  # 索引生成时间（monotonic），0表示需要重新获取
+        self.index_lock = threading.Lock()
 
     @staticmethod
     # 创建vmx文本 #########################################################
@@ -38,6 +79,80 @@ class VRestAPI:
                     result += f"{full_key} = {value}\n"
         return result
 
+    # 发送请求 ##########################################################
+    # 使用长连接会话发送请求，带连接/读取超时，可重试的请求失败后随机退避重试
+    # :param method: HTTP方法
+    # :param url: API端点路径 (如 /vms, /vms/{id}/power)
+    # :return: requests.Response（状态码为2xx）
+    # :raise requests.exceptions.RequestException: 重试后仍然失败
+    # #####################################################################
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        full_url = f"http://{self.host_addr}/api{url}"
+        retry = method in self.RETRY_METHODS
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, full_url, timeout=self.timeout, **kwargs)
+                if retry and response.status_code in self.RETRY_STATUS and attempt < self.retries:
+                    self.record(method, url, time.perf_counter() - started, attempt, failed=True)
+                else:
+                    response.raise_for_status()
+                    self.record(method, url, time.perf_counter() - started, attempt)
+                    return response
+            except requests.exceptions.RequestException as e:
+                self.record(method, url, time.perf_counter() - started, attempt, failed=True)
+                # 连接超时说明请求没有发出，任何方法都可以重试
+                can_retry = retry and isinstance(e, (requests.exceptions.ConnectionError,
+                                                     requests.exceptions.Timeout))
+                if not (can_retry or isinstance(e, requests.exceptions.ConnectTimeout)) \
+                        or attempt >= self.retries:
+                    raise
+            attempt += 1
+            time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+    # 记录请求耗时 ########################################################
+    def record(self, method: str, url: str, seconds: float, attempt: int, failed: bool = False):
+        # 虚拟机ID替换为{id}，同一接口合并统计
+        parts = url.split("?")[0].split("/")
+        if len(parts) > 2 and parts[1] == "vms" and parts[2] != "registration":
+            parts[2] = "{id}"
+        key = f"{method} {'/'.join(parts)}"
+        with self.latency_lock:
+            stats = self.latency.get(key)
+            if stats is None:
+                stats = self.latency[key] = {"calls": 0, "errors": 0, "retries": 0, "seconds": 0.0,
+                                             "max": 0.0, "recent": deque(maxlen=256)}
+            stats["calls"] += 1
+            stats["errors"] += 1 if failed else 0
+            stats["retries"] += 1 if attempt else 0
+            stats["seconds"] += seconds
+            stats["max"] = max(stats["max"], seconds)
+            stats["recent"].append(seconds)
+
+    # 请求耗时统计 ########################################################
+    # :return: {"方法 路径": {"calls", "errors", "retries", "avg_ms", "p50_ms", "p95_ms", "max_ms"}}
+    # #####################################################################
+    def latency_stats(self) -> dict:
+        with self.latency_lock:
+            result = {}
+            for key, stats in sorted(self.latency.items()):
+                recent = sorted(stats["recent"])
+                result[key] = {
+                    "calls": stats["calls"],
+                    "errors": stats["errors"],
+                    "retries": stats["retries"],
+                    "avg_ms": round(stats["seconds"] * 1000 / stats["calls"], 2),
+                    "p50_ms": round(recent[len(recent) // 2] * 1000, 2),
+                    "p95_ms": round(recent[min(len(recent) - 1, int(len(recent) * 0.95))] * 1000, 2),
+                    "max_ms": round(stats["max"] * 1000, 2),
+                }
+            return result
+
+    # 关闭连接 ############################################################
+    def close(self):
+        self.session.close()
+
     # VMRestAPI ###########################################################
     # 发送VMRest API请求
     # :param url: API端点路径 (如 /vms, /vms/{id}/power)
@@ -46,20 +161,11 @@ class VRestAPI:
     # :return: ZMessage对象
     # #####################################################################
     def vmrest_api(self, url: str, data=None, m: str = "GET") -> ZMessage:
-        full_url = f"http://{self.host_addr}/api{url}"
-        auth = HTTPBasicAuth(self.host_user, self.host_pass)
-        # 设置请求头 ======================================================
-        head = {"Content-Type": "application/vnd.vmware.vmw.rest-v1+json"}
-        methods = {"GET": requests.get, "POST": requests.post,
-                   "PUT": requests.put, "DELETE": requests.delete}
-        try:  # 无效请求 ==================================================
-            if m.upper() not in methods:
-                return ZMessage(success=False, actions="vmrest_api",
-                                message=f"不支持的HTTP方法: {m}")
-            # 发送请求 ====================================================
-            response = methods[m.upper()](
-                full_url, auth=auth, headers=head, json=data)
-            response.raise_for_status()
+        if m.upper() not in ("GET", "POST", "PUT", "DELETE"):  # 无效请求 =====
+            return ZMessage(success=False, actions="vmrest_api",
+                            message=f"不支持的HTTP方法: {m}")
+        try:  # 发送请求 ==================================================
+            response = self.request(m.upper(), url, json=data)
             # 返回成功消息 ================================================
             return ZMessage(
                 success=True, actions="vmrest_api", message="请求成功",
@@ -76,16 +182,8 @@ class VRestAPI:
     # :return: ZMessage对象
     # #####################################################################
     def powers_api(self, url: str, power: str) -> ZMessage:
-        full_url = f"http://{self.host_addr}/api{url}"
-        auth = HTTPBasicAuth(self.host_user, self.host_pass)
-        head = {"Content-Type": "application/vnd.vmware.vmw.rest-v1+json"}
         try:
-            response = requests.put(
-                full_url,
-                auth=auth,
-                headers=head,
-                data=power)
-            response.raise_for_status()
+            response = self.request("PUT", url, data=power)
             return ZMessage(
                 success=True,
                 actions="vmrest_api_power",
@@ -101,49 +199,89 @@ class VRestAPI:
             )
 
     # 获取所有虚拟机列表 ##################################################
+    # 同时用返回的列表刷新名称索引
     # return: ZMessage对象
     # #####################################################################
     def return_vmx(self) -> ZMessage:
-        return self.vmrest_api("/vms")
+        result = self.vmrest_api("/vms")
+        if result.success and isinstance(result.results, list):
+            self.vmx_index = {
+                self.vmx_name(vm.get("path", "")): vm.get("id", "")
+                for vm in result.results if vm.get("path") and vm.get("id")}
+            self.index_time = time.monotonic()
+        return result
+
+    # 虚拟机名称 ##########################################################
+    # 从.vmx路径中提取虚拟机名称（不含扩展名）
+    # #####################################################################
+    @staticmethod
+    def vmx_name(vm_path: str) -> str:
+        # VMRest运行在Windows上，路径分隔符统一为/后再取文件名
+        return os.path.splitext(os.path.basename(vm_path.replace("\\", "/")))[0]
+
+    # 名称索引 ############################################################
+    # 获取虚拟机名称 -> ID索引，超过index_ttl秒或force时重新获取/vms
+    # :param force: 强制重新获取
+    # :return: 名称索引（整体替换，调用方不能修改）
+    # #####################################################################
+    def index_vmx(self, force: bool = False) -> dict[str, str]:
+        if not force and self.index_time and time.monotonic() - self.index_time < self.index_ttl:
+            return self.vmx_index
+        with self.index_lock:
+            # 等待期间其他线程已刷新
+            if self.index_time and time.monotonic() - self.index_time < (0.0 if force else self.index_ttl):
+                return self.vmx_index
+            self.return_vmx()
+            return self.vmx_index
+
+    # 索引失效 ############################################################
+    # 注册/删除虚拟机后调用，下次查询时重新获取/vms
+    # #####################################################################
+    def index_drop(self):
+        self.index_time = 0.0
 
     # 选择虚拟机ID ########################################################
-    # 根据虚拟机名称获取虚拟机ID
+    # 根据虚拟机名称获取虚拟机ID（按.vmx文件名精确匹配），
+    # 索引中没有时重新获取一次，以发现在其他地方注册的虚拟机
     # :param vm_name: 虚拟机名称
     # :return: 虚拟机ID，未找到返回空字符串
     # #####################################################################
     def select_vid(self, vm_name: str) -> str:
-        result = self.return_vmx()
-        if not result.success:
-            return ""
-        vms = result.results if isinstance(result.results, list) else []
-        for vm in vms:
-            # VMRest API返回的虚拟机信息包含id和path字段
-            # 从path中提取虚拟机名称进行匹配
-            vm_path = vm.get("path", "")
-            vm_id = vm.get("id", "")
-            # 方式1：直接匹配路径中的虚拟机名称
-            if vm_name in vm_path:
-                return vm_id
-            # 方式2：提取.vmx文件名进行匹配
-            import os
-            vmx_name = os.path.splitext(os.path.basename(vm_path))[0]
-            if vmx_name == vm_name:
-                return vm_id
-        return ""
+        vm_id = self.index_vmx().get(vm_name, "")
+        if not vm_id:
+            vm_id = self.index_vmx(force=True).get(vm_name, "")
+        return vm_id
 
-    # 获取虚拟机电源状态 ##################################################
-    # 获取指定虚拟机的电源状态
+    # 按名称调用虚拟机API ##################################################
+    # 解析虚拟机ID后调用，ID已失效(404，虚拟机被重新注册)时刷新索引重试一次
     # :param vm_name: 虚拟机名称
+    # :param actions: 未找到虚拟机时返回的操作名称
+    # :param call: 使用虚拟机ID发送请求的函数
     # #####################################################################
-    def powers_get(self, vm_name: str) -> ZMessage:
+    def select_api(self, vm_name: str, actions: str, call) -> ZMessage:
         vm_id = self.select_vid(vm_name)
         if not vm_id:
             return ZMessage(
                 success=False,
-                actions="get_powers",
+                actions=actions,
                 message=f"未找到虚拟机: {vm_name}"
             )
-        return self.vmrest_api(f"/vms/{vm_id}/power")
+        result = call(vm_id)
+        response = getattr(result.execute, "response", None)
+        if not result.success and getattr(response, "status_code", None) == 404:
+            new_id = self.index_vmx(force=True).get(vm_name, "")
+            if new_id and new_id != vm_id:
+                result = call(new_id)
+        return result
+
+    # 获取虚拟机电源状态 ##################################################
+    # 获取指定虚拟机的电源状态
+    # :param vm_name: 虚拟机名称
+    # #####################################################################
+    def powers_get(self, vm_name: str) -> ZMessage:
+        return self.select_api(
+            vm_name, "get_powers",
+            lambda vm_id: self.vmrest_api(f"/vms/{vm_id}/power"))
 
     # 设置虚拟机电源状态 ##################################################
     # :param vm_name: 虚拟机名称
@@ -163,19 +301,12 @@ class VRestAPI:
             VMPowers.A_WAKED: "unpause",
         }
         state_str = power_map.get(power, "on")
-        vm_id = self.select_vid(vmx_name)
-        if not vm_id:
-            return ZMessage(
-                success=False,
-                actions="set_powers",
-                message=f"未找到虚拟机: {vmx_name}"
-            )
         # 构建URL，如果有密码则添加查询参数
-        url = f"/vms/{vm_id}/power"
-        if self.host_pass:
-            url += f"?vmPassword={self.host_pass}"
+        query = f"?vmPassword={self.host_pass}" if self.host_pass else ""
         # VMRest API要求PUT请求体为纯字符串
-        return self.powers_api(url, state_str)
+        return self.select_api(
+            vmx_name, "set_powers",
+            lambda vm_id: self.powers_api(f"/vms/{vm_id}/power{query}", state_str))
 
     # 注册虚拟机 ##########################################################
     # 注册虚拟机到VMware Workstation
@@ -183,42 +314,37 @@ class VRestAPI:
     # :param vm_name: 虚拟机名称（可选，默认使用vmx文件名）
     # #####################################################################
     def loader_vmx(self, vmx_path: str, vm_name: str = None) -> ZMessage:
-        import os
         if vm_name is None:
             # 从路径中提取虚拟机名称（不含扩展名）
-            vm_name = os.path.splitext(os.path.basename(vmx_path))[0]
-        return self.vmrest_api(
+            vm_name = self.vmx_name(vmx_path)
+        result = self.vmrest_api(
             "/vms/registration",
             {"name": vm_name, "path": vmx_path},
             "POST")
+        # 新注册的虚拟机ID，下次查询时重新获取
+        self.index_drop()
+        return result
 
     # 删除虚拟机 ##########################################################
     # 从VMware Workstation中删除虚拟机
     # :param vm_name: 虚拟机名称
     # #####################################################################
     def delete_vmx(self, vm_name: str) -> ZMessage:
-        vm_id = self.select_vid(vm_name)
-        if not vm_id:
-            return ZMessage(
-                success=False,
-                actions="delete_vmx",
-                message=f"未找到虚拟机: {vm_name}"
-            )
-        return self.vmrest_api(f"/vms/{vm_id}", m="DELETE")
+        result = self.select_api(
+            vm_name, "delete_vmx",
+            lambda vm_id: self.vmrest_api(f"/vms/{vm_id}", m="DELETE"))
+        if result.success:
+            self.index_drop()
+        return result
 
     # 获取虚拟机配置 ######################################################
     # 获取虚拟机配置信息
     # :param vm_name: 虚拟机名称
     # #####################################################################
     def config_get(self, vm_name: str) -> ZMessage:
-        vm_id = self.select_vid(vm_name)
-        if not vm_id:
-            return ZMessage(
-                success=False,
-                actions="get_config",
-                message=f"未找到虚拟机: {vm_name}"
-            )
-        return self.vmrest_api(f"/vms/{vm_id}")
+        return self.select_api(
+            vm_name, "get_config",
+            lambda vm_id: self.vmrest_api(f"/vms/{vm_id}"))
 
     # 更新虚拟机配置 ######################################################
     # 更新虚拟机配置
@@ -226,14 +352,9 @@ class VRestAPI:
     # :param config: 配置字典
     # #####################################################################
     def config_set(self, vm_name: str, config: dict) -> ZMessage:
-        vm_id = self.select_vid(vm_name)
-        if not vm_id:
-            return ZMessage(
-                success=False,
-                actions="set_config",
-                message=f"未找到虚拟机: {vm_name}"
-            )
-        return self.vmrest_api(f"/vms/{vm_id}", config, "PUT")
+        return self.select_api(
+            vm_name, "set_config",
+            lambda vm_id: self.vmrest_api(f"/vms/{vm_id}", config, "PUT"))
 
     # 获取网络列表 ########################################################
     # 获取所有虚拟网络
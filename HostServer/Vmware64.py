@@ -1,6 +1,7 @@
 import os
 import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
 from HostServer.Template import BaseServer
 from MainObject.Config.HSConfig import HSConfig
@@ -11,19 +12,35 @@ from MainObject.Config.NCConfig import NCConfig
 from MainObject.Public.ZMessage import ZMessage
 from MainObject.Config.VMConfig import VMConfig
 from HostServer.VMRestHost.VRestAPI import VRestAPI
-from NetsManage import NetsManage
 
 
 class HostServer(BaseServer):
+    # 电源状态映射（VMRest API返回值 -> VMPowers枚举）
+    POWER_MAP = {
+        "poweredOn": VMPowers.STARTED,
+        "poweredOff": VMPowers.STOPPED,
+        "suspended": VMPowers.SUSPEND,
+        "paused": VMPowers.SUSPEND,
+    }
+
     # 宿主机服务 ###########################################################
     def __init__(self, config: HSConfig, **kwargs):
         super().__init__(config)
         super().__load__(**kwargs)
         self.vmrest_pid = None
+        # 定时任务同时查询电源状态的最大请求数（hs_config.extend_data["poll_workers"]）
+        extend = self.hs_config.extend_data or {}
+        try:
+            self.poll_workers = max(1, int(extend.get("poll_workers", 8)))
+        except (TypeError, ValueError, OverflowError):
+            # 无效的配置不影响主机创建，使用默认值
+            print(f"[Vmware64] {self.hs_name}: poll_workers无效，使用默认值8: {extend['poll_workers']!r}")
+            self.poll_workers = 8
         self.vmrest_api = VRestAPI(
             self.hs_config.server_addr,
             self.hs_config.server_user,
             self.hs_config.server_pass,
+            pool_size=self.poll_workers,
         )
 
     # 宿主机状态 ###########################################################
@@ -37,47 +54,69 @@ class HostServer(BaseServer):
     def Crontabs(self) -> bool:
         # 宿主机状态 ===============================
         hs_status = HSStatus()
-        self.hs_status.append(hs_status.status())
-        # 虚拟机状态 ===============================
-        self.vm_status: dict[str, list[HWStatus]] = {}
-        # 电源状态映射（VMRest API返回值 -> VMPowers枚举）
-        power_map = {
-            "poweredOn": VMPowers.STARTED,
-            "poweredOff": VMPowers.STOPPED,
-            "suspended": VMPowers.SUSPEND,
-            "paused": VMPowers.SUSPEND,
-        }
+        self.add_status(hs_status.status())
+        # 虚拟机列表 ===============================
         all_vms = self.vmrest_api.return_vmx()
         if not all_vms.success:
+            # 无法获取列表时保留上一次的状态，全部标记为过期
+            self.set_stale(list(self.vm_status))
             return False
+        vm_names = []
         for now_vmx in all_vms.results:
-            vm_path = now_vmx.get("path", "")
             # 从路径中提取虚拟机名称 =================================
-            vm_name = os.path.splitext(os.path.basename(vm_path))[0]
+            vm_name = self.vmrest_api.vmx_name(now_vmx.get("path", ""))
             # 过滤虚拟机名称 =========================================
             if self.hs_config.filter_name != "":
                 if not vm_name.startswith(self.hs_config.filter_name):
                     continue
-            # 获取电源状态 ===========================================
-            self.vm_status[vm_name] = []
-            power_result = self.vmrest_api.powers_get(vm_name)
-            ac_status = VMPowers.UNKNOWN
-            if power_result.success:
-                power_state = power_result.results.get("power_state", "")
-                ac_status = power_map.get(power_state, VMPowers.UNKNOWN)
-            self.vm_status[vm_name].append(HWStatus(ac_status=ac_status))
+            vm_names.append(vm_name)
+        # 并发获取电源状态 =========================
+        powers = self.poll_powers(vm_names)
+        # 超时被取消时放弃本次结果，保留上一次的状态
+        vm_stale = self.apply_poll(vm_names, {
+            vm_name: None if power is None else HWStatus(ac_status=power)
+            for vm_name, power in powers.items()})
+        if vm_stale is None:
+            return False
+        if vm_stale:
+            print(f"[Cron] {self.hs_name}: {len(vm_stale)}/{len(vm_names)}台虚拟机电源状态查询失败，保留上一次的状态")
         return True
 
+    # 并发查询电源状态 #####################################################
+    def poll_powers(self, vm_names: list[str]) -> dict[str, VMPowers | None]:
+        """
+        同时最多poll_workers个请求，避免vmrest过载
+        :return: {虚拟机名称: 电源状态}，查询失败或已取消的为None
+        """
+        def poll(vm_name: str) -> VMPowers | None:
+            if self.cancelled.is_set():
+                return None
+            try:
+                power_result = self.vmrest_api.powers_get(vm_name)
+                if not power_result.success:
+                    return None
+                power_state = power_result.results.get("power_state", "")
+                return self.POWER_MAP.get(power_state, VMPowers.UNKNOWN)
+            except Exception as e:
+                print(f"[Cron] {self.hs_name}: 查询{vm_name}电源状态出错: {e}")
+                return None
+
+        if not vm_names:
+            return {}
+        workers = min(self.poll_workers, len(vm_names))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"Poll-{self.hs_name}") as pool:
+            return dict(zip(vm_names, pool.map(poll, vm_names)))
+
     # 初始宿主机 ###########################################################
     def HSCreate(self) -> ZMessage:
         hs_result = ZMessage(success=True, action="HSCreate")
-        self.hs_logger.append(hs_result)
+        self.add_log(hs_result)
         return hs_result
 
     # 还原宿主机 ###########################################################
     def HSDelete(self) -> ZMessage:
         hs_result = ZMessage(success=True, action="HSDelete")
-        self.hs_logger.append(hs_result)
+        self.add_log(hs_result)
         return hs_result
 
     # 读取宿主机 ###########################################################
@@ -100,7 +139,7 @@ class HostServer(BaseServer):
             startupinfo=startupinfo,
             creationflags=subprocess.CREATE_NO_WINDOW)
         hs_result = ZMessage(success=True, action="HSLoader", message="OK")
-        self.hs_logger.append(hs_result)
+        self.add_log(hs_result)
         return hs_result
 
     # 卸载宿主机 ###########################################################
@@ -116,33 +155,35 @@ class HostServer(BaseServer):
             self.vmrest_pid.kill()  # 强制终止
         finally:
             self.vmrest_pid = None
+            self.vmrest_api.close()  # 关闭到vmrest的长连接
         hs_result = ZMessage(
             success=True,
             action="HSUnload",
             message="VM Rest Server stopped",
         )
-        self.hs_logger.append(hs_result)
+        self.add_log(hs_result)
         return hs_result
 
     # 宿主机操作 ###########################################################
     def HSAction(self, action: str = "") -> ZMessage:
         hs_result = ZMessage(success=True, action="HSAction")
-        self.hs_logger.append(hs_result)
+        self.add_log(hs_result)
         return hs_result
 
 
 
     # 虚拟机列出 ###########################################################
     def VMStatus(self, select: str = "") -> dict[str, list[HWStatus]]:
-        if len(select) > 0:
-            if select not in self.vm_status:
-                return {select: [HWStatus()]}
-            return {select: self.vm_status[select]}
-        return self.vm_status
+        # 返回副本，调用方在锁外遍历时不受定时任务修改的影响
+        with self.locker.read():
+            if len(select) > 0:
+                if select not in self.vm_status:
+                    return {select: [HWStatus()]}
+                return {select: list(self.vm_status[select])}
+            return {vm_uuid: list(status) for vm_uuid, status in self.vm_status.items()}
 
     # 创建虚拟机 ###########################################################
     def VMCreate(self, config: VMConfig) -> ZMessage:
-        self.vm_saving[config.vm_uuid] = config
         # 路径处理 =========================================================
         vm_saving = os.path.join(self.hs_config.system_path, config.vm_uuid)
         os.mkdir(vm_saving) if not os.path.exists(vm_saving) else None
@@ -157,9 +198,12 @@ class HostServer(BaseServer):
         shutil.copy(im, vm_file_name + ".vmdk")
         # 注册机器 =========================================================
         self.vmrest_api.loader_vmx(vm_file_name + ".vmx")
+        # 保存配置 =========================================================
+        self.set_vm(config)
+        self.add_vm_status(config.vm_uuid, HWStatus(ac_status=VMPowers.STOPPED), keep=1)
         # 返回结果 =========================================================
         hs_result = ZMessage(success=True, action="VMCreate", message="OK")
-        self.hs_logger.append(hs_result)
+        self.add_log(hs_result)
         return hs_result
 
     # 安装虚拟机 ###########################################################
@@ -174,16 +218,13 @@ class HostServer(BaseServer):
             return ZMessage(
                 success=False, action="VMUpdate",
                 message=f"虚拟机 {vm_uuid} 不存在")
-        # 更新vm_saving中的配置
-        self.vm_saving[vm_uuid] = config
+        # 更新vm_saving中的配置（数据库只写入这台虚拟机）
+        self.set_vm(config)
         # 记录日志
         hs_result = ZMessage(
             success=True, action="VMUpdate",
             message=f"虚拟机 {vm_uuid} 配置已更新")
-        self.hs_logger.append(hs_result)
-        # 保存到数据库
-        if self.db and self.hs_name:
-            self.db.save_vm_saving(self.hs_name, self.vm_saving)
+        self.add_log(hs_result)
         return hs_result
 
     # 删除虚拟机 ###########################################################
@@ -191,13 +232,25 @@ class HostServer(BaseServer):
         hs_result = self.vmrest_api.delete_vmx(select)
         if hs_result.success:
             shutil.rmtree(os.path.join(self.hs_config.system_path, select))
-        self.hs_logger.append(hs_result)
+            self.del_vm(select)
+        self.add_log(hs_result)
         return hs_result
 
     # 虚拟机电源 ###########################################################
     def VMPowers(self, select: str, power: VMPowers) -> ZMessage:
         hs_result = self.vmrest_api.powers_set(select, power)
-        self.hs_logger.append(hs_result)
+        # 电源命令执行后的状态，下次定时任务时以实际状态为准
+        power_map = {
+            VMPowers.S_START: VMPowers.STARTED,
+            VMPowers.S_RESET: VMPowers.STARTED,
+            VMPowers.A_WAKED: VMPowers.STARTED,
+            VMPowers.S_CLOSE: VMPowers.STOPPED,
+            VMPowers.H_CLOSE: VMPowers.STOPPED,
+            VMPowers.A_PAUSE: VMPowers.SUSPEND,
+        }
+        if hs_result.success and power in power_map:
+            self.set_vm_power(select, power_map[power])
+        self.add_log(hs_result)
         return hs_result
 
     # 虚拟机电源 ###########################################################
@@ -1,8 +1,21 @@
 import json
+import struct
 from MainObject.Config.VMPowers import VMPowers as VPower
 
 
 class HWStatus:
+    # 紧凑二进制格式 ==========================
+    # 单条记录: 版本号(B) 电源状态(B) CPU型号长度(H) 数值字段(17q) 附加表长度(H)
+    #          之后依次为CPU型号(UTF-8)和附加表(ext_usage/gpu_usage的紧凑JSON)
+    # 记录列表: 列表版本号(B) 记录数(H)，之后每条记录为 长度(H)+记录
+    PACK_VERSION = 0x01
+    LIST_VERSION = 0x81
+    PACK_FIELDS = (
+        "cpu_total", "cpu_usage", "mem_total", "mem_usage", "hdd_total", "hdd_usage",
+        "flu_total", "flu_usage", "nat_total", "nat_usage", "web_total", "web_usage",
+        "gpu_total", "network_u", "network_d", "cpu_heats", "cpu_power")
+    PACK_HEADER = struct.Struct("<BBH%dqH" % len(PACK_FIELDS))
+
     def __init__(self, config=None, /, **kwargs):
         # 基础数据 ============================
         self.ac_status: VPower = VPower.UNKNOWN
@@ -75,3 +88,63 @@ class HWStatus:
     # 转换为文本 ==============================
     def __str__(self):
         return json.dumps(self.__dict__())
+
+    # 转换为紧凑二进制 ========================
+    def __bytes__(self):
+        ac_status = self.ac_status
+        if isinstance(ac_status, str):
+            ac_status = VPower[ac_status] if ac_status in VPower.__members__ else VPower.UNKNOWN
+        model = (self.cpu_model or "").encode("utf-8")
+        extra = {}
+        if self.ext_usage:
+            extra["e"] = self.ext_usage
+        if self.gpu_usage:
+            extra["g"] = self.gpu_usage
+        extra = json.dumps(extra, separators=(",", ":")).encode("utf-8") if extra else b""
+        return self.PACK_HEADER.pack(
+            self.PACK_VERSION, ac_status.value, len(model),
+            *[int(getattr(self, name) or 0) for name in self.PACK_FIELDS],
+            len(extra)) + model + extra
+
+    # 从紧凑二进制还原 ========================
+    @staticmethod
+    def from_bytes(data: bytes) -> "HWStatus":
+        if not data or data[0] != HWStatus.PACK_VERSION:
+            raise ValueError(f"Unsupported HWStatus format: {data[:1].hex()}")
+        header = HWStatus.PACK_HEADER.unpack_from(data)
+        status = HWStatus()
+        status.ac_status = VPower(header[1])
+        for name, value in zip(HWStatus.PACK_FIELDS, header[3:-1]):
+            setattr(status, name, value)
+        offset = HWStatus.PACK_HEADER.size
+        status.cpu_model = data[offset:offset + header[2]].decode("utf-8")
+        offset += header[2]
+        if header[-1]:
+            extra = json.loads(data[offset:offset + header[-1]])
+            status.ext_usage = extra.get("e", {})
+            status.gpu_usage = extra.get("g", {})
+        return status
+
+    # 记录列表转换为紧凑二进制 ================
+    @staticmethod
+    def pack_list(items: list) -> bytes:
+        chunks = [struct.pack("<BH", HWStatus.LIST_VERSION, len(items))]
+        for item in items:
+            record = bytes(item if isinstance(item, HWStatus) else HWStatus(**item))
+            chunks.append(struct.pack("<H", len(record)))
+            chunks.append(record)
+        return b"".join(chunks)
+
+    # 从紧凑二进制还原记录列表 ================
+    @staticmethod
+    def unpack_list(data: bytes) -> list:
+        if not data or data[0] != HWStatus.LIST_VERSION:
+            raise ValueError(f"Unsupported HWStatus list format: {data[:1].hex()}")
+        count = struct.unpack_from("<H", data, 1)[0]
+        offset, items = 3, []
+        for _ in range(count):
+            length = struct.unpack_from("<H", data, offset)[0]
+            offset += 2
+            items.append(HWStatus.from_bytes(data[offset:offset + length]))
+            offset += length
+        return items
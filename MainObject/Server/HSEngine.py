@@ -1,8 +1,11 @@
-from HostServer import Vmware64
+import time
+import importlib
+import threading
 
+# 引擎类以导入路径登记（模块:类名），第一次使用时由HEImport导入
 HEConfig = {
     "VMWareSetup": {
-        "Imported": Vmware64.HostServer,
+        "Imported": "HostServer.Vmware64:HostServer",
         "Descript": "VMWare Workstation",
         "isEnable": True,
         "isRemote": False,
@@ -75,5 +78,52 @@ HEConfig = {
         "isEnable": False,
         "Platform": ["MacOS"],
         "CPU_Arch": ["x86_64", "aarch64"],
+    },
+    "MockupSetup": {
+        "Imported": "HostServer.MockServer:HostServer",
+        "Descript": "In-Process Simulated Host",
+        "isEnable": True,
+        "isRemote": False,
+        "Platform": ["Linux", "Windows", "MacOS"],
+        "CPU_Arch": ["x86_64", "aarch64"],
+        "Optional": {
+            "vm_count": "模拟平台上初始的虚拟机数量(默认100)",
+            "vm_prefix": "模拟虚拟机的名称前缀(默认mock_)",
+            "latency": "各操作的延迟秒数，如{\"sample\": 0.05, \"power\": [0.01, 0.1]}，"
+                       "操作: list/sample/power/create/update/delete/loader/network",
+            "transition": "电源操作从过渡状态到最终状态的秒数(默认2)",
+            "error_rate": "单台虚拟机状态采样失败的比例(默认0)",
+            "seed": "随机种子",
+        },
+        "SystemOS": {
+            "Mock Linux": "mock-linux",
+        },
+        "Messages": "进程内模拟的主机，不创建真实虚拟机，用于压力测试和离线开发"
     }
 }
+
+# 已导入的引擎类及导入耗时（秒）
+HEClasses = {}
+HETiming = {}
+HELocker = threading.Lock()
+
+
+def HEImport(hs_type: str):
+    """
+    导入主机引擎类（只在第一次使用时导入模块）
+    :param hs_type: 引擎类型，如VMWareSetup
+    :return: 引擎类，类型不存在或未登记导入路径时返回None
+    """
+    engine = HEClasses.get(hs_type)
+    if engine is not None:
+        return engine
+    imported = HEConfig.get(hs_type, {}).get("Imported")
+    if not imported:
+        return None
+    with HELocker:
+        if hs_type not in HEClasses:
+            started = time.perf_counter()
+            module, name = imported.split(":")
+            HEClasses[hs_type] = getattr(importlib.import_module(module), name)
+            HETiming[hs_type] = time.perf_counter() - started
+        return HEClasses[hs_type]
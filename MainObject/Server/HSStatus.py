@@ -1,17 +1,38 @@
 import json
-
-import psutil
-import GPUtil
-import cpuinfo
 import platform
+import importlib
+import threading
 from MainObject.Public.HWStatus import HWStatus
 from MainObject.Config.VMPowers import VMPowers
 
+# 采集库导入较慢（GPUtil会间接导入setuptools），在第一次采集时才导入
+# psutil最后赋值，其他线程看到psutil不为空时三个库都已导入
+psutil = None
+GPUtil = None
+cpuinfo = None
+HSLocker = threading.Lock()
+
 
 class HSStatus:
+    # CPU型号（cpuinfo需要启动子进程检测，耗时约1秒，只检测一次）
+    cpu_model: str | None = None
+
     def __init__(self):
         self.hw_status = HWStatus()
 
+    # 导入采集库 ============================================================
+    @staticmethod
+    def collectors():
+        global psutil, GPUtil, cpuinfo
+        if psutil is not None:
+            return
+        with HSLocker:
+            if psutil is None:
+                loaded = importlib.import_module("psutil")
+                GPUtil = importlib.import_module("GPUtil")
+                cpuinfo = importlib.import_module("cpuinfo")
+                psutil = loaded
+
     # 转换为字典 ============================================================
     def __dict__(self):
         return self.hw_status.__dict__()
@@ -22,14 +43,15 @@ class HSStatus:
 
     # 获取状态 ==============================================================
     def status(self) -> HWStatus:
+        self.collectors()
         self.hw_status.ac_status = VMPowers.STARTED
         # 获取CPU信息 =======================================================
-        while True:
+        while HSStatus.cpu_model is None:
             try:
-                self.hw_status.cpu_model = cpuinfo.get_cpu_info()['brand_raw']
-                break
+                HSStatus.cpu_model = cpuinfo.get_cpu_info()['brand_raw']
             except json.JSONDecodeError as e:
                 continue
+        self.hw_status.cpu_model = HSStatus.cpu_model
         self.hw_status.cpu_total = psutil.cpu_count(logical=True)
         self.hw_status.cpu_usage = int(psutil.cpu_percent(interval=1))
         # 获取内存信息 ======================================================
@@ -62,8 +84,12 @@ class HSStatus:
             self.hw_status.cpu_temp = 0
             self.hw_status.cpu_power = 0
         else:
-            self.hw_status.cpu_temp = int(psutil.sensors_temperatures()['coretemp'][0].current)
-            self.hw_status.cpu_power = int(psutil.sensors_battery().percent)
+            # 没有coretemp传感器（AMD为k10temp，虚拟机/容器中通常没有）或电池时记为0
+            sensors = psutil.sensors_temperatures() if hasattr(psutil, "sensors_temperatures") else {}
+            sensor = sensors.get('coretemp') or sensors.get('k10temp') or next(iter(sensors.values()), None)
+            battery = psutil.sensors_battery() if hasattr(psutil, "sensors_battery") else None
+            self.hw_status.cpu_temp = int(sensor[0].current) if sensor else 0
+            self.hw_status.cpu_power = int(battery.percent) if battery else 0
         return self.hw_status
 
 
@@ -0,0 +1,95 @@
+"""
+Vmware64定时任务基准测试
+在本地VMRest模拟器上对10、100、1000台虚拟机执行Vmware64.HostServer.Crontabs，对比：
+  - 逐台查询（poll_workers=1）与并发查询（默认poll_workers）的总耗时和电源状态查询耗时
+  - 每轮对vmrest的请求数（按接口统计）和模拟器观察到的最大并发请求数
+  - 注入错误时查询失败的虚拟机数量（保留上一次状态并标记为过期）
+总耗时包含宿主机状态采样（HSStatus），单独列出电源状态查询耗时
+用法: python -m TestServer.BenchCrontabs [虚拟机数量,...] [--latency=秒] [--list-latency=秒] [--error-rate=比例]
+      [--workers=并发数]
+"""
+import sys
+import time
+
+from HostServer.Vmware64 import HostServer
+from MainObject.Config.HSConfig import HSConfig
+from TestServer.VMRestSim import VMRestSim
+
+
+# 测试主机 #######################################################################
+class BenchServer(HostServer):
+    """记录最近一次电源状态查询的耗时"""
+
+    def __init__(self, config: HSConfig, **kwargs):
+        super().__init__(config, **kwargs)
+        self.poll_seconds = 0.0
+
+    def poll_powers(self, vm_names: list[str]):
+        start = time.perf_counter()
+        try:
+            return super().poll_powers(vm_names)
+        finally:
+            self.poll_seconds = time.perf_counter() - start
+
+
+# 执行测试 #######################################################################
+def run_cron(sim: VMRestSim, poll_workers: int, rounds: int = 2) -> dict:
+    """第一轮建立名称索引和连接，只统计后续轮次"""
+    config = HSConfig(server_type="VMWareSetup", server_addr=sim.addr, server_user="",
+                      server_pass="", filter_name="", extend_data={"poll_workers": poll_workers})
+    server = BenchServer(config, hs_name=f"bench_{poll_workers}")
+    try:
+        server.Crontabs()
+        sim.reset()
+        total = poll = 0.0
+        for _ in range(rounds):
+            start = time.perf_counter()
+            assert server.Crontabs(), "Crontabs failed"
+            total += time.perf_counter() - start
+            poll += server.poll_seconds
+        stats = sim.stats()
+        return {
+            "total": total / rounds,
+            "poll": poll / rounds,
+            "http": stats["requests"] / rounds,
+            "endpoints": {key: counter["requests"] // rounds for key, counter in stats["endpoints"].items()},
+            "max_running": stats["max_running"],
+            "vm_count": len(server.vm_status),
+            "stale": len(server.vm_stale),
+        }
+    finally:
+        server.vmrest_api.close()
+
+
+if __name__ == "__main__":
+    argv = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--") and "=" in arg)
+    sizes = [int(size) for size in argv[0].split(",")] if argv else [10, 100, 1000]
+    latency = {
+        "GET /vms": float(options.get("list-latency", 0.02)),
+        "GET /vms/{id}/power": float(options.get("latency", 0.005)),
+    }
+    error_rate = float(options.get("error-rate", 0.05))
+    default_workers = int(options.get("workers", 8))  # 与Vmware64默认的poll_workers一致
+    print(f"接口延迟: {latency}")
+    print(f"{'虚拟机':>8}{'并发':>6}{'总耗时s':>10}{'查询s':>10}{'HTTP/轮':>10}{'最大并发':>10}{'过期':>6}")
+    for size in sizes:
+        sim = VMRestSim(size, latency=latency).start()
+        try:
+            for workers in (1, default_workers):
+                result = run_cron(sim, workers)
+                print(f"{size:>8}{workers:>6}{result['total']:>10.3f}{result['poll']:>10.3f}"
+                      f"{result['http']:>10.0f}{result['max_running']:>10}{result['stale']:>6}")
+            print(f"{'':>8}  {result['endpoints']}")
+        finally:
+            sim.stop()
+
+    # 注入错误：查询失败的虚拟机保留上一次状态 =======================
+    size = sizes[-1]
+    sim = VMRestSim(size, latency=latency, errors={"GET /vms/{id}/power": error_rate}).start()
+    try:
+        result = run_cron(sim, default_workers, rounds=1)
+        print(f"电源状态接口注入{error_rate:.0%}错误（{size}台）: 过期 {result['stale']}/{result['vm_count']}, "
+              f"注入错误 {sim.stats()['errors']}, 耗时 {result['total']:.3f} s")
+    finally:
+        sim.stop()
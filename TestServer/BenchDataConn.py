@@ -0,0 +1,70 @@
+"""
+HostDatabase连接层基准测试
+对比"每次调用新建连接"（旧实现）与"线程长连接+WAL"两种模式下，
+save_host_full_data 每次调用打开的连接数与耗时
+用法: python -m TestServer.BenchDataConn [虚拟机数量] [保存次数]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from HostModule.DataManage import HostDatabase
+from MainObject.Config.HSConfig import HSConfig
+from MainObject.Config.VMConfig import VMConfig
+from MainObject.Public.HWStatus import HWStatus
+from MainObject.Public.ZMessage import ZMessage
+
+
+# 构造测试数据 ###################################################################
+def build_host(vm_count: int) -> dict:
+    return {
+        "hs_config": HSConfig(server_type="VMWareSetup", server_addr="localhost:8697",
+                              server_user="root", server_pass="root").__dict__(),
+        "hs_status": [HWStatus(cpu_usage=i % 100) for i in range(10)],
+        "vm_saving": {
+            f"ecs_{i:04d}": VMConfig(vm_uuid=f"ecs_{i:04d}", cpu_num=4, mem_num=4096)
+            for i in range(vm_count)
+        },
+        "vm_status": {f"ecs_{i:04d}": [HWStatus()] for i in range(vm_count)},
+        "vm_tasker": [],
+        "save_logs": [ZMessage(actions="bench", message=f"log {i}") for i in range(20)],
+    }
+
+
+# 执行测试 #######################################################################
+def run_bench(work_dir: str, persist: bool, host_data: dict, rounds: int) -> dict:
+    db_path = os.path.join(work_dir, "persist" if persist else "legacy", "hostmanage.db")
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    sql_path = os.path.join(os.path.dirname(__file__), "..", "HostConfig", "HostManage.sql")
+    shutil.copy(sql_path, os.path.dirname(db_path))
+    db = HostDatabase(db_path, persist=persist)
+    db.save_host_full_data("bench", host_data)  # 预热
+    opened = db.connect.opened
+    start = time.perf_counter()
+    for _ in range(rounds):
+        db.save_host_full_data("bench", host_data)
+    spent = time.perf_counter() - start
+    result = {
+        "conn_per_save": (db.connect.opened - opened) / rounds,
+        "ms_per_save": spent * 1000 / rounds,
+    }
+    db.close()
+    return result
+
+
+if __name__ == "__main__":
+    vm_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    host_data = build_host(vm_count)
+    work_dir = tempfile.mkdtemp(prefix="bench_db_")
+    try:
+        legacy = run_bench(work_dir, False, host_data, rounds)
+        persist = run_bench(work_dir, True, host_data, rounds)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print(f"虚拟机数量: {vm_count}, 保存次数: {rounds}")
+    print(f"{'模式':<12}{'连接数/次':>12}{'耗时ms/次':>12}")
+    print(f"{'legacy':<12}{legacy['conn_per_save']:>12.1f}{legacy['ms_per_save']:>12.2f}")
+    print(f"{'persist+WAL':<12}{persist['conn_per_save']:>12.1f}{persist['ms_per_save']:>12.2f}")
@@ -0,0 +1,309 @@
+"""
+模拟主机集群场景测试
+使用MockupSetup引擎（HostServer/MockServer.py）在临时目录中创建多台模拟主机，每台主机可有数千台虚拟机，
+按场景脚本通过Flask接口和HostManage执行操作，覆盖主机管理、定时任务、HostDatabase和Web接口，
+输出每个阶段每种操作的次数、错误数、吞吐量和延迟分位数（p50/p90/p99/max）
+场景脚本为JSON文件，未指定时使用DEFAULT_SCENARIO：
+  {"hosts": 4, "vms": 1000, "extend": {"latency": {"sample": 0.02}},
+   "phases": [{"name": "read", "seconds": 5, "threads": 8, "mix": {"get_vms": 4, "get_hosts": 1}},
+              {"name": "cron", "count": 3, "mix": {"exe_cron": 1}},
+              {"name": "mixed", "seconds": 5, "threads": 8, "mix": {...}, "background": "exe_cron"}]}
+  每个阶段按seconds运行一段时间或按count执行指定次数，mix为操作权重，background为阶段内在单独线程中
+  反复执行的操作；可用的操作见OPERATIONS
+用法: python -m TestServer.BenchFleet [场景文件.json] [--hosts=主机数] [--vms=虚拟机数] [--seconds=秒数]
+      [--threads=线程数]
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import threading
+import contextlib
+
+from TestServer.StressHostLock import load_app
+
+DEFAULT_SCENARIO = {
+    "hosts": 4,
+    "vms": 1000,
+    # MockupSetup的extend_data（vm_count由vms指定）
+    "extend": {
+        "latency": {"list": 0.005, "sample": 0.02, "power": [0.005, 0.02],
+                    "create": 0.05, "update": 0.01, "delete": 0.02},
+        "transition": 1.0,
+        "error_rate": 0.001,
+    },
+    "phases": [
+        {"name": "read", "seconds": 5, "threads": 8,
+         "mix": {"get_vms": 4, "get_hosts": 2, "get_host": 1, "get_vm": 2, "vm_status": 1, "system_stats": 1}},
+        {"name": "cron", "count": 3, "threads": 1, "mix": {"exe_cron": 1}},
+        {"name": "mixed", "seconds": 5, "threads": 8, "background": "exe_cron",
+         "mix": {"get_vms": 4, "get_vm": 2, "system_stats": 1, "power": 2, "add_nat": 1,
+                 "update_vm": 1, "create_vm": 1, "delete_vm": 1, "logs": 1}},
+        {"name": "save", "count": 3, "threads": 1, "mix": {"save": 1}},
+    ],
+}
+
+
+# 场景执行 #######################################################################
+class Fleet:
+    def __init__(self, module, scenario: dict):
+        self.module = module
+        self.hs_manage = module.hs_manage
+        self.scenario = scenario
+        self.hosts = [f"mock{i}" for i in range(scenario["hosts"])]
+        self.headers = {"Authorization": f"Bearer {self.hs_manage.bearer}"}
+        self.latency: dict[str, list] = {}
+        self.errors: dict[str, list] = {}
+        self.created: list[tuple] = []  # create_vm创建的虚拟机，delete_vm从中删除
+        self.sequence = 0
+        self.lock = threading.Lock()
+
+    def record(self, name: str, spent: float, error: str = ""):
+        with self.lock:
+            self.latency.setdefault(name, []).append(spent)
+            if error:
+                self.errors.setdefault(name, []).append(error)
+
+    def request(self, client, name: str, method: str, url: str, **kwargs) -> dict:
+        started = time.perf_counter()
+        try:
+            response = client.open(url, method=method, headers=self.headers, **kwargs)
+            error = "" if response.status_code == 200 else f"HTTP {response.status_code} {url}"
+            body = response.get_json(silent=True) or {}
+        except Exception as e:
+            error, body = repr(e), {}
+        self.record(name, time.perf_counter() - started, error)
+        return body
+
+    def call(self, name: str, function, *args):
+        started = time.perf_counter()
+        try:
+            function(*args)
+            error = ""
+        except Exception as e:
+            error = repr(e)
+        self.record(name, time.perf_counter() - started, error)
+
+    # 随机选择 =================================================
+    def pick_vm(self, rand: random.Random) -> tuple:
+        return rand.choice(self.hosts), f"mock_{rand.randrange(self.scenario['vms']):04d}"
+
+    # 准备主机 =================================================
+    def setup(self, client):
+        extend = dict(self.scenario.get("extend", {}), vm_count=self.scenario["vms"])
+        for hs_name in self.hosts:
+            self.request(client, "add_host", "POST", "/api/hosts",
+                         json={"name": hs_name, "type": "MockupSetup", "config": {"extend_data": extend}})
+            self.request(client, "scan_vms", "POST", f"/api/hosts/{hs_name}/vms/scan", json={})
+        self.call("exe_cron", self.hs_manage.exe_cron)
+
+    # 执行阶段 =================================================
+    def run_phase(self, phase: dict) -> float:
+        names = list(phase["mix"])
+        weights = [phase["mix"][name] for name in names]
+        deadline = time.perf_counter() + phase["seconds"] if phase.get("seconds") else None
+        remaining = [phase.get("count", 0)]
+        finished = threading.Event()
+
+        def take() -> bool:
+            if deadline is not None:
+                return time.perf_counter() < deadline
+            with self.lock:
+                remaining[0] -= 1
+                return remaining[0] >= 0
+
+        def worker(seed: int):
+            rand = random.Random(seed)
+            client = self.module.app.test_client()
+            while take():
+                name = rand.choices(names, weights)[0]
+                OPERATIONS[name](self, client, rand)
+
+        def background():
+            client = self.module.app.test_client()
+            rand = random.Random(-1)
+            while not finished.is_set():
+                OPERATIONS[phase["background"]](self, client, rand)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(phase.get("threads", 1))]
+        extra = threading.Thread(target=background) if phase.get("background") else None
+        started = time.perf_counter()
+        for thread in threads + ([extra] if extra else []):
+            thread.start()
+        for thread in threads:
+            thread.join()
+        finished.set()
+        if extra:
+            extra.join()
+        return time.perf_counter() - started
+
+    # 读取结果 =================================================
+    def collect(self) -> tuple:
+        with self.lock:
+            latency, errors = self.latency, self.errors
+            self.latency, self.errors = {}, {}
+        return latency, errors
+
+
+# 操作 ###########################################################################
+def op_get_hosts(fleet: Fleet, client, rand):
+    fleet.request(client, "get_hosts", "GET", "/api/hosts")
+
+
+def op_get_host(fleet: Fleet, client, rand):
+    fleet.request(client, "get_host", "GET", f"/api/hosts/{rand.choice(fleet.hosts)}?status=true")
+
+
+def op_get_vms(fleet: Fleet, client, rand):
+    fleet.request(client, "get_vms", "GET", f"/api/hosts/{rand.choice(fleet.hosts)}/vms")
+
+
+def op_get_vm(fleet: Fleet, client, rand):
+    hs_name, vm_uuid = fleet.pick_vm(rand)
+    fleet.request(client, "get_vm", "GET", f"/api/hosts/{hs_name}/vms/{vm_uuid}")
+
+
+def op_vm_status(fleet: Fleet, client, rand):
+    hs_name, vm_uuid = fleet.pick_vm(rand)
+    fleet.request(client, "vm_status", "GET", f"/api/hosts/{hs_name}/vms/{vm_uuid}/status")
+
+
+def op_system_stats(fleet: Fleet, client, rand):
+    fleet.request(client, "system_stats", "GET", "/api/system/stats")
+
+
+def op_power(fleet: Fleet, client, rand):
+    hs_name, vm_uuid = fleet.pick_vm(rand)
+    fleet.request(client, "power", "POST", f"/api/hosts/{hs_name}/vms/{vm_uuid}/power",
+                  json={"action": rand.choice(["start", "stop", "hard_stop", "reset", "pause", "resume"])})
+
+
+def op_add_nat(fleet: Fleet, client, rand):
+    hs_name, vm_uuid = fleet.pick_vm(rand)
+    fleet.request(client, "add_nat", "POST", f"/api/hosts/{hs_name}/vms/{vm_uuid}/nat",
+                  json={"protocol": "tcp", "external_port": rand.randrange(10000, 60000),
+                        "internal_port": 22, "internal_ip": "10.0.0.2"})
+
+
+def op_update_vm(fleet: Fleet, client, rand):
+    hs_name, vm_uuid = fleet.pick_vm(rand)
+    fleet.request(client, "update_vm", "PUT", f"/api/hosts/{hs_name}/vms/{vm_uuid}",
+                  json={"cpu_num": rand.choice([2, 4, 8]), "mem_num": rand.choice([2048, 4096])})
+
+
+def op_create_vm(fleet: Fleet, client, rand):
+    hs_name = rand.choice(fleet.hosts)
+    with fleet.lock:
+        fleet.sequence += 1
+        vm_uuid = f"bench_{fleet.sequence:06d}"
+    body = fleet.request(client, "create_vm", "POST", f"/api/hosts/{hs_name}/vms",
+                         json={"vm_uuid": vm_uuid, "os_name": "mock-linux", "cpu_num": 2, "mem_num": 2048})
+    if body.get("code") == 200:
+        with fleet.lock:
+            fleet.created.append((hs_name, vm_uuid))
+
+
+def op_delete_vm(fleet: Fleet, client, rand):
+    with fleet.lock:
+        if not fleet.created:
+            return
+        hs_name, vm_uuid = fleet.created.pop(rand.randrange(len(fleet.created)))
+    fleet.request(client, "delete_vm", "DELETE", f"/api/hosts/{hs_name}/vms/{vm_uuid}")
+
+
+def op_logs(fleet: Fleet, client, rand):
+    fleet.request(client, "logs", "GET", f"/api/logs?hs_name={rand.choice(fleet.hosts)}&limit=50")
+
+
+def op_exe_cron(fleet: Fleet, client, rand):
+    fleet.call("exe_cron", fleet.hs_manage.exe_cron)
+
+
+def op_save(fleet: Fleet, client, rand):
+    fleet.request(client, "save", "POST", "/api/system/save")
+
+
+OPERATIONS = {
+    "get_hosts": op_get_hosts,
+    "get_host": op_get_host,
+    "get_vms": op_get_vms,
+    "get_vm": op_get_vm,
+    "vm_status": op_vm_status,
+    "system_stats": op_system_stats,
+    "power": op_power,
+    "add_nat": op_add_nat,
+    "update_vm": op_update_vm,
+    "create_vm": op_create_vm,
+    "delete_vm": op_delete_vm,
+    "logs": op_logs,
+    "exe_cron": op_exe_cron,
+    "save": op_save,
+}
+
+
+# 输出结果 #######################################################################
+def percentile(values: list, rate: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * rate))] * 1000
+
+
+def report(title: str, spent: float, latency: dict, errors: dict):
+    print(f"[{title}] {spent:.2f} s")
+    print(f"  {'操作':<14}{'次数':>8}{'错误':>6}{'次/秒':>10}{'p50 ms':>10}{'p90 ms':>10}"
+          f"{'p99 ms':>10}{'max ms':>10}")
+    for name, values in sorted(latency.items()):
+        print(f"  {name:<14}{len(values):>8}{len(errors.get(name, [])):>6}{len(values) / spent:>10.1f}"
+              f"{percentile(values, 0.5):>10.2f}{percentile(values, 0.9):>10.2f}"
+              f"{percentile(values, 0.99):>10.2f}{max(values) * 1000:>10.2f}")
+    for name, messages in sorted(errors.items()):
+        print(f"  {name}: {messages[0]}" + (f" 等{len(messages)}次" if len(messages) > 1 else ""))
+
+
+if __name__ == "__main__":
+    argv = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--") and "=" in arg)
+    scenario = json.loads(json.dumps(DEFAULT_SCENARIO))
+    if argv:
+        with open(argv[0], encoding="utf-8") as scenario_file:
+            scenario.update(json.load(scenario_file))
+    for key in ("hosts", "vms"):
+        if key in options:
+            scenario[key] = int(options[key])
+    for phase in scenario["phases"]:
+        if "seconds" in options and phase.get("seconds"):
+            phase["seconds"] = float(options["seconds"])
+        if "threads" in options and phase.get("threads", 1) > 1:
+            phase["threads"] = int(options["threads"])
+
+    origin = os.getcwd()
+    failed = 0
+    work_dir = tempfile.mkdtemp(prefix="bench_fleet_")
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            module = load_app(work_dir)
+            fleet = Fleet(module, scenario)
+            started = time.perf_counter()
+            fleet.setup(module.app.test_client())
+            results = [("setup", time.perf_counter() - started, *fleet.collect())]
+            for phase in scenario["phases"]:
+                spent = fleet.run_phase(phase)
+                results.append((phase["name"], spent, *fleet.collect()))
+            stats = [module.hs_manage.engine[hs_name].vmrest_api.stats() for hs_name in fleet.hosts]
+            module.hs_manage.writer.close()
+        print(f"模拟主机 {scenario['hosts']} 台 x 虚拟机 {scenario['vms']} 台")
+        for title, spent, latency, errors in results:
+            report(title, spent, latency, errors)
+            failed += sum(len(messages) for messages in errors.values())
+        powers = {}
+        for host_stats in stats:
+            for power, count in host_stats["powers"].items():
+                powers[power] = powers.get(power, 0) + count
+        print(f"模拟平台虚拟机 {sum(host_stats['vms'] for host_stats in stats)} 台，电源状态 {powers}")
+    finally:
+        os.chdir(origin)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    sys.exit(1 if failed else 0)
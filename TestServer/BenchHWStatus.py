@@ -0,0 +1,91 @@
+"""
+HWStatus存储格式基准测试
+对比JSON文本与紧凑二进制两种格式的单条大小、编码/解码耗时，
+以及写入相同数量主机状态后的数据库文件大小
+用法: python -m TestServer.BenchHWStatus [样本数量]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+
+from HostModule.DataManage import HostDatabase
+from MainObject.Config.VMPowers import VMPowers
+from MainObject.Public.HWStatus import HWStatus
+
+
+# 构造测试数据 ###################################################################
+def build_samples(count: int) -> list:
+    return [
+        HWStatus(
+            ac_status=VMPowers.STARTED,
+            cpu_model="Intel(R) Xeon(R) Gold 6248R CPU @ 3.00GHz",
+            cpu_total=96, cpu_usage=i % 100,
+            mem_total=524288, mem_usage=(i * 7) % 100,
+            hdd_total=3815447, hdd_usage=1200000 + i,
+            ext_usage={"D:\\": [7630894, 4000000 + i]},
+            gpu_usage={0: i % 100, 1: (i * 3) % 100}, gpu_total=2,
+            network_u=10000 + i, network_d=20000 + i * 2,
+            cpu_heats=60 + i % 20, cpu_power=200 + i % 50)
+        for i in range(count)
+    ]
+
+
+# 编码解码测试 ###################################################################
+def bench_codec(samples: list) -> dict:
+    result = {}
+    # JSON文本 =================================================
+    start = time.perf_counter()
+    texts = [json.dumps(status.__dict__()) for status in samples]
+    encode = time.perf_counter() - start
+    start = time.perf_counter()
+    for text in texts:
+        HWStatus(**json.loads(text))
+    decode = time.perf_counter() - start
+    result["json"] = (sum(len(text.encode("utf-8")) for text in texts) / len(texts), encode, decode)
+    # 紧凑二进制 ===============================================
+    start = time.perf_counter()
+    blobs = [bytes(status) for status in samples]
+    encode = time.perf_counter() - start
+    start = time.perf_counter()
+    for blob in blobs:
+        HWStatus.from_bytes(blob)
+    decode = time.perf_counter() - start
+    result["packed"] = (sum(len(blob) for blob in blobs) / len(blobs), encode, decode)
+    return result
+
+
+# 数据库大小测试 #################################################################
+def bench_db(work_dir: str, packed: bool, samples: list) -> int:
+    db_path = os.path.join(work_dir, "packed" if packed else "json", "hostmanage.db")
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    db = HostDatabase(db_path)
+    db.packed = packed
+    conn = db.get_connection()
+    conn.executemany(
+        "INSERT INTO hs_status (hs_name, status_data) VALUES (?, ?)",
+        [("bench", db._encode_status(status)) for status in samples])
+    conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    db.release_connection(conn)
+    db.close()
+    return os.path.getsize(db_path)
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    samples = build_samples(count)
+    codec = bench_codec(samples)
+    work_dir = tempfile.mkdtemp(prefix="bench_hw_")
+    try:
+        sizes = {"json": bench_db(work_dir, False, samples),
+                 "packed": bench_db(work_dir, True, samples)}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print(f"样本数量: {count}")
+    print(f"{'格式':<10}{'字节/条':>10}{'编码us/条':>12}{'解码us/条':>12}{'数据库KB':>12}")
+    for name, (size, encode, decode) in codec.items():
+        print(f"{name:<10}{size:>10.1f}{encode * 1e6 / count:>12.2f}"
+              f"{decode * 1e6 / count:>12.2f}{sizes[name] / 1024:>12.1f}")
@@ -0,0 +1,92 @@
+"""
+VRestAPI连接层基准测试
+在本地VMRest模拟器上对比"每次调用requests.get/put"（旧实现）与"长连接会话+超时+重试"两种实现：
+  - 连续查询虚拟机电源状态的吞吐量（次/秒）和新建TCP连接数
+  - vmrest无响应时一次调用被阻塞的时间
+用法: python -m TestServer.BenchVRestAPI [调用次数] [虚拟机数量]
+"""
+import sys
+import time
+
+import requests
+from requests.auth import HTTPBasicAuth
+
+from HostServer.VMRestHost.VRestAPI import VRestAPI
+from MainObject.Public.ZMessage import ZMessage
+from TestServer.VMRestSim import VMRestSim
+
+
+# 旧实现 #########################################################################
+class LegacyVRestAPI(VRestAPI):
+    """每次调用使用模块级requests函数，不复用连接，没有超时和重试"""
+
+    def vmrest_api(self, url: str, data=None, m: str = "GET") -> ZMessage:
+        full_url = f"http://{self.host_addr}/api{url}"
+        auth = HTTPBasicAuth(self.host_user, self.host_pass)
+        head = {"Content-Type": "application/vnd.vmware.vmw.rest-v1+json"}
+        methods = {"GET": requests.get, "POST": requests.post,
+                   "PUT": requests.put, "DELETE": requests.delete}
+        try:
+            response = methods[m.upper()](full_url, auth=auth, headers=head, json=data)
+            response.raise_for_status()
+            return ZMessage(success=True, actions="vmrest_api", message="请求成功",
+                            results=response.json() if response.text else {})
+        except requests.exceptions.RequestException as e:
+            return ZMessage(success=False, actions="vmrest_api", message=str(e), execute=e)
+
+
+# 执行测试 #######################################################################
+def run_calls(api: VRestAPI, stub: VMRestSim, rounds: int) -> dict:
+    names = [api.vmx_name(vm["path"]) for vm in stub.vms.values()]
+    connections_before = stub.connections
+    api.return_vmx()  # 预热名称索引
+    requests_before = stub.requests
+    start = time.perf_counter()
+    for i in range(rounds):
+        result = api.powers_get(names[i % len(names)])
+        assert result.success, result.message
+    spent = time.perf_counter() - start
+    return {
+        "calls_per_sec": rounds / spent,
+        "ms_per_call": spent * 1000 / rounds,
+        "http_per_call": (stub.requests - requests_before) / rounds,
+        "connections": stub.connections - connections_before,
+    }
+
+
+def run_hung(api: VRestAPI) -> float:
+    start = time.perf_counter()
+    api.vmrest_api("/vms")
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    vm_count = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    stub = VMRestSim(vm_count).start()
+    try:
+        results = {
+            "legacy": run_calls(LegacyVRestAPI(stub.addr), stub, rounds),
+            "session": run_calls(VRestAPI(stub.addr), stub, rounds),
+        }
+        print(f"powers_get x {rounds}，虚拟机 {vm_count} 台")
+        print(f"{'实现':<10}{'次/秒':>10}{'ms/次':>10}{'HTTP/次':>10}{'新建连接':>10}")
+        for name, result in results.items():
+            print(f"{name:<10}{result['calls_per_sec']:>10.1f}{result['ms_per_call']:>10.3f}"
+                  f"{result['http_per_call']:>10.2f}{result['connections']:>10}")
+        api = VRestAPI(stub.addr)
+        run_calls(api, stub, min(rounds, 200))
+        for key, stats in api.latency_stats().items():
+            print(f"  {key:<24}{stats}")
+    finally:
+        stub.stop()
+
+    # vmrest无响应（每次请求处理3秒） ===============================
+    hung = VMRestSim(vm_count, delay=3.0).start()
+    try:
+        legacy = run_hung(LegacyVRestAPI(hung.addr))
+        session = run_hung(VRestAPI(hung.addr, timeout=(1.0, 0.5), retries=1, backoff=0.1))
+        print(f"vmrest无响应时单次调用阻塞: legacy {legacy:.2f} s（直到服务端返回）, "
+              f"session {session:.2f} s（读取超时0.5 s，重试1次）")
+    finally:
+        hung.stop()
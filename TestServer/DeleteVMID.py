@@ -9,4 +9,5 @@ vm_uuid = "ecs_testvm"
 conn.execute("DELETE FROM vm_status WHERE vm_uuid = ?", (vm_uuid,))
 conn.execute("DELETE FROM vm_saving WHERE vm_uuid = ?", (vm_uuid,))
 conn.commit()
-conn.close()
\ No newline at end of file
+db.release_connection(conn)
+db.close()
\ No newline at end of file
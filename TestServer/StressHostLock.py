@@ -0,0 +1,224 @@
+"""
+主机读写锁压力测试
+多个线程并发调用API（读取虚拟机列表、增删NAT规则、统计信息等），同时定时任务线程
+不断执行exe_cron逐台修改虚拟机状态，另有线程反复添加/删除主机，检查：
+  - 请求是否出错（500或异常）
+  - 虚拟机列表是否读到"撕裂"的状态（同一次响应中各虚拟机的状态来自不同轮次的定时任务）
+输出各接口的吞吐量、延迟分位数和每台主机锁的等待统计
+用法: python -m TestServer.StressHostLock [秒数] [API线程数] [主机数] [虚拟机数] [--unlocked]
+      --unlocked 定时任务不加写锁修改状态，用于验证撕裂检查本身有效
+"""
+import io
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+import threading
+import contextlib
+import importlib.util
+
+from HostServer.Template import BaseServer
+from MainObject.Config.HSConfig import HSConfig
+from MainObject.Config.VMConfig import VMConfig
+from MainObject.Public.HWStatus import HWStatus
+from MainObject.Public.ZMessage import ZMessage
+
+
+# 测试主机 #######################################################################
+class StressServer(BaseServer):
+    """不访问远程接口的主机：Crontabs逐台原地修改虚拟机状态，cpu_usage记录定时任务轮次"""
+    unlocked = False
+
+    def __init__(self, config: HSConfig, **kwargs):
+        super().__init__(config, **kwargs)
+        self.cycle = 0
+
+    def Crontabs(self) -> bool:
+        self.cycle += 1
+        # 模拟远程查询（锁外）
+        time.sleep(0.002)
+        locker = contextlib.nullcontext() if self.unlocked else self.locker.write()
+        with locker:
+            for vm_uuid in list(self.vm_saving):
+                self.vm_status[vm_uuid] = [HWStatus(cpu_usage=self.cycle)]
+                time.sleep(0)  # 让出GIL，不加锁时读者可以读到一半的修改
+            self.touch()
+        return True
+
+    def HSLoader(self) -> ZMessage:
+        return ZMessage(success=True, action="HSLoader")
+
+    def HSUnload(self) -> ZMessage:
+        return ZMessage(success=True, action="HSUnload")
+
+
+# 构造测试环境 ###################################################################
+def load_app(work_dir: str):
+    """在临时目录中导入HostServer.py（与HostServer包同名，按文件路径导入）"""
+    os.chdir(work_dir)
+    path = os.path.join(os.path.dirname(__file__), "..", "HostServer.py")
+    spec = importlib.util.spec_from_file_location("HostServerApp", os.path.abspath(path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def add_host(hs_manage, hs_name: str, vm_count: int) -> StressServer:
+    config = HSConfig(server_type="Stress", server_addr="localhost", filter_name="")
+    server = StressServer(config, db=hs_manage.db, hs_name=hs_name)
+    for i in range(vm_count):
+        vm_uuid = f"ecs_{i:04d}"
+        server.vm_saving[vm_uuid] = VMConfig(vm_uuid=vm_uuid, cpu_num=2, mem_num=2048)
+        server.vm_status[vm_uuid] = [HWStatus(cpu_usage=0)]
+    with hs_manage.engine_lock.write():
+        hs_manage.engine[hs_name] = server
+    hs_manage.loaded.add(hs_name)
+    hs_manage.db.save_host_config(hs_name, config)
+    return server
+
+
+# 执行测试 #######################################################################
+class Stress:
+    def __init__(self, module, hosts: list, seconds: float):
+        self.module = module
+        self.hs_manage = module.hs_manage
+        self.hosts = hosts
+        self.deadline = time.perf_counter() + seconds
+        self.latency: dict[str, list] = {}
+        self.errors: list[str] = []
+        self.torn = 0
+        self.cron_rounds = 0
+        self.churn_rounds = 0
+        self.lock = threading.Lock()
+
+    def record(self, name: str, spent: float, error: str = ""):
+        with self.lock:
+            self.latency.setdefault(name, []).append(spent)
+            if error:
+                self.errors.append(f"{name}: {error}")
+
+    def request(self, client, headers, name: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = client.open(url, method=method, headers=headers, **kwargs)
+            error = "" if response.status_code in (200, 404) else f"HTTP {response.status_code}"
+            body = response.get_json(silent=True) or {}
+        except Exception as e:
+            error, body = repr(e), {}
+        self.record(name, time.perf_counter() - started, error)
+        return body
+
+    # API线程 ==================================================
+    def api_worker(self, seed: int):
+        rand = random.Random(seed)
+        client = self.module.app.test_client()
+        headers = {"Authorization": f"Bearer {self.hs_manage.bearer}"}
+        while time.perf_counter() < self.deadline:
+            hs_name = rand.choice(self.hosts)
+            vm_uuid = f"ecs_{rand.randrange(4):04d}"
+            action = rand.random()
+            if action < 0.40:
+                body = self.request(client, headers, "get_vms", "GET", f"/api/hosts/{hs_name}/vms")
+                cycles = {vm["status"][-1]["cpu_usage"] for vm in (body.get("data") or {}).values()
+                          if vm.get("status")}
+                if len(cycles) > 1:
+                    with self.lock:
+                        self.torn += 1
+            elif action < 0.55:
+                self.request(client, headers, "get_hosts", "GET", "/api/hosts")
+            elif action < 0.65:
+                self.request(client, headers, "system_stats", "GET", "/api/system/stats")
+            elif action < 0.75:
+                self.request(client, headers, "get_vm", "GET", f"/api/hosts/{hs_name}/vms/{vm_uuid}")
+            elif action < 0.85:
+                self.request(client, headers, "get_nat", "GET", f"/api/hosts/{hs_name}/vms/{vm_uuid}/nat")
+            elif action < 0.95:
+                self.request(client, headers, "add_nat", "POST", f"/api/hosts/{hs_name}/vms/{vm_uuid}/nat",
+                             json={"protocol": "tcp", "external_port": rand.randrange(10000, 60000),
+                                   "internal_port": 22, "internal_ip": "10.0.0.2"})
+            else:
+                self.request(client, headers, "del_nat", "DELETE", f"/api/hosts/{hs_name}/vms/{vm_uuid}/nat/0")
+
+    # 定时任务线程 =============================================
+    def cron_worker(self):
+        while time.perf_counter() < self.deadline:
+            started = time.perf_counter()
+            try:
+                results = self.hs_manage.exe_cron()
+                failed = [f"{hs_name} {result['state']} {result['message']}"
+                          for hs_name, result in results.items() if result["state"] not in ("ready", "skipped")]
+                self.record("exe_cron", time.perf_counter() - started, "; ".join(failed))
+            except Exception as e:
+                self.record("exe_cron", time.perf_counter() - started, repr(e))
+            self.cron_rounds += 1
+
+    # 主机增删线程 =============================================
+    def churn_worker(self):
+        while time.perf_counter() < self.deadline:
+            started = time.perf_counter()
+            try:
+                add_host(self.hs_manage, "churn", 4)
+                time.sleep(0.005)
+                self.hs_manage.del_host("churn")
+                self.record("host_churn", time.perf_counter() - started)
+            except Exception as e:
+                self.record("host_churn", time.perf_counter() - started, repr(e))
+            self.churn_rounds += 1
+
+    def run(self, threads: int):
+        workers = [threading.Thread(target=self.api_worker, args=(i,)) for i in range(threads)]
+        workers.append(threading.Thread(target=self.cron_worker))
+        workers.append(threading.Thread(target=self.churn_worker))
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+
+def percentile(values: list, rate: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * rate))] * 1000
+
+
+if __name__ == "__main__":
+    argv = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    seconds = float(argv[0]) if len(argv) > 0 else 10
+    threads = int(argv[1]) if len(argv) > 1 else 8
+    host_count = int(argv[2]) if len(argv) > 2 else 4
+    vm_count = int(argv[3]) if len(argv) > 3 else 50
+    StressServer.unlocked = "--unlocked" in sys.argv
+    origin = os.getcwd()
+    failed = True
+    work_dir = tempfile.mkdtemp(prefix="stress_lock_")
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            module = load_app(work_dir)
+            hosts = [f"host{i}" for i in range(host_count)]
+            for hs_name in hosts:
+                add_host(module.hs_manage, hs_name, vm_count)
+            stress = Stress(module, hosts, seconds)
+            started = time.perf_counter()
+            stress.run(threads)
+            spent = time.perf_counter() - started
+            module.hs_manage.writer.close()
+        print(f"主机 {host_count} 台 x 虚拟机 {vm_count} 台，API线程 {threads}，"
+              f"{'不加锁' if StressServer.unlocked else '加锁'}，运行 {spent:.1f} s")
+        print(f"{'操作':<14}{'次数':>8}{'次/秒':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for name, values in sorted(stress.latency.items()):
+            print(f"{name:<14}{len(values):>8}{len(values) / spent:>10.1f}{percentile(values, 0.5):>10.2f}"
+                  f"{percentile(values, 0.99):>10.2f}{max(values) * 1000:>10.2f}")
+        print(f"定时任务 {stress.cron_rounds} 轮，主机增删 {stress.churn_rounds} 轮")
+        for hs_name in hosts:
+            stats = module.hs_manage.engine[hs_name].locker.stats()
+            print(f"{hs_name:<8} 锁等待 {stats['contended']} 次，累计 {stats['wait_seconds']:.3f} s，"
+                  f"最长 {stats['max_wait'] * 1000:.1f} ms")
+        print(f"撕裂读取: {stress.torn}  错误: {len(stress.errors)}")
+        for error in stress.errors[:10]:
+            print(f"  {error}")
+        failed = stress.torn or stress.errors
+    finally:
+        os.chdir(origin)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,233 @@
+"""
+本地VMRest模拟器
+在127.0.0.1上模拟VMware Workstation的vmrest接口，供压力测试和离线开发使用（不需要vmrest.exe）：
+  GET    /api/vms                 虚拟机列表
+  GET    /api/vms/{id}            虚拟机配置
+  PUT    /api/vms/{id}            修改虚拟机配置
+  DELETE /api/vms/{id}            删除虚拟机
+  GET    /api/vms/{id}/power      电源状态
+  PUT    /api/vms/{id}/power      电源操作（请求体为on/off/shutdown/suspend/pause/unpause/reset）
+  POST   /api/vms/registration    注册虚拟机
+  GET    /api/vmnet               虚拟网络列表
+支持HTTP/1.1长连接、按接口设置延迟、按接口注入错误，并统计每个接口的请求数、注入的错误数和最大并发数
+用法: python -m TestServer.VMRestSim [虚拟机数量] [端口] [--latency=秒] [--error-rate=比例]
+"""
+import sys
+import json
+import base64
+import time
+import socket
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+# 模拟器 #########################################################################
+class VMRestSim:
+    # 电源操作 -> 电源状态
+    POWER_STATES = {"on": "poweredOn", "off": "poweredOff", "shutdown": "poweredOff",
+                    "suspend": "suspended", "pause": "paused", "unpause": "poweredOn",
+                    "reset": "poweredOn"}
+
+    def __init__(self, vm_count: int = 10, port: int = 0, delay: float = 0.0,
+                 latency: dict = None, errors: dict = None, error_status: int = 500,
+                 user: str = "", password: str = "", seed: int = 0):
+        """
+        :param vm_count: 虚拟机数量
+        :param port: 监听端口，0表示随机端口
+        :param delay: 所有接口的默认处理延迟（秒）
+        :param latency: 按接口设置的延迟 {"GET /vms/{id}/power": 0.01, ...}，覆盖delay
+        :param errors: 按接口注入错误的比例 {"GET /vms/{id}/power": 0.05, ...}，"*"表示所有接口
+        :param error_status: 注入错误时返回的状态码
+        :param user: 用户名，为空时不检查认证
+        :param seed: 注入错误的随机种子，相同种子得到相同的错误序列
+        """
+        self.delay = delay
+        self.latency = dict(latency or {})
+        self.errors = dict(errors or {})
+        self.error_status = error_status
+        self.user = user
+        self.password = password
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.vms: dict[str, dict] = {}
+        self.sequence = 0
+        for i in range(vm_count):
+            self.add_vm(f"C:\\VMs\\ecs_{i:04d}\\ecs_{i:04d}.vmx",
+                        "poweredOn" if i % 2 else "poweredOff")
+        self.vmnets = [{"name": "vmnet1", "type": "hostOnly"}, {"name": "vmnet8", "type": "nat"}]
+        # 计数器 ===============================================
+        self.counters: dict[str, dict] = {}  # 接口 -> {"requests", "errors"}
+        self.connections = 0
+        self.running = 0  # 正在处理的请求数
+        self.max_running = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self.handler())
+        self.server.daemon_threads = True
+        self.thread: threading.Thread | None = None
+
+    @property
+    def addr(self) -> str:
+        return f"127.0.0.1:{self.server.server_address[1]}"
+
+    @property
+    def requests(self) -> int:
+        with self.lock:
+            return sum(counter["requests"] for counter in self.counters.values())
+
+    def start(self) -> "VMRestSim":
+        self.thread = threading.Thread(target=self.server.serve_forever, name="VMRestSim", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    # 添加虚拟机 ===============================================
+    def add_vm(self, path: str, power_state: str = "poweredOff") -> str:
+        with self.lock:
+            self.sequence += 1
+            vm_id = f"VMID{self.sequence:06d}"
+            self.vms[vm_id] = {"path": path, "power_state": power_state,
+                               "config": {"cpu": {"processors": 2}, "memory": 2048}}
+        return vm_id
+
+    # 计数器 ===================================================
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.connections = 0
+            self.max_running = 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "endpoints": {key: dict(counter) for key, counter in sorted(self.counters.items())},
+                "requests": sum(counter["requests"] for counter in self.counters.values()),
+                "errors": sum(counter["errors"] for counter in self.counters.values()),
+                "connections": self.connections,
+                "max_running": self.max_running,
+            }
+
+    # 接口名称 =================================================
+    @staticmethod
+    def endpoint(method: str, parts: list) -> str:
+        """api/vms/VMID000001/power -> GET /vms/{id}/power"""
+        path = parts[1:]
+        if len(path) > 1 and path[0] == "vms" and path[1] != "registration":
+            path[1] = "{id}"
+        return f"{method} /{'/'.join(path)}"
+
+    # 处理请求 =================================================
+    def respond(self, method: str, path: str, body: bytes, auth: str = "") -> tuple:
+        """:return: (状态码, 响应数据)"""
+        parts = path.split("?")[0].strip("/").split("/")
+        key = self.endpoint(method, parts)
+        with self.lock:
+            counter = self.counters.setdefault(key, {"requests": 0, "errors": 0})
+            counter["requests"] += 1
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            rate = self.errors.get(key, self.errors.get("*", 0.0))
+            failed = rate > 0 and self.random.random() < rate
+            if failed:
+                counter["errors"] += 1
+        try:
+            wait = self.latency.get(key, self.delay)
+            if wait:
+                time.sleep(wait)
+            if failed:
+                return self.error_status, {"Code": self.error_status, "Message": "injected error"}
+            if self.user and not self.authorized(auth):
+                return 401, {"Code": 401, "Message": "Authentication failed"}
+            return self.route(method, parts, body)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+    def authorized(self, auth: str) -> bool:
+        expected = base64.b64encode(f"{self.user}:{self.password}".encode()).decode()
+        return auth == f"Basic {expected}"
+
+    def route(self, method: str, parts: list, body: bytes) -> tuple:
+        if parts[0] != "api" or len(parts) < 2:
+            return 404, {"Message": "not found"}
+        if parts[1] == "vmnet" and method == "GET":
+            return 200, {"num": len(self.vmnets), "vmnets": self.vmnets}
+        if parts[1] != "vms":
+            return 404, {"Message": "not found"}
+        if len(parts) == 2 and method == "GET":
+            with self.lock:
+                return 200, [{"id": vm_id, "path": vm["path"]} for vm_id, vm in self.vms.items()]
+        if parts[2:] == ["registration"] and method == "POST":
+            data = json.loads(body or b"{}")
+            if not data.get("path"):
+                return 400, {"Message": "path is required"}
+            return 201, {"id": self.add_vm(data["path"]), "path": data["path"]}
+        with self.lock:
+            vm = self.vms.get(parts[2])
+            if vm is None:
+                return 404, {"Code": 404, "Message": "The virtual machine cannot be found"}
+            if len(parts) == 3:
+                if method == "GET":
+                    return 200, {"id": parts[2], **vm["config"]}
+                if method == "PUT":
+                    vm["config"].update(json.loads(body or b"{}"))
+                    return 200, {"id": parts[2], **vm["config"]}
+                if method == "DELETE":
+                    del self.vms[parts[2]]
+                    return 204, None
+            if len(parts) == 4 and parts[3] == "power":
+                if method == "PUT":
+                    command = body.decode().strip()
+                    if command not in self.POWER_STATES:
+                        return 400, {"Message": f"invalid power operation: {command}"}
+                    vm["power_state"] = self.POWER_STATES[command]
+                return 200, {"power_state": vm["power_state"]}
+        return 404, {"Message": "not found"}
+
+    def handler(self):
+        sim = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # 长连接
+
+            def setup(self):
+                super().setup()
+                # 与vmrest一样关闭Nagle算法，否则分开写入的响应头和响应体会等待延迟确认
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with sim.lock:
+                    sim.connections += 1
+
+            def handle_method(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                status, data = sim.respond(self.command, self.path, body,
+                                           self.headers.get("Authorization", ""))
+                payload = json.dumps(data).encode() if data is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/vnd.vmware.vmw.rest-v1+json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_PUT = do_POST = do_DELETE = handle_method
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    argv = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    options = dict(arg[2:].split("=", 1) for arg in sys.argv[1:] if arg.startswith("--") and "=" in arg)
+    sim = VMRestSim(int(argv[0]) if len(argv) > 0 else 10,
+                    int(argv[1]) if len(argv) > 1 else 8697,
+                    delay=float(options.get("latency", 0)),
+                    errors={"*": float(options.get("error-rate", 0))})
+    print(f"[VMRestSim] 监听 http://{sim.addr}/api ，虚拟机 {len(sim.vms)} 台")
+    try:
+        sim.server.serve_forever()
+    except KeyboardInterrupt:
+        print(json.dumps(sim.stats(), indent=2))